@@ -1,6 +1,7 @@
 from google.adk.agents import Agent
 from dotenv import load_dotenv
 from storage import load_survey_text
+from llm_client import agent_model
 
 load_dotenv()
 
@@ -11,7 +12,7 @@ def create_planner_agent():
   instruction = load_survey_text()
   
   return Agent(
-    model=MODEL,
+    model=agent_model(MODEL, "planner"),
     name='agentPlanner',
     description='Asystent feedbacku HR, który pomaga w planowaniu i tworzeniu scenariuszy rozmów feedbackowych z kandydatami.',
     instruction=instruction
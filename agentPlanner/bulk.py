@@ -0,0 +1,161 @@
+"""
+Masowe tworzenie scenariuszy z pliku CSV/XLSX (np. po zakończonej rundzie rekrutacji).
+Dla każdego kandydata planner generuje scenariusz (JSON wymuszony schematem),
+generowanie odbywa się równolegle w ograniczonej puli, a zapis - paczkami.
+Wynikiem jest plik CSV z linkami dla kandydatów.
+"""
+
+import asyncio
+import csv
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Callable, Optional
+
+import pandas as pd
+from google.genai import types
+
+import tracing
+from llm_client import get_genai_client
+from storage import load_survey_text, save_scenarios, build_candidate_link
+
+MODEL = "gemini-2.0-flash-001"
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "8"))
+BULK_SAVE_BATCH = int(os.getenv("BULK_SAVE_BATCH", "50"))
+
+# Akceptowane nazwy kolumn (PL/EN) -> nazwa pola scenariusza
+COLUMN_ALIASES = {
+    "candidate_name": "candidate_name", "kandydat": "candidate_name", "imie_nazwisko": "candidate_name", "name": "candidate_name",
+    "context": "context", "kontekst": "context", "notatki": "context", "notes": "context",
+    "tone": "tone", "ton": "tone",
+}
+
+SCENARIO_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "candidate_name": {"type": "STRING"},
+        "context": {"type": "STRING"},
+        "tone": {"type": "STRING"},
+        "key_questions": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": ["candidate_name", "context", "tone", "key_questions"],
+}
+
+BULK_PROMPT = """
+Tryb masowy: NIE zadawaj pytań rekruterowi i nie proś o akceptację.
+Na podstawie poniższych danych od razu przygotuj scenariusz i zwróć wyłącznie JSON z konfiguracją.
+
+Kandydat: {candidate_name}
+Kontekst: {context}
+Ton rozmowy: {tone}
+"""
+
+
+def read_candidates(path: str) -> list[dict]:
+    """Wczytuje listę kandydatów z CSV lub XLSX (wymagana kolumna z imieniem i nazwiskiem)."""
+    if path.lower().endswith((".xlsx", ".xls")):
+        frame = pd.read_excel(path, dtype=str)
+    else:
+        frame = pd.read_csv(path, dtype=str, sep=None, engine="python")
+
+    frame = frame.rename(columns=lambda c: COLUMN_ALIASES.get(str(c).strip().lower().replace(" ", "_"), c))
+    if "candidate_name" not in frame.columns:
+        raise ValueError("Brak kolumny z kandydatem (candidate_name / kandydat).")
+
+    frame = frame.fillna("")
+    return [
+        {
+            "candidate_name": row["candidate_name"].strip(),
+            "context": row.get("context", "").strip(),
+            "tone": row.get("tone", "").strip() or "Profesjonalny i uprzejmy",
+        }
+        for row in frame.to_dict("records")
+        if row["candidate_name"].strip()
+    ]
+
+
+async def generate_scenario(candidate: dict) -> dict:
+    """Generuje scenariusz dla jednego kandydata (jedno wywołanie modelu)."""
+    with tracing.model_call(MODEL):
+        response = await get_genai_client().aio.models.generate_content(
+            model=MODEL,
+            contents=BULK_PROMPT.format(**candidate),
+            config=types.GenerateContentConfig(
+                system_instruction=load_survey_text(),
+                response_mime_type="application/json",
+                response_schema=SCENARIO_SCHEMA,
+            ),
+        )
+    scenario = json.loads(response.text)
+    if not scenario.get("key_questions"):
+        raise ValueError("Scenariusz bez pytań")
+    # Dane z pliku są źródłem prawdy dla nazwiska kandydata
+    scenario["candidate_name"] = candidate["candidate_name"]
+    return scenario
+
+
+async def create_scenarios_bulk(
+    candidates: list[dict],
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    concurrency: int = BULK_CONCURRENCY,
+) -> list[dict]:
+    """Generuje i zapisuje scenariusze dla listy kandydatów.
+
+    Returns:
+        Wiersze wyniku: candidate_name, session_id, link, status, error.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    results: list[dict] = [None] * len(candidates)
+    pending_save: list[int] = []
+    done = 0
+
+    def save_batch(indices: list[int]):
+        # Wynik per wiersz - błąd jednego zapisu nie oznacza jako ERROR scenariuszy już zapisanych
+        saved = save_scenarios([results[i]["scenario"] for i in indices], return_exceptions=True)
+        for i, session_id in zip(indices, saved):
+            if isinstance(session_id, Exception):
+                results[i].update(status="ERROR", error=f"Zapis nieudany: {session_id}")
+            else:
+                results[i].update(session_id=session_id, link=build_candidate_link(session_id), status="OK")
+
+    async def flush():
+        # Paczka jest zdejmowana z kolejki przed zapisem, żeby równoległe zadania dokładały do nowej
+        indices = pending_save[:]
+        pending_save.clear()
+        await asyncio.to_thread(save_batch, indices)
+
+    async def worker(index: int, candidate: dict):
+        nonlocal done
+        row = {"candidate_name": candidate["candidate_name"], "session_id": "", "link": "", "status": "ERROR", "error": ""}
+        async with semaphore:
+            try:
+                row["scenario"] = await generate_scenario(candidate)
+            except Exception as e:
+                row["error"] = str(e)
+        results[index] = row
+        if "scenario" in row:
+            pending_save.append(index)
+            if len(pending_save) >= BULK_SAVE_BATCH:
+                await flush()
+        done += 1
+        if on_progress:
+            on_progress(done, len(candidates))
+
+    await asyncio.gather(*(worker(i, c) for i, c in enumerate(candidates)))
+    if pending_save:
+        await flush()
+
+    for row in results:
+        row.pop("scenario", None)
+    return results
+
+
+def write_results_csv(rows: list[dict]) -> str:
+    """Zapisuje wynik do pliku CSV (do pobrania w panelu) i zwraca jego ścieżkę."""
+    path = os.path.join(tempfile.gettempdir(), f"linki_kandydatow_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["candidate_name", "session_id", "link", "status", "error"])
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
@@ -0,0 +1,136 @@
+"""
+Kondensacja długich CV i notatek rekrutacyjnych przed przekazaniem ich plannerowi.
+Dokument jest dzielony na fragmenty, z których szybki model równolegle wyciąga
+fakty o kandydacie, a następnie fakty są scalane w zwięzłą kartę faktów.
+Planner dostaje kartę zamiast pełnego tekstu, więc historia sesji nie puchnie.
+"""
+
+import asyncio
+import os
+import time
+
+from google.genai import types
+
+import tracing
+from llm_client import get_genai_client
+
+FAST_MODEL = "gemini-2.0-flash-001"
+
+# Dokumenty krótsze niż próg trafiają do plannera bez kondensacji
+CONDENSE_MIN_CHARS = int(os.getenv("CONDENSE_MIN_CHARS", "3000"))
+CHUNK_CHARS = int(os.getenv("CONDENSE_CHUNK_CHARS", "6000"))
+CHUNK_OVERLAP = 300
+CONDENSE_CONCURRENCY = int(os.getenv("CONDENSE_CONCURRENCY", "4"))
+
+EXTRACT_PROMPT = """
+Poniżej fragment ({index}/{total}) dokumentu rekrutacyjnego (CV lub notatki z rekrutacji).
+Wypisz zwięźle, w punktach, WYŁĄCZNIE fakty istotne dla rozmowy feedbackowej z kandydatem:
+imię i nazwisko, stanowisko, etapy procesu i ich przebieg, oceny i uwagi rekruterów,
+decyzja (zatrudniony/odrzucony/rezygnacja) i jej powód, trudne momenty, ustalenia dot. tonu rozmowy.
+Jeśli fragment nie zawiera takich faktów, odpowiedz "BRAK".
+
+[FRAGMENT]
+{chunk}
+[KONIEC FRAGMENTU]
+"""
+
+MERGE_PROMPT = """
+Poniżej fakty o kandydacie wyciągnięte z kolejnych fragmentów jednego dokumentu.
+Scal je w jedną zwięzłą kartę faktów (Markdown, punkty pogrupowane: Kandydat, Proces, Decyzja, Uwagi).
+Usuń powtórzenia, zachowaj konkretne liczby, daty i cytaty. Nie dodawaj nowych informacji.
+
+{facts}
+"""
+
+
+def split_into_chunks(text: str, chunk_chars: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> list[str]:
+    """Dzieli tekst na fragmenty, preferując granice akapitów."""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_chars, len(text))
+        if end < len(text):
+            boundary = text.rfind("\n\n", start + chunk_chars // 2, end)
+            if boundary == -1:
+                boundary = text.rfind("\n", start + chunk_chars // 2, end)
+            if boundary != -1:
+                end = boundary
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [chunk for chunk in chunks if chunk]
+
+
+async def _generate(prompt: str, usage: dict) -> str:
+    with tracing.model_call(FAST_MODEL):
+        response = await get_genai_client().aio.models.generate_content(
+            model=FAST_MODEL,
+            contents=prompt,
+            config=types.GenerateContentConfig(temperature=0),
+        )
+    metadata = response.usage_metadata
+    if metadata:
+        usage["prompt_tokens"] += metadata.prompt_token_count or 0
+        usage["output_tokens"] += metadata.candidates_token_count or 0
+    usage["model_calls"] += 1
+    return (response.text or "").strip()
+
+
+async def condense_document(text: str) -> dict:
+    """Zamienia długi dokument w kartę faktów.
+
+    Raises:
+        ValueError: Gdy kondensacja dała pustą kartę faktów.
+
+    Returns:
+        Słownik: fact_sheet, condensed (bool), chunks, source_chars, fact_sheet_chars,
+        prompt_tokens, output_tokens, model_calls, elapsed (s).
+    """
+    started = time.perf_counter()
+    usage = {"prompt_tokens": 0, "output_tokens": 0, "model_calls": 0}
+    result = {"source_chars": len(text), "condensed": False, "chunks": 1}
+
+    if len(text) < CONDENSE_MIN_CHARS:
+        fact_sheet = text
+    else:
+        chunks = split_into_chunks(text)
+        semaphore = asyncio.Semaphore(CONDENSE_CONCURRENCY)
+
+        async def extract(index: int, chunk: str) -> str:
+            async with semaphore:
+                prompt = EXTRACT_PROMPT.format(index=index + 1, total=len(chunks), chunk=chunk)
+                return await _generate(prompt, usage)
+
+        facts = await asyncio.gather(*(extract(i, chunk) for i, chunk in enumerate(chunks)))
+        facts = [f for f in facts if f and f.upper() != "BRAK"]
+
+        if len(facts) > 1:
+            fact_sheet = await _generate(MERGE_PROMPT.format(facts="\n\n---\n\n".join(facts)), usage)
+        else:
+            fact_sheet = facts[0] if facts else ""
+        if not fact_sheet.strip():
+            # Pusta karta (np. wszystkie fragmenty "BRAK") zostawiłaby plannera bez dokumentu -
+            # wywołujący przekazuje wtedy (obcięty) tekst źródłowy i pokazuje ostrzeżenie
+            raise ValueError("model nie wyciągnął z dokumentu żadnych faktów")
+        result.update(condensed=True, chunks=len(chunks))
+
+    result.update(
+        fact_sheet=fact_sheet,
+        fact_sheet_chars=len(fact_sheet),
+        elapsed=time.perf_counter() - started,
+        **usage,
+    )
+    return result
+
+
+def format_condense_stats(result: dict) -> str:
+    """Krótki raport z kondensacji do wyświetlenia w panelu admina."""
+    if not result.get("condensed"):
+        return f"📄 Dokument ({result['source_chars']} znaków) przekazany bez kondensacji."
+    return (
+        f"📄 Skondensowano {result['source_chars']} → {result['fact_sheet_chars']} znaków "
+        f"({result['chunks']} fragmentów, {result['model_calls']} wywołań modelu) | "
+        f"tokeny: {result['prompt_tokens']} wej. / {result['output_tokens']} wyj. | "
+        f"czas: {result['elapsed']:.1f}s"
+    )
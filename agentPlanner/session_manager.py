@@ -0,0 +1,122 @@
+"""
+Zarządzanie sesjami plannera w panelu admina.
+Każda sesja przeglądarki ma własną rozmowę z plannerem, z prawdziwym resetem,
+wygasaniem po bezczynności i limitem przechowywanych tur (żeby kolejne scenariusze
+nie płaciły tokenami za całą historię poprzednich).
+"""
+
+import asyncio
+import os
+import time
+
+from google.adk.events import Event
+
+PLANNER_IDLE_TTL = int(os.getenv("PLANNER_IDLE_TTL", "3600"))
+PLANNER_MAX_TURNS = int(os.getenv("PLANNER_MAX_TURNS", "12"))
+# Liczba tur zostawiana po przycięciu (próg dolny). Przycięcie kopiuje całą sesję, więc
+# odbywa się raz na (PLANNER_MAX_TURNS - PLANNER_KEEP_TURNS) tur, a nie w każdej turze.
+PLANNER_KEEP_TURNS = int(os.getenv("PLANNER_KEEP_TURNS", str(max(2, PLANNER_MAX_TURNS // 2))))
+
+
+class PlannerSessionManager:
+    """Mapuje właściciela (sesję przeglądarki) na sesję ADK plannera."""
+
+    def __init__(
+        self, session_service, app_name: str, idle_ttl: int = PLANNER_IDLE_TTL,
+        max_turns: int = PLANNER_MAX_TURNS, keep_turns: int = PLANNER_KEEP_TURNS,
+    ):
+        self.session_service = session_service
+        self.app_name = app_name
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self.keep_turns = max(1, min(keep_turns, max_turns - 1))
+        # owner_id -> {"session_id", "last_active", "turns", "last_prompt_tokens"}
+        self._owners: dict[str, dict] = {}
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def user_id(owner_id: str) -> str:
+        return f"admin_{owner_id}"
+
+    async def get_session_id(self, owner_id: str) -> str:
+        """Zwraca ID sesji ADK właściciela (tworzy nową, jeśli brak lub wygasła)."""
+        await self.sweep_idle()
+        async with self._lock:
+            entry = self._owners.get(owner_id)
+            if entry is None:
+                session = await self.session_service.create_session(app_name=self.app_name, user_id=self.user_id(owner_id))
+                entry = {"session_id": session.id, "turns": 0, "last_prompt_tokens": 0}
+                self._owners[owner_id] = entry
+            entry["last_active"] = time.time()
+            return entry["session_id"]
+
+    async def record_turn(self, owner_id: str, prompt_tokens: int):
+        """Rejestruje zakończoną turę i przycina historię po przekroczeniu limitu."""
+        entry = self._owners.get(owner_id)
+        if entry is None:
+            return
+        entry["turns"] += 1
+        entry["last_prompt_tokens"] = prompt_tokens
+        if entry["turns"] > self.max_turns:
+            await self._trim(owner_id, entry)
+
+    async def _trim(self, owner_id: str, entry: dict):
+        """Przenosi do nowej sesji pierwszą turę (opis kandydata) i ostatnie tury rozmowy (razem `keep_turns`)."""
+        user_id = self.user_id(owner_id)
+        old = await self.session_service.get_session(app_name=self.app_name, user_id=user_id, session_id=entry["session_id"])
+        if old is None:
+            return
+
+        # Tury = wiadomość użytkownika + odpowiedzi modelu aż do kolejnej wiadomości użytkownika
+        turns: list[list[Event]] = []
+        for event in old.events:
+            if not event.content or not event.content.parts:
+                continue
+            if event.author == "user":
+                turns.append([event])
+            elif turns:
+                turns[-1].append(event)
+
+        kept = turns
+        if len(turns) > self.keep_turns:
+            kept = turns[:1] + turns[len(turns) - (self.keep_turns - 1):] if self.keep_turns > 1 else turns[:1]
+        new = await self.session_service.create_session(app_name=self.app_name, user_id=user_id)
+        for turn in kept:
+            for event in turn:
+                await self.session_service.append_event(new, Event(author=event.author, content=event.content, invocation_id=event.invocation_id))
+
+        await self.session_service.delete_session(app_name=self.app_name, user_id=user_id, session_id=old.id)
+        entry["session_id"] = new.id
+        entry["turns"] = len(kept)
+
+    async def reset(self, owner_id: str):
+        """Usuwa rozmowę właściciela - kolejna wiadomość zacznie nową sesję."""
+        async with self._lock:
+            entry = self._owners.pop(owner_id, None)
+        if entry:
+            await self.session_service.delete_session(app_name=self.app_name, user_id=self.user_id(owner_id), session_id=entry["session_id"])
+
+    async def sweep_idle(self):
+        """Usuwa sesje nieużywane dłużej niż `idle_ttl`."""
+        now = time.time()
+        expired = [owner for owner, entry in self._owners.items() if now - entry.get("last_active", now) > self.idle_ttl]
+        for owner_id in expired:
+            await self.reset(owner_id)
+
+    def describe(self, owner_id: str) -> str:
+        """Krótka informacja o sesji do wyświetlenia w UI."""
+        entry = self._owners.get(owner_id)
+        if entry is None:
+            return "Nowa sesja plannera."
+        return (
+            f"Rozmiar promptu ostatniego wywołania: **{entry['last_prompt_tokens']} tokenów** | "
+            f"tury w sesji: {entry['turns']}/{self.max_turns}"
+        )
+
+    def stats(self) -> dict:
+        return {
+            "active_sessions": len(self._owners),
+            "avg_prompt_tokens": (
+                sum(e["last_prompt_tokens"] for e in self._owners.values()) / len(self._owners) if self._owners else 0
+            ),
+        }
@@ -3,6 +3,7 @@ from google.genai import types
 from google.adk.tools import VertexAiSearchTool
 from dotenv import load_dotenv
 import os
+from llm_client import agent_model, is_fake_backend
 load_dotenv()
 instruction_prompt = """
 # Rola
@@ -29,7 +30,7 @@ Twoim celem jest pobranie dostępnych danych z `privatecorpus`, a następnie prz
    Przeanalizuj sekcje tekstowe i kategoryzacyjne:
    - **Kompetencje i Zadania (`sekcja_3_kompetencje`):** Czy zadania są oceniane jako zbyt trudne/łatwe? Czy kandydaci otrzymują feedback?
    - **Komunikacja (`sekcja_5_komunikacja`):** Jakie są najczęstsze skargi? (np. czas oczekiwania, zachowanie rekrutera).
-   - **Głos Kandydata (`sekcja_8_otwarte`):** Zrób klasteryzację tematów z pól `co_poprawic` oraz `mocna_strona`. Wykryj powtarzające się wzorce (np. "zbyt długi proces", "miła atmosfera").
+   - **Głos Kandydata (`sekcja_8_otwarte`):** Jeśli poniżej znajduje się sekcja "Tematy odpowiedzi otwartych", opieraj się na niej - to klasteryzacja pól `co_poprawic` oraz `mocna_strona` z CAŁEGO korpusu (liczności i cytaty). W przeciwnym razie zrób klasteryzację tematów z tych pól samodzielnie. Wykryj powtarzające się wzorce (np. "zbyt długi proces", "miła atmosfera").
 
 4. **Segmentacja (opcjonalnie, jeśli dane pozwalają):**
    - Sprawdź, czy wyniki różnią się znacząco w zależności od `metadata.rekruter` lub `metadata.stanowisko`.
@@ -106,19 +107,28 @@ MODEL = "gemini-3-pro-preview"
 AGENT_APP_NAME = 'analyst_agent'
 
 
-def create_analytic_agent():
-  privatecorpus = VertexAiSearchTool(
-      search_engine_id = SEARCH_ENGINE_ID,
-      max_results = 10
-  )
+def create_analytic_agent(open_answer_themes: str = None):
+  instruction = instruction_prompt
+  if open_answer_themes:
+    instruction += f"""
+
+# Tematy odpowiedzi otwartych (klasteryzacja lokalna, cały korpus)
+{open_answer_themes}
+"""
+
+  # Model-atrapa działa bez Vertex AI Search (narzędzie wymaga modelu Gemini i ID silnika wyszukiwania)
+  tools = []
+  if not is_fake_backend():
+    tools.append(VertexAiSearchTool(
+        search_engine_id = SEARCH_ENGINE_ID,
+        max_results = 10
+    ))
 
   root_agent = Agent(
-          model=MODEL,
+          model=agent_model(MODEL, "analyst"),
           name=AGENT_APP_NAME,
           description="You are RAG expert",
-          instruction=instruction_prompt,
-          tools=[
-              privatecorpus
-          ]
+          instruction=instruction,
+          tools=tools
   )
   return root_agent
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""
+Lokalna klasteryzacja odpowiedzi otwartych (`sekcja_8_otwarte.co_poprawic` / `mocna_strona`).
+TF-IDF na zahashowanych cechach (słowa, bigramy, 4-gramy znakowe) + przyrostowe
+przypisywanie do najbliższego centroidu. Działa na całym korpusie w pamięci O(batch + klastry),
+a analityk dostaje gotowe tematy z licznościami i cytatami zamiast surowych odpowiedzi.
+"""
+
+import re
+import unicodedata
+import zlib
+from collections import Counter
+
+import numpy as np
+
+# Wymiar przestrzeni cech (hashing trick)
+N_FEATURES = 2 ** 12
+# Minimalne podobieństwo cosinusowe do dołączenia odpowiedzi do istniejącego klastra
+SIMILARITY_THRESHOLD = 0.3
+BATCH_SIZE = 512
+MAX_QUOTES = 3
+
+OPEN_FIELDS = ("co_poprawic", "mocna_strona")
+
+STOPWORDS = {
+    "i", "w", "z", "na", "do", "nie", "się", "to", "że", "o", "a", "jest", "był", "była",
+    "było", "by", "po", "od", "za", "dla", "co", "jak", "ale", "lub", "czy", "oraz", "bardzo",
+    "też", "tak", "tylko", "mnie", "mi", "ich", "go", "jej", "ten", "ta", "te", "tym", "przy",
+}
+
+# Odpowiedzi bez treści merytorycznej
+EMPTY_ANSWERS = {"", "brak", "brak danych", "n/d", "nie wiem", "-", "nic"}
+
+
+def normalize_text(text: str) -> str:
+    """Małe litery, bez interpunkcji i nadmiarowych spacji."""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _tokens(normalized: str) -> list[str]:
+    return [t for t in normalized.split() if t not in STOPWORDS and len(t) > 1]
+
+
+def _shingles(tokens: list[str]) -> list[str]:
+    """Cechy: słowa, bigramy słów i 4-gramy znakowe (odporne na polską fleksję)."""
+    features = list(tokens)
+    features += [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    for token in tokens:
+        padded = f"#{token}#"
+        features += [padded[i:i + 4] for i in range(max(1, len(padded) - 3))]
+    return features
+
+
+def _feature_ids(normalized: str) -> np.ndarray:
+    features = _shingles(_tokens(normalized))
+    return np.fromiter((zlib.crc32(f.encode("utf-8")) % N_FEATURES for f in features), dtype=np.int64)
+
+
+def _vectorize(batch_ids: list[np.ndarray], idf: np.ndarray) -> np.ndarray:
+    """Macierz TF-IDF (znormalizowana L2) dla paczki dokumentów."""
+    matrix = np.zeros((len(batch_ids), N_FEATURES), dtype=np.float32)
+    for row, ids in enumerate(batch_ids):
+        np.add.at(matrix[row], ids, 1.0)
+    matrix = np.log1p(matrix) * idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def cluster_answers(answers: list[str], threshold: float = SIMILARITY_THRESHOLD) -> list[dict]:
+    """Grupuje odpowiedzi w tematy.
+
+    Returns:
+        Lista tematów posortowana malejąco po liczności:
+        {"label": ..., "count": ..., "quotes": [...]}
+    """
+    texts = []
+    ids = []
+    for answer in answers:
+        normalized = normalize_text(answer)
+        if normalized in EMPTY_ANSWERS:
+            continue
+        feature_ids = _feature_ids(normalized)
+        if feature_ids.size == 0:
+            continue
+        texts.append(answer.strip())
+        ids.append(feature_ids)
+
+    if not texts:
+        return []
+
+    # Pierwsze przejście: częstość dokumentowa cech -> IDF
+    df = np.zeros(N_FEATURES, dtype=np.float32)
+    for feature_ids in ids:
+        df[np.unique(feature_ids)] += 1
+    idf = np.log((1 + len(ids)) / (1 + df)) + 1
+
+    # Drugie przejście: przyrostowe przypisywanie do centroidów.
+    # Trzymamy tylko sumy wektorów i ich normy (centroid = suma / norma), w macierzy
+    # z zapasem pojemności, żeby nie kopiować jej przy każdym nowym klastrze.
+    capacity = 64
+    centroid_sums = np.zeros((capacity, N_FEATURES), dtype=np.float32)
+    centroid_norms = np.ones(capacity, dtype=np.float32)
+    clusters: list[dict] = []
+
+    for start in range(0, len(ids), BATCH_SIZE):
+        vectors = _vectorize(ids[start:start + BATCH_SIZE], idf)
+        for offset, vector in enumerate(vectors):
+            text = texts[start + offset]
+            n_clusters = len(clusters)
+            if n_clusters:
+                similarities = (centroid_sums[:n_clusters] @ vector) / centroid_norms[:n_clusters]
+                best = int(np.argmax(similarities))
+                best_similarity = float(similarities[best])
+            else:
+                best, best_similarity = -1, 0.0
+
+            if best_similarity >= threshold:
+                centroid_sums[best] += vector
+                centroid_norms[best] = np.linalg.norm(centroid_sums[best])
+                cluster = clusters[best]
+            else:
+                if n_clusters == capacity:
+                    capacity *= 2
+                    centroid_sums = np.vstack([centroid_sums, np.zeros_like(centroid_sums)])
+                    centroid_norms = np.concatenate([centroid_norms, np.ones_like(centroid_norms)])
+                centroid_sums[n_clusters] = vector
+                centroid_norms[n_clusters] = 1.0
+                cluster = {"count": 0, "quotes": [], "words": Counter()}
+                clusters.append(cluster)
+                best_similarity = 1.0
+
+            cluster["count"] += 1
+            cluster["words"].update(_tokens(normalize_text(text)))
+            # Cytaty reprezentatywne: najbliższe centroidowi w chwili przypisania (bez powtórzeń)
+            if all(quote != text for _, quote in cluster["quotes"]):
+                cluster["quotes"].append((best_similarity, text))
+                cluster["quotes"].sort(key=lambda q: q[0], reverse=True)
+                del cluster["quotes"][MAX_QUOTES:]
+
+    themes = [
+        {
+            "label": ", ".join(word for word, _ in cluster["words"].most_common(3)),
+            "count": cluster["count"],
+            "quotes": [quote for _, quote in cluster["quotes"]],
+        }
+        for cluster in clusters
+    ]
+    themes.sort(key=lambda t: t["count"], reverse=True)
+    return themes
+
+
+def build_open_answer_themes(surveys: list[dict]) -> dict[str, list[dict]]:
+    """Tematy dla pól `co_poprawic` i `mocna_strona` z całego korpusu ankiet."""
+    answers = {field: [] for field in OPEN_FIELDS}
+    for survey in surveys:
+        section = survey.get("sekcja_8_otwarte") or {}
+        for field in OPEN_FIELDS:
+            value = section.get(field)
+            if isinstance(value, str):
+                answers[field].append(value)
+    return {field: cluster_answers(values) for field, values in answers.items()}
+
+
+def format_themes(themes: dict[str, list[dict]], max_themes: int = 10) -> str:
+    """Zwięzłe podsumowanie tematów w Markdown (do promptu analityka)."""
+    titles = {"co_poprawic": "Co poprawić", "mocna_strona": "Mocne strony"}
+    lines = []
+    for field, field_themes in themes.items():
+        total = sum(t["count"] for t in field_themes)
+        lines.append(f"### {titles.get(field, field)} ({total} odpowiedzi, {len(field_themes)} tematów)")
+        for theme in field_themes[:max_themes]:
+            quotes = "; ".join(f'"{q}"' for q in theme["quotes"])
+            lines.append(f"- **{theme['label']}** - {theme['count']} odp. Przykłady: {quotes}")
+    return "\n".join(lines)
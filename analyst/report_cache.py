@@ -0,0 +1,80 @@
+"""
+Cache raportów analitycznych.
+Powtarzające się pytania HR (np. "ogólny NPS") zwracane są natychmiast,
+dopóki w korpusie nie pojawią się nowe ukończone ankiety.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from typing import Optional
+
+# Maksymalna liczba zapamiętanych raportów (najstarsze są usuwane)
+MAX_ENTRIES = 256
+
+
+def normalize_question(question: str) -> str:
+    """Normalizuje pytanie: wielkość liter, białe znaki, interpunkcja na końcu."""
+    text = unicodedata.normalize("NFKC", question).lower().strip()
+    text = re.sub(r"\s+", " ", text)
+    return text.rstrip(" ?!.,;:")
+
+
+class ReportCache:
+    """Cache odpowiedzi analityka kluczowany (znormalizowane pytanie, wersja korpusu)."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: dict[tuple[str, str], dict] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, question: str, corpus_version: str) -> Optional[str]:
+        """Zwraca zapamiętany raport lub None (liczy trafienia i chybienia)."""
+        key = (normalize_question(question), corpus_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry["hits"] += 1
+            return entry["report"]
+
+    def put(self, question: str, corpus_version: str, report: str):
+        """Zapisuje raport dla pytania i bieżącej wersji korpusu."""
+        key = (normalize_question(question), corpus_version)
+        with self._lock:
+            # Wpisy dla starszych wersji korpusu są już bezużyteczne
+            for old_key in [k for k in self._entries if k[1] != corpus_version]:
+                del self._entries[old_key]
+            if len(self._entries) >= self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k]["created_at"])
+                del self._entries[oldest]
+            self._entries[key] = {"report": report, "created_at": time.time(), "hits": 0}
+
+    def invalidate(self, question: Optional[str] = None):
+        """Usuwa wpis dla pytania (we wszystkich wersjach) albo cały cache."""
+        with self._lock:
+            if question is None:
+                self._entries.clear()
+                return
+            normalized = normalize_question(question)
+            for key in [k for k in self._entries if k[0] == normalized]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        """Statystyki cache do wyświetlenia w panelu admina."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+report_cache = ReportCache()
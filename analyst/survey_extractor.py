@@ -0,0 +1,177 @@
+"""
+Ekstrakcja ustrukturyzowanej ankiety (sekcja_1_nps ... sekcja_8_otwarte)
+z historii czatu kandydata jednym wywołaniem modelu z wymuszonym schematem JSON.
+"""
+
+import json
+from datetime import datetime
+
+from google.genai import types
+
+import tracing
+from llm_client import get_genai_client
+
+MODEL = "gemini-2.0-flash-001"
+
+STAGES = [
+    "screening_telefoniczny",
+    "testy_wiedzy",
+    "zadanie_rekrutacyjne",
+    "rozmowa_techniczna",
+    "rozmowa_hiring_manager_1",
+    "rozmowa_hiring_manager_2",
+]
+
+TRANSPARENCY_AREAS = [
+    "obszar",
+    "etapy_procesu",
+    "kryteria_oceny",
+    "timeline_decyzji",
+    "wynagrodzenie_benefity",
+    "kultura_organizacyjna",
+]
+
+
+def _text_fields(*names: str) -> dict:
+    return {
+        "type": "OBJECT",
+        "properties": {name: {"type": "STRING"} for name in names},
+        "required": list(names),
+    }
+
+
+# Schemat odpowiedzi modelu (zgodny ze schematem danych analityka).
+# Oceny etapów są liczbami 1-5 lub null, gdy kandydat nie przechodził etapu ("N/D").
+SURVEY_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "stanowisko": {"type": "STRING"},
+        "rekruter": {"type": "STRING", "nullable": True},
+        "sekcja_1_nps": {
+            "type": "OBJECT",
+            "properties": {"odpowiedz": {"type": "INTEGER", "nullable": True}},
+            "required": ["odpowiedz"],
+        },
+        "sekcja_2_etapy": {
+            "type": "OBJECT",
+            "properties": {stage: {"type": "INTEGER", "nullable": True} for stage in STAGES},
+            "required": STAGES,
+        },
+        "sekcja_3_kompetencje": _text_fields("ocena_zadan", "dlugosc_zadan", "feedback"),
+        "sekcja_4_rozmowy": _text_fields("jakosc_pytan", "przygotowanie_rozmowcow", "powtarzalnosc_pytan"),
+        "sekcja_5_komunikacja": _text_fields("zachowanie_rekrutera", "czas_oczekiwania", "jakosc_informacji"),
+        "sekcja_6_transparentnosc": {
+            "type": "OBJECT",
+            "properties": {area: {"type": "BOOLEAN", "nullable": True} for area in TRANSPARENCY_AREAS},
+            "required": TRANSPARENCY_AREAS,
+        },
+        "sekcja_7_ogolna": _text_fields("liczba_etapow", "czas_trwania", "kategoryzacja"),
+        "sekcja_8_otwarte": _text_fields("co_poprawic", "mocna_strona", "kategoryzacja"),
+    },
+    "required": [
+        "stanowisko",
+        "sekcja_1_nps",
+        "sekcja_2_etapy",
+        "sekcja_3_kompetencje",
+        "sekcja_4_rozmowy",
+        "sekcja_5_komunikacja",
+        "sekcja_6_transparentnosc",
+        "sekcja_7_ogolna",
+        "sekcja_8_otwarte",
+    ],
+}
+
+EXTRACTION_PROMPT = """
+Jesteś analitykiem HR. Poniżej znajduje się zapis czatu feedbackowego z kandydatem.
+Wypełnij ankietę Candidate Experience WYŁĄCZNIE na podstawie tego, co kandydat powiedział.
+
+Zasady:
+- `sekcja_1_nps.odpowiedz`: liczba 0-10 podana przez kandydata, null jeśli nie padła.
+- `sekcja_2_etapy`: ocena 1-5 dla etapów, przez które kandydat przeszedł; null jeśli etapu nie było lub brak oceny.
+- `sekcja_6_transparentnosc`: true/false, null jeśli temat nie został poruszony.
+- Pola tekstowe: krótkie, rzeczowe podsumowanie słów kandydata po polsku; "Brak danych" jeśli temat nie padł.
+- `sekcja_8_otwarte.kategoryzacja`: "Pochwała - <temat>", "Krytyka - <temat>" lub "Neutralny - <temat>".
+- Nie wymyślaj odpowiedzi.
+
+Kontekst scenariusza: {context}
+
+[ZAPIS CZATU]
+{transcript}
+[KONIEC ZAPISU]
+"""
+
+
+class SurveyValidationError(ValueError):
+    """Odpowiedź modelu nie spełnia schematu ankiety."""
+
+
+def format_history(history: list) -> str:
+    """Zamienia historię czatu na tekst `AI: ...` / `Kandydat: ...`."""
+    lines = []
+    for msg in history:
+        speaker = "Kandydat" if msg.get("role") == "user" else "AI"
+        lines.append(f"{speaker}: {msg.get('content', '')}")
+    return "\n\n".join(lines)
+
+
+def validate_survey(survey: dict) -> dict:
+    """Sprawdza kompletność i zakresy wartości; zamienia brak oceny etapu na "N/D"."""
+    for key in SURVEY_SCHEMA["required"]:
+        if key not in survey:
+            raise SurveyValidationError(f"Brak sekcji {key}")
+
+    nps = survey["sekcja_1_nps"].get("odpowiedz")
+    if nps is not None and not (isinstance(nps, int) and 0 <= nps <= 10):
+        raise SurveyValidationError(f"NPS poza zakresem 0-10: {nps}")
+
+    stages = survey["sekcja_2_etapy"]
+    for stage in STAGES:
+        value = stages.get(stage)
+        if value is None:
+            stages[stage] = "N/D"
+        elif not (isinstance(value, int) and 1 <= value <= 5):
+            raise SurveyValidationError(f"Ocena etapu {stage} poza zakresem 1-5: {value}")
+
+    return survey
+
+
+def extract_survey(session_id: str, history: list, scenario: dict = None) -> dict:
+    """Wyciąga ankietę z historii rozmowy i zwraca dokument w formacie analityka.
+
+    Raises:
+        SurveyValidationError: gdy odpowiedź modelu nie przejdzie walidacji
+    """
+    scenario = scenario or {}
+    prompt = EXTRACTION_PROMPT.format(
+        context=scenario.get("context", "brak"),
+        transcript=format_history(history),
+    )
+
+    with tracing.model_call(MODEL):
+        response = get_genai_client().models.generate_content(
+            model=MODEL,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                temperature=0,
+                response_mime_type="application/json",
+                response_schema=SURVEY_SCHEMA,
+            ),
+        )
+    try:
+        extracted = json.loads(response.text)
+    except (TypeError, json.JSONDecodeError) as e:
+        raise SurveyValidationError(f"Niepoprawny JSON z modelu: {e}")
+
+    survey = validate_survey(extracted)
+    survey["sekcja_1_nps"]["pytanie"] = "Prawdopodobieństwo polecenia (0-10)"
+
+    return {
+        "id_ankiety": session_id,
+        "metadata": {
+            "data_wypelnienia": datetime.now().strftime("%Y-%m-%d"),
+            "stanowisko": survey.pop("stanowisko", "") or scenario.get("context", ""),
+            "rekruter": survey.pop("rekruter", None) or "N/A",
+            "kandydat": scenario.get("candidate_name", "N/A"),
+        },
+        **survey,
+    }
@@ -1,19 +1,32 @@
 import gradio as gr
 from agents import create_setup_agent #, create_analytics_agent, MODEL
 from analyst.agent import create_analytic_agent
+from agentPlanner.session_manager import PlannerSessionManager
+from events import open_session_updates, drain_session_updates
+from agentPlanner.bulk import read_candidates, create_scenarios_bulk, write_results_csv
+from analyst.report_cache import report_cache
+from analyst.clustering import build_open_answer_themes, format_themes
 
-from storage import save_scenario, get_all_transcripts, get_sessions_summary
+from storage import save_scenario, build_candidate_link, get_all_transcripts, get_all_surveys, query_sessions, get_completed_corpus_version, warm_up_storage
 from google.adk.agents import Agent
 from google.genai import types
+import asyncio
 import json
 import re
 import os
-import pypdf
+import latency
+import tracing
+
+from ingestion import ingest_file
+from agentPlanner.condenser import condense_document, format_condense_stats
 
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from google.adk.artifacts import InMemoryArtifactService
 
+# Limit treści pliku przekazywanej do czatu z plannerem, gdy kondensacja się nie powiedzie
+MAX_UPLOAD_CHARS = int(os.getenv("MAX_UPLOAD_CHARS", "2000"))
+
 # --- ZMIENNE STANU ---
 setup_agent = create_setup_agent()
 analytics_agent = None 
@@ -21,35 +34,44 @@ analytics_agent = None
 session_service = InMemorySessionService()
 artifact_service = InMemoryArtifactService()
 setup_runner = Runner(app_name="setup_app", agent=setup_agent, session_service=session_service, artifact_service=artifact_service)
+# Osobna rozmowa z plannerem dla każdej sesji przeglądarki (TTL + limit tur)
+planner_sessions = PlannerSessionManager(session_service, app_name="setup_app")
+# Połączenie z GCS zestawiane w tle przy starcie panelu
+warm_up_storage()
+# Eksport spanów (TRACING_EXPORTER=console / file)
+tracing.setup_tracing()
 
 
 # --- LOGIKA ZAKŁADKI 1: NOWY PROCES (SETUP) ---
 
-async def run_setup_agent_internal(message):
-    user_id = "admin_user"
-    sessions_response = await session_service.list_sessions(app_name="setup_app", user_id=user_id)
-    if sessions_response.sessions:
-        session = sessions_response.sessions[0]
-    else:
-        session = await session_service.create_session(app_name="setup_app", user_id=user_id)
+async def run_setup_agent_internal(message, owner_id):
+    session_id = await planner_sessions.get_session_id(owner_id)
+    user_id = planner_sessions.user_id(owner_id)
     
     content = types.Content(role='user', parts=[types.Part(text=message)])
-    events = setup_runner.run(user_id=user_id, session_id=session.id, new_message=content)
+    events = setup_runner.run(user_id=user_id, session_id=session_id, new_message=content)
     
     final_text = ""
-    for event in events:
-        if event.is_final_response():
-            final_text = event.content.parts[0].text
+    prompt_tokens = 0
+    with tracing.span("adk.run", **{"gen_ai.request.model": latency.model_name(setup_agent), "app": "setup_app"}):
+        for event in tracing.runner_events(events):
+            if event.usage_metadata and event.usage_metadata.prompt_token_count:
+                prompt_tokens = max(prompt_tokens, event.usage_metadata.prompt_token_count)
+            if event.is_final_response():
+                final_text = event.content.parts[0].text
+    await planner_sessions.record_turn(owner_id, prompt_tokens)
     return final_text
 
-async def chat_setup(message, history):
+@tracing.traced("chat_setup")
+async def chat_setup(message, history, request: gr.Request):
+    owner_id = request.session_hash
     if not message.strip():
-        return history, ""
+        return history, "", planner_sessions.describe(owner_id)
         
-    response_text = await run_setup_agent_internal(message)
+    response_text = await run_setup_agent_internal(message, owner_id)
     history.append({"role": "user", "content": message})
     history.append({"role": "assistant", "content": response_text})
-    return history, "" # Zwracamy pusty string, aby wyczyścić input
+    return history, "", planner_sessions.describe(owner_id) # Zwracamy pusty string, aby wyczyścić input
 
 async def generate_link_logic(history):
     """
@@ -82,10 +104,8 @@ async def generate_link_logic(history):
             scenario_data = json.loads(json_str)
             session_id = save_scenario(scenario_data)
             
-            # Dynamiczny URL zależny od środowiska
-            # Domyślnie http://127.0.0.1:7861 dla lokalnego uruchomienia app_candidac.py
-            base_url = os.getenv("BASE_URL", "http://127.0.0.1:7861")
-            link = f"{base_url}/?id={session_id}"
+            # Dynamiczny URL zależny od środowiska (BASE_URL)
+            link = build_candidate_link(session_id)
             
             return f"✅ Scenariusz zapisany!\nID Sesji: {session_id}\n\n🔗 LINK DLA KANDYDATA:\n{link}"
         except json.JSONDecodeError:
@@ -94,23 +114,128 @@ async def generate_link_logic(history):
         return "❌ Nie znaleziono bloku JSON w ostatniej wiadomości agenta. Poproś agenta o wygenerowanie podsumowania."
 
 
-def reset_setup():
-    global setup_agent
-    setup_agent = create_setup_agent()
-    return [], "Rozpoczęto nową sesję konfiguracji."
+async def reset_setup(request: gr.Request):
+    # Usuwamy sesję ADK - kolejny scenariusz nie dziedziczy historii poprzedniego
+    await planner_sessions.reset(request.session_hash)
+    return [], "Rozpoczęto nową sesję konfiguracji.", planner_sessions.describe(request.session_hash)
+
+# --- LISTA SESJI (stronicowanie po stronie serwera) ---
+
+SESSION_STATUSES = ["Wszystkie", "GENERATED", "ONGOING", "COMPLETED"]
+
+def _fetch_sessions_page(filters, cursors):
+    status, candidate, date_from, date_to, order, page_size = filters
+    page = query_sessions(
+        status=None if status == "Wszystkie" else status,
+        candidate=candidate,
+        date_from=date_from.strip() or None,
+        date_to=date_to.strip() or None,
+        descending=(order == "Najnowsze"),
+        page_size=int(page_size),
+        cursor=cursors[-1],
+    )
+    # Widoczne wiersze trzymamy w stanie serwera - aktualizacje na żywo nie odsyłają tabeli z przeglądarki
+    pager = {"cursors": cursors, "next_cursor": page["next_cursor"], "rows": page["rows"]}
+    info = f"Strona {len(cursors)} | wyników: {page['total']}"
+    return page["rows"], pager, info
+
+def refresh_sessions_list(status, candidate, date_from, date_to, order, page_size):
+    # Odświeżenie / zmiana filtrów zawsze wraca na pierwszą stronę
+    return _fetch_sessions_page((status, candidate, date_from, date_to, order, page_size), [None])
+
+def next_sessions_page(pager, status, candidate, date_from, date_to, order, page_size):
+    cursors = pager["cursors"]
+    if pager.get("next_cursor"):
+        cursors = cursors + [pager["next_cursor"]]
+    return _fetch_sessions_page((status, candidate, date_from, date_to, order, page_size), cursors)
+
+def prev_sessions_page(pager, status, candidate, date_from, date_to, order, page_size):
+    cursors = pager["cursors"][:-1] or [None]
+    return _fetch_sessions_page((status, candidate, date_from, date_to, order, page_size), cursors)
 
-def refresh_sessions_list():
-    return get_sessions_summary()
+# --- AKTUALIZACJE NA ŻYWO ---
+
+LIVE_UPDATE_INTERVAL = float(os.getenv("LIVE_UPDATE_INTERVAL", "2"))
+
+def apply_live_updates(subscription_id, pager, status, candidate, date_from, date_to, order, page_size):
+    """Nakłada zebrane zmiany sesji na widoczną stronę tabeli (bez ponownego odczytu storage)."""
+    if not subscription_id:
+        return gr.skip(), gr.skip()
+    updates = drain_session_updates(subscription_id)
+    if updates is None:
+        # Subskrypcja wygasła (np. karta w tle) i została odtworzona - zmiany z przerwy odczytujemy ze storage
+        rows, pager, _ = _fetch_sessions_page((status, candidate, date_from, date_to, order, page_size), pager["cursors"])
+        return rows, pager
+    if not updates:
+        return gr.skip(), gr.skip()
+
+    rows = [list(row) for row in pager.get("rows", [])]
+    visible = {row[0]: row for row in rows}
+    new_rows = []
+    for session_id, change in updates.items():
+        if session_id in visible:
+            visible[session_id][2] = change.get("status", visible[session_id][2])
+        elif "created_at" in change:
+            new_rows.append(change)
+
+    # Nowe sesje pokazujemy tylko na pierwszej stronie widoku "Najnowsze", jeśli pasują do filtrów
+    if new_rows and pager["cursors"] == [None] and order == "Najnowsze":
+        for change in sorted(new_rows, key=lambda c: c["created_at"]):
+            if status != "Wszystkie" and change.get("status") != status:
+                continue
+            if candidate.strip() and candidate.strip().lower() not in (change.get("candidate_name") or "").lower():
+                continue
+            if (date_from.strip() and change["created_at"][:10] < date_from.strip()) or (date_to.strip() and change["created_at"][:10] > date_to.strip()):
+                continue
+            rows.insert(0, [change["session_id"], change.get("candidate_name", "N/A"), change.get("status", "UNKNOWN"), change["created_at"], build_candidate_link(change["session_id"])])
+        rows = rows[:int(page_size)]
+
+    return rows, {**pager, "rows": rows}
+
+# --- TRYB MASOWY (CSV/XLSX) ---
+
+async def bulk_create_scenarios(file, progress=gr.Progress()):
+    if file is None:
+        return "❌ Wybierz plik CSV/XLSX z listą kandydatów.", None
+    try:
+        candidates = read_candidates(file.name)
+    except Exception as e:
+        return f"❌ Błąd odczytu pliku: {e}", None
+    if not candidates:
+        return "❌ Plik nie zawiera kandydatów.", None
+
+    progress(0, desc=f"Generowanie scenariuszy (0/{len(candidates)})")
+    def on_progress(done, total):
+        progress(done / total, desc=f"Generowanie scenariuszy ({done}/{total})")
+
+    rows = await create_scenarios_bulk(candidates, on_progress=on_progress)
+    failed = [row for row in rows if row["status"] != "OK"]
+    report = f"✅ Utworzono {len(rows) - len(failed)} z {len(rows)} scenariuszy."
+    if failed:
+        report += "\n\n❌ Błędy:\n" + "\n".join(f"- {row['candidate_name']}: {row['error']}" for row in failed[:20])
+        if len(failed) > 20:
+            report += f"\n- ... i {len(failed) - 20} więcej (szczegóły w pliku)"
+    return report, write_results_csv(rows)
 
 # --- LOGIKA ZAKŁADKI 2: ANALITYKA ---
 
-async def chat_analytics(message, history):
-    if not message.strip():
-        return history, ""
+# Tematy odpowiedzi otwartych dla bieżącej wersji korpusu (klasteryzacja tylko po zmianie korpusu)
+_themes_cache = {}
 
+def open_answer_themes_summary(corpus_version: str):
+    if corpus_version not in _themes_cache:
+        themes = build_open_answer_themes(get_all_surveys())
+        _themes_cache.clear()
+        _themes_cache[corpus_version] = format_themes(themes) if any(themes.values()) else None
+    return _themes_cache[corpus_version]
+
+async def run_analytics_agent_internal(message, corpus_version: str):
     global analytics_agent
     
-    analytics_agent = create_analytic_agent()
+    # Tematy z pól otwartych liczone lokalnie na całym korpusie - model dostaje gotowe klastry.
+    # Skan ankiet i klasteryzacja w wątku, żeby nie blokować pętli zdarzeń panelu.
+    themes_summary = await asyncio.to_thread(open_answer_themes_summary, corpus_version)
+    analytics_agent = create_analytic_agent(open_answer_themes=themes_summary)
     
     # Tworzymy tymczasowego runnera dla analityka
     analytics_runner = Runner(app_name="analytics_app", agent=analytics_agent, session_service=session_service, artifact_service=artifact_service)
@@ -123,13 +248,42 @@ async def chat_analytics(message, history):
     events = analytics_runner.run(user_id=user_id, session_id=session.id, new_message=content)
     
     final_text = ""
-    for event in events:
-        if event.is_final_response():
-            final_text = event.content.parts[0].text
+    with tracing.span("adk.run", **{"gen_ai.request.model": latency.model_name(analytics_agent), "app": "analytics_app"}):
+        for event in tracing.runner_events(events):
+            if event.is_final_response():
+                final_text = event.content.parts[0].text
+    return final_text
+
+def format_cache_stats():
+    stats = report_cache.stats()
+    return (
+        f"**Cache raportów:** {stats['entries']} wpisów | "
+        f"trafienia: {stats['hits']} | chybienia: {stats['misses']} | "
+        f"skuteczność: {stats['hit_ratio']:.0%}"
+    )
+
+@tracing.traced("chat_analytics")
+async def chat_analytics(message, history, force_refresh=False):
+    if not message.strip():
+        return history, "", format_cache_stats()
+
+    # Wersja korpusu zmienia się dopiero po pojawieniu się nowych ukończonych ankiet
+    corpus_version = await asyncio.to_thread(get_completed_corpus_version)
+    final_text = None if force_refresh else report_cache.get(message, corpus_version)
+    tracing.set_attributes(**{"report_cache.hit": final_text is not None})
+    
+    if final_text is None:
+        final_text = await run_analytics_agent_internal(message, corpus_version)
+        if final_text:
+            report_cache.put(message, corpus_version, final_text)
             
     history.append({"role": "user", "content": message})
     history.append({"role": "assistant", "content": final_text})
-    return history, ""
+    return history, "", format_cache_stats()
+
+def clear_report_cache():
+    report_cache.invalidate()
+    return format_cache_stats()
 
 
 # --- INTERFEJS ---
@@ -153,6 +307,7 @@ with gr.Blocks(title="HR Admin Dashboard", theme=gr.themes.Soft()) as demo:
                     with gr.Row():
                         btn_send = gr.Button("Wyślij", variant="primary", scale=2)
                         btn_upload = gr.UploadButton("📎 Wgraj CV/Notatki", file_types=[".txt", ".pdf", ".docx"], scale=1)
+                    upload_stats = gr.Markdown()
                 
                 with gr.Column(scale=1):
                     gr.Markdown("### ⚙️ Akcje")
@@ -160,52 +315,116 @@ with gr.Blocks(title="HR Admin Dashboard", theme=gr.themes.Soft()) as demo:
                     btn_generate = gr.Button("Generuj Link", variant="stop")
                     link_output = gr.Textbox(label="Wygenerowany Link", interactive=False, lines=3)
                     btn_reset = gr.Button("🔄 Resetuj Rozmowę")
+                    planner_info = gr.Markdown("Nowa sesja plannera.")
 
             # Obsługa zdarzeń
-            msg_setup.submit(chat_setup, [msg_setup, chatbot_setup], [chatbot_setup, msg_setup])
-            btn_send.click(chat_setup, [msg_setup, chatbot_setup], [chatbot_setup, msg_setup])
+            msg_setup.submit(chat_setup, [msg_setup, chatbot_setup], [chatbot_setup, msg_setup, planner_info])
+            btn_send.click(chat_setup, [msg_setup, chatbot_setup], [chatbot_setup, msg_setup, planner_info])
             
             # Obsługa pliku
-            def handle_file(file):
+            async def handle_file(file):
+                try:
+                    result = await ingest_file(file.name)
+                except Exception as e:
+                    return f"Błąd odczytu pliku: {str(e)}", ""
+
+                content = result["text"]
+                notes = []
+                if result.get("pages_skipped"):
+                    notes.append(f"pominięto {result['pages_skipped']} stron powyżej limitu")
+                if result.get("timed_out"):
+                    notes.append("część stron nie została odczytana w limicie czasu")
+                if result.get("failed_pages"):
+                    failed = result["failed_pages"]
+                    notes.append(f"nie udało się odczytać {len(failed)} stron ({', '.join(map(str, failed[:10]))}{', ...' if len(failed) > 10 else ''})")
+
+                # Długie dokumenty trafiają do plannera jako karta faktów, a nie pełny tekst
                 try:
-                    if file.name.lower().endswith('.pdf'):
-                        reader = pypdf.PdfReader(file.name)
-                        content = ""
-                        for page in reader.pages:
-                            content += page.extract_text() + "\n"
-                    else:
-                        with open(file.name, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                    return f"Przesyłam plik z danymi kandydata:\n\n{content[:2000]}..." 
+                    condensed = await condense_document(content)
+                    content = condensed["fact_sheet"]
+                    stats = format_condense_stats(condensed)
                 except Exception as e:
-                    return f"Błąd odczytu pliku: {str(e)}"
+                    stats = f"⚠️ Kondensacja nieudana ({e}), przekazano początek dokumentu."
+                    if len(content) > MAX_UPLOAD_CHARS:
+                        notes.append(f"obcięto {len(content) - MAX_UPLOAD_CHARS} znaków")
+                        content = content[:MAX_UPLOAD_CHARS]
+
+                suffix = f"\n\n[Uwaga: {'; '.join(notes)}]" if notes else ""
+                return f"Przesyłam plik z danymi kandydata:\n\n{content}{suffix}", stats
             
-            btn_upload.upload(handle_file, btn_upload, msg_setup)
+            btn_upload.upload(handle_file, btn_upload, [msg_setup, upload_stats])
             
             btn_generate.click(generate_link_logic, chatbot_setup, link_output)
-            btn_reset.click(reset_setup, None, [chatbot_setup, link_output])
+            btn_reset.click(reset_setup, None, [chatbot_setup, link_output, planner_info])
+
+        # ZAKŁADKA: TRYB MASOWY
+        with gr.TabItem("📦 Tryb masowy"):
+            gr.Markdown("### Masowe tworzenie scenariuszy\nWgraj CSV/XLSX z kolumnami: `candidate_name` (lub `kandydat`), `context`, `tone`. Otrzymasz plik z linkami dla kandydatów.")
+            bulk_file = gr.File(label="Lista kandydatów", file_types=[".csv", ".xlsx"])
+            btn_bulk = gr.Button("Generuj scenariusze i linki", variant="primary")
+            bulk_report = gr.Markdown()
+            bulk_output = gr.File(label="Linki dla kandydatów (CSV)", interactive=False)
+            btn_bulk.click(bulk_create_scenarios, bulk_file, [bulk_report, bulk_output])
 
         # ZAKŁADKA 2: LISTA SESJI
         with gr.TabItem("📋 Lista Sesji"):
             gr.Markdown("### Przegląd wszystkich procesów rekrutacyjnych")
+            with gr.Row():
+                filter_status = gr.Dropdown(SESSION_STATUSES, value="Wszystkie", label="Status")
+                filter_candidate = gr.Textbox(label="Kandydat", placeholder="Fragment imienia/nazwiska")
+                filter_date_from = gr.Textbox(label="Od (RRRR-MM-DD)")
+                filter_date_to = gr.Textbox(label="Do (RRRR-MM-DD)")
+                filter_order = gr.Dropdown(["Najnowsze", "Najstarsze"], value="Najnowsze", label="Sortowanie")
+                filter_page_size = gr.Dropdown(["20", "50", "100"], value="20", label="Na stronie")
             btn_refresh = gr.Button("🔄 Odśwież listę")
             sessions_table = gr.Dataframe(
                 headers=["ID Sesji", "Kandydat", "Status", "Data Utworzenia", "Link"],
                 datatype=["str", "str", "str", "str", "str"],
-                value=get_sessions_summary(),
                 interactive=False
             )
-            btn_refresh.click(refresh_sessions_list, None, sessions_table)
+            with gr.Row():
+                btn_prev_page = gr.Button("◀ Poprzednia")
+                page_info = gr.Markdown()
+                btn_next_page = gr.Button("Następna ▶")
+            sessions_pager = gr.State({"cursors": [None], "next_cursor": None})
+
+            session_filters = [filter_status, filter_candidate, filter_date_from, filter_date_to, filter_order, filter_page_size]
+            page_outputs = [sessions_table, sessions_pager, page_info]
+            btn_refresh.click(refresh_sessions_list, session_filters, page_outputs)
+            for control in [filter_status, filter_order, filter_page_size]:
+                control.change(refresh_sessions_list, session_filters, page_outputs)
+            for control in [filter_candidate, filter_date_from, filter_date_to]:
+                control.submit(refresh_sessions_list, session_filters, page_outputs)
+            btn_next_page.click(next_sessions_page, [sessions_pager] + session_filters, page_outputs)
+            btn_prev_page.click(prev_sessions_page, [sessions_pager] + session_filters, page_outputs)
+            # Pierwsza strona pobierana przy otwarciu panelu, a nie przy budowaniu UI
+            demo.load(refresh_sessions_list, session_filters, page_outputs)
+
+            # Zmiany statusów wypychane z magistrali zdarzeń (scalane między tyknięciami timera)
+            live_subscription = gr.State()
+            live_timer = gr.Timer(LIVE_UPDATE_INTERVAL)
+            demo.load(open_session_updates, None, live_subscription)
+            live_timer.tick(
+                apply_live_updates,
+                [live_subscription, sessions_pager] + session_filters,
+                [sessions_table, sessions_pager],
+                show_progress="hidden",
+            )
 
         # ZAKŁADKA 3: ANALITYKA
         with gr.TabItem("📊 Analityka"):
             gr.Markdown("### Analiza zbiorcza")
             chatbot_analytics = gr.Chatbot(height=600, type="messages")
             msg_analytics = gr.Textbox(label="Pytanie do Analityka", placeholder="Jakie są najczęstsze powody odrzuceń?", lines=3)
-            btn_send_analytics = gr.Button("Zapytaj", variant="primary")
+            with gr.Row():
+                btn_send_analytics = gr.Button("Zapytaj", variant="primary", scale=2)
+                chk_force_refresh = gr.Checkbox(label="Wymuś odświeżenie (pomiń cache)", value=False, scale=1)
+                btn_clear_cache = gr.Button("🧹 Wyczyść cache raportów", scale=1)
+            cache_stats = gr.Markdown(format_cache_stats())
             
-            msg_analytics.submit(chat_analytics, [msg_analytics, chatbot_analytics], [chatbot_analytics, msg_analytics])
-            btn_send_analytics.click(chat_analytics, [msg_analytics, chatbot_analytics], [chatbot_analytics, msg_analytics])
+            msg_analytics.submit(chat_analytics, [msg_analytics, chatbot_analytics, chk_force_refresh], [chatbot_analytics, msg_analytics, cache_stats])
+            btn_send_analytics.click(chat_analytics, [msg_analytics, chatbot_analytics, chk_force_refresh], [chatbot_analytics, msg_analytics, cache_stats])
+            btn_clear_cache.click(clear_report_cache, None, cache_stats)
 
 if __name__ == "__main__":
     demo.launch(server_port=7860)
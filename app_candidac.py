@@ -1,7 +1,15 @@
 import gradio as gr
+import json
 import os
+import threading
+from collections import OrderedDict
+import latency
+import metrics
+import tracing
 from interviewer.agent import create_interview_agent
-from storage import get_scenario, save_transcript, update_session_status, get_transcript
+from storage import get_scenario, update_session_status, get_transcript, load_session_data, warm_up_storage
+from survey_pipeline import start_survey_pipeline
+from transcript_writer import start_transcript_writer
 import time
 
 from google.adk.runners import Runner
@@ -9,11 +17,21 @@ from google.adk.sessions import InMemorySessionService
 from google.adk.artifacts import InMemoryArtifactService
 from google.genai import types
 
+# Eksport spanów (TRACING_EXPORTER=console / file)
+tracing.setup_tracing()
+
 # Cache dla agentów w pamięci
 active_runners = {}
 session_service = InMemorySessionService()
 artifact_service = InMemoryArtifactService()
 
+# Ekstrakcja ankiet w tle po zakończeniu rozmowy (COMPLETED)
+start_survey_pipeline()
+# Zapis transkryptów w tle - tura nie czeka na upload
+transcript_writer = start_transcript_writer()
+# Uwierzytelnienie i połączenia z GCS zestawiane przed pierwszą rozmową
+warm_up_storage()
+
 DISCLAIMER_TEXT = """
 👋 **Witaj!**
 
@@ -27,78 +45,189 @@ Jeśli nie wyrażasz zgody na przetwarzanie tej rozmowy, po prostu zamknij to ok
 Aby rozpocząć, napisz "Cześć" lub odpowiedz na pierwsze pytanie, jeśli się pojawi.
 """
 
-def user_turn(message, history):
-    if not message or not message.strip():
-        return history, message
+# --- HISTORIA PO STRONIE SERWERA ---
+# Autorytatywna historia rozmów trzymana w pamięci serwera (klucz: session_id).
+# Przeglądarka wysyła tylko nową wiadomość, a dostaje okno ostatnich wiadomości,
+# więc rozmiar danych na turę nie rośnie liniowo z długością rozmowy.
+# Porzucone rozmowy nie zostają w pamięci na zawsze: usuwamy najdawniej używane po przekroczeniu
+# limitu lub bezczynności - powrót kandydata odczyta historię ponownie (bufor zapisu / storage).
+conversations: OrderedDict[str, list] = OrderedDict()
+_conversation_last_used: dict[str, float] = {}
+_conversations_lock = threading.Lock()
+MAX_CONVERSATIONS = int(os.getenv("MAX_CONVERSATIONS", "1000"))
+CONVERSATION_IDLE_TTL = float(os.getenv("CONVERSATION_IDLE_TTL", "3600"))
+
+# Liczba ostatnich wiadomości wysyłanych do przeglądarki
+CHAT_WINDOW = int(os.getenv("CHAT_WINDOW", "30"))
+
+# Pomiar bajtów na turę: "full" = dawny model (pełna historia w obie strony), "delta" = obecny
+payload_stats = {"turns": 0, "full_bytes": 0, "delta_bytes": 0}
+
+def _payload_bytes(value) -> int:
+    return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+def _record_payload(session_id, message, history, window):
+    full = 2 * _payload_bytes(history)  # pełna historia do serwera i z powrotem
+    delta = _payload_bytes(message) + _payload_bytes(window)
+    payload_stats["turns"] += 1
+    payload_stats["full_bytes"] += full
+    payload_stats["delta_bytes"] += delta
+    metrics.inc("interview_payload_bytes_total", delta, mode="delta")
+    metrics.inc("interview_payload_bytes_total", full, mode="full")
+
+def _evict_conversations(now):
+    # Wywoływane pod blokadą; kolejność OrderedDict = kolejność ostatniego użycia
+    while conversations:
+        session_id = next(iter(conversations))
+        if len(conversations) <= MAX_CONVERSATIONS and now - _conversation_last_used[session_id] < CONVERSATION_IDLE_TTL:
+            break
+        conversations.pop(session_id)
+        _conversation_last_used.pop(session_id, None)
+
+def drop_conversation(session_id):
+    with _conversations_lock:
+        conversations.pop(session_id, None)
+        _conversation_last_used.pop(session_id, None)
+
+def get_history(session_id, stored_history=None):
+    """Zwraca historię z pamięci serwera (przy pierwszym użyciu ładuje ją ze storage)."""
+    with _conversations_lock:
+        history = conversations.get(session_id)
+        if history is not None:
+            conversations.move_to_end(session_id)
+            _conversation_last_used[session_id] = time.monotonic()
+    metrics.cache_lookup("conversation", history is not None)
+    if history is not None:
+        return history
+
+    if stored_history is None:
+        # Niezapisana jeszcze wersja z bufora zapisu jest nowsza niż ta w storage
+        stored_history = transcript_writer.pending_history(session_id) or get_transcript(session_id)
+    history = stored_history or [{"role": "assistant", "content": DISCLAIMER_TEXT}]
+    with _conversations_lock:
+        # Równoległe żądanie mogło już załadować tę rozmowę - zostaje jedna wspólna lista
+        history = conversations.setdefault(session_id, history)
+        conversations.move_to_end(session_id)
+        now = time.monotonic()
+        _conversation_last_used[session_id] = now
+        _evict_conversations(now)
+    return history
+
+def history_window(history, window_size):
+    return history[-window_size:]
+
+def show_earlier(session_id, window_size):
+    window_size += CHAT_WINDOW
+    if not session_id:
+        return gr.skip(), window_size
+    return history_window(get_history(session_id), window_size), window_size
+
+def user_turn(message, session_id, window_size):
+    if not message or not message.strip() or not session_id:
+        return gr.skip(), message
+    history = get_history(session_id)
     history.append({"role": "user", "content": message})
     # Nie dodajemy placeholdera, Gradio samo pokaże "..." podczas przetwarzania bot_turn
-    return history, ""
+    return history_window(history, window_size), ""
+
+@tracing.traced("bot_turn")
+@metrics.track_in_flight("interview_turns_in_flight")
+async def bot_turn(session_id_state, is_started_state, window_size):
+    if not session_id_state:
+        error = [{"role": "assistant", "content": "⚠️ BŁĄD: Brak ID sesji. Upewnij się, że link jest poprawny."}]
+        return error, is_started_state, gr.update(interactive=False), gr.update(interactive=False)
+
+    history = get_history(session_id_state)
 
-async def bot_turn(history, session_id_state, is_started_state):
     # Pobieramy ostatnią wiadomość użytkownika
     if not history or history[-1]['role'] != 'user':
-        return history, is_started_state, gr.update(), gr.update()
+        return gr.skip(), is_started_state, gr.update(), gr.update()
         
     message = history[-1]['content']
-    
-    if not session_id_state:
-        history.append({"role": "assistant", "content": "⚠️ BŁĄD: Brak ID sesji. Upewnij się, że link jest poprawny."})
-        return history, is_started_state, gr.update(interactive=False), gr.update(interactive=False)
-
-    # 1. Aktualizacja statusu na ONGOING przy pierwszej wiadomości
-    if not is_started_state:
-        update_session_status(session_id_state, "ONGOING")
-        is_started_state = True
-
-    # 2. Inicjalizacja agenta (jeśli nie istnieje w cache)
-    if session_id_state not in active_runners:
-        scenario_data = get_scenario(session_id_state)
-        if not scenario_data:
-            history.append({"role": "assistant", "content": "⚠️ BŁĄD: Nie znaleziono scenariusza."})
-            return history, is_started_state, gr.update(interactive=False), gr.update(interactive=False)
-        
-        # Jeśli odtwarzamy agenta po restarcie, przekazujemy mu historię (bez ostatniej wiadomości, którą zaraz przetworzy)
-        # Dzięki temu AI "pamięta" co było wcześniej, nawet jeśli pamięć RAM serwera została wyczyszczona.
-        past_history = history[:-1] if len(history) > 1 else []
-        agent = create_interview_agent(scenario_data, history_context=past_history)
+    # Pomiar faz tury (LATENCY_METRICS=0 - no-op)
+    turn = latency.start_turn(session_id_state)
+    try:
+        tracing.set_attributes(**{"session.id": session_id_state})
+
+        # 1. Aktualizacja statusu na ONGOING przy pierwszej wiadomości
+        if not is_started_state:
+            with turn.phase(latency.STATUS_UPDATE):
+                update_session_status(session_id_state, "ONGOING")
+            is_started_state = True
+
+        # 2. Inicjalizacja agenta (jeśli nie istnieje w cache)
+        metrics.cache_lookup("runner", session_id_state in active_runners)
+        if session_id_state not in active_runners:
+            with turn.phase(latency.SCENARIO_FETCH):
+                scenario_data = get_scenario(session_id_state)
+            if not scenario_data:
+                history.append({"role": "assistant", "content": "⚠️ BŁĄD: Nie znaleziono scenariusza."})
+                return history_window(history, window_size), is_started_state, gr.update(interactive=False), gr.update(interactive=False)
         
-        runner = Runner(app_name=f"interview_{session_id_state}", agent=agent, session_service=session_service, artifact_service=artifact_service)
-        active_runners[session_id_state] = runner
+            # Jeśli odtwarzamy agenta po restarcie, przekazujemy mu historię (bez ostatniej wiadomości, którą zaraz przetworzy)
+            # Dzięki temu AI "pamięta" co było wcześniej, nawet jeśli pamięć RAM serwera została wyczyszczona.
+            past_history = history[:-1] if len(history) > 1 else []
+            with turn.phase(latency.RUNNER_BUILD):
+                agent = create_interview_agent(scenario_data, history_context=past_history)
+                runner = Runner(app_name=f"interview_{session_id_state}", agent=agent, session_service=session_service, artifact_service=artifact_service)
+            active_runners[session_id_state] = runner
     
-    runner = active_runners[session_id_state]
+        runner = active_runners[session_id_state]
+        turn.set_model(latency.model_name(runner.agent))
     
-    # 3. Rozmowa ADK
-    user_id = f"candidate_{session_id_state}"
+        # 3. Rozmowa ADK
+        user_id = f"candidate_{session_id_state}"
     
-    adk_sessions_response = await session_service.list_sessions(app_name=f"interview_{session_id_state}", user_id=user_id)
-    if adk_sessions_response.sessions:
-        adk_session = adk_sessions_response.sessions[0]
-    else:
-        adk_session = await session_service.create_session(app_name=f"interview_{session_id_state}", user_id=user_id)
+        with turn.phase(latency.ADK_SESSION):
+            adk_sessions_response = await session_service.list_sessions(app_name=f"interview_{session_id_state}", user_id=user_id)
+            if adk_sessions_response.sessions:
+                adk_session = adk_sessions_response.sessions[0]
+            else:
+                adk_session = await session_service.create_session(app_name=f"interview_{session_id_state}", user_id=user_id)
 
-    content = types.Content(role='user', parts=[types.Part(text=message)])
-    events = runner.run(user_id=user_id, session_id=adk_session.id, new_message=content)
+        content = types.Content(role='user', parts=[types.Part(text=message)])
+        events = runner.run(user_id=user_id, session_id=adk_session.id, new_message=content)
     
-    response_text = ""
-    for event in events:
-        if event.is_final_response():
-            response_text = event.content.parts[0].text
+        response_text = ""
+        with tracing.span("adk.run", **{"gen_ai.request.model": latency.model_name(runner.agent), "session.id": session_id_state}):
+            for event in turn.model_events(tracing.runner_events(events)):
+                if event.is_final_response():
+                    response_text = event.content.parts[0].text
     
-    # 4. Sprawdzenie końca rozmowy
-    is_finished = "[KONIEC]" in response_text
-    clean_response = response_text.replace("[KONIEC]", "").strip()
+        # 4. Sprawdzenie końca rozmowy
+        is_finished = "[KONIEC]" in response_text
+        clean_response = response_text.replace("[KONIEC]", "").strip()
     
-    # Dodajemy odpowiedź bota
-    history.append({"role": "assistant", "content": clean_response})
+        # Dodajemy odpowiedź bota
+        history.append({"role": "assistant", "content": clean_response})
     
-    # 5. Zapis historii
-    save_transcript(session_id_state, history)
+        # 5. Zapis historii (w tle, kolejne tury tej samej sesji są scalane) - tura mierzy tylko przekazanie do bufora
+        with turn.phase(latency.TRANSCRIPT_ENQUEUE):
+            transcript_writer.submit(session_id_state, history)
+
+        window = history_window(history, window_size)
+        _record_payload(session_id_state, message, history, window)
     
-    if is_finished:
-        update_session_status(session_id_state, "COMPLETED")
-        return history, is_started_state, gr.update(interactive=False, placeholder="Rozmowa zakończona. Dziękujemy!"), gr.update(interactive=False)
+        if is_finished:
+            # Transkrypt musi być zapisany, zanim status COMPLETED uruchomi ekstrakcję ankiety
+            with turn.phase(latency.TRANSCRIPT_FLUSH):
+                saved = transcript_writer.flush(session_id_state)
+            if saved:
+                with turn.phase(latency.STATUS_UPDATE):
+                    update_session_status(session_id_state, "COMPLETED")
+                # Zakończona rozmowa nie musi dłużej zajmować pamięci - w razie potrzeby wróci ze storage
+                drop_conversation(session_id_state)
+            else:
+                # Zapis wrócił do bufora: COMPLETED ustawi dopiero udana ponowna próba zapisu w tle
+                print(f"Transkrypt sesji {session_id_state} niezapisany - status COMPLETED po ponownym zapisie")
+                transcript_writer.call_after_save(
+                    session_id_state, lambda: update_session_status(session_id_state, "COMPLETED"),
+                )
+            return window, is_started_state, gr.update(interactive=False, placeholder="Rozmowa zakończona. Dziękujemy!"), gr.update(interactive=False)
     
-    return history, is_started_state, gr.update(interactive=True), gr.update(interactive=True)
+        return window, is_started_state, gr.update(interactive=True), gr.update(interactive=True)
+    finally:
+        turn.finish()
 
 def load_session(request: gr.Request):
     params = dict(request.query_params)
@@ -110,21 +239,17 @@ def load_session(request: gr.Request):
     placeholder_text = "Napisz wiadomość..."
 
     if session_id:
+        # Scenariusz i transkrypt pobierane równolegle
+        scenario, stored_history = load_session_data(session_id)
+
         # Sprawdzenie statusu sesji
-        scenario = get_scenario(session_id)
         if scenario and scenario.get("status") == "COMPLETED":
             is_interactive = False
             placeholder_text = "Rozmowa zakończona. Dziękujemy!"
 
-        # Próba załadowania istniejącej historii
-        existing_history = get_transcript(session_id)
-        if existing_history:
-            history = existing_history
-        else:
-            # Początkowa historia z disclaimerem
-            history = [
-                {"role": "assistant", "content": DISCLAIMER_TEXT}
-            ]
+        # Historia (istniejąca lub początkowa z disclaimerem) trafia do pamięci serwera,
+        # a do przeglądarki wysyłamy tylko okno ostatnich wiadomości
+        history = history_window(get_history(session_id, stored_history), CHAT_WINDOW)
     else:
         history = [
             {"role": "assistant", "content": "⚠️ BŁĄD: Brak ID sesji w linku."}
@@ -208,6 +333,7 @@ function() {
 with gr.Blocks(title="Rozmowa Rekrutacyjna", theme=theme, css=custom_css, js=js_force_light) as demo:
     session_id_state = gr.State()
     is_started_state = gr.State(False)
+    window_size_state = gr.State(CHAT_WINDOW)
     
     with gr.Column():
         # Nagłówek
@@ -220,6 +346,7 @@ with gr.Blocks(title="Rozmowa Rekrutacyjna", theme=theme, css=custom_css, js=js_
             """
         )
         
+        btn_earlier = gr.Button("⬆ Wcześniejsze wiadomości", size="sm", variant="secondary")
         chatbot = gr.Chatbot(
             height=500, 
             type="messages", 
@@ -246,12 +373,14 @@ with gr.Blocks(title="Rozmowa Rekrutacyjna", theme=theme, css=custom_css, js=js_
     demo.load(load_session, None, [session_id_state, chatbot, msg, btn_send])
     
     # Obsługa wysyłania
-    msg.submit(user_turn, [msg, chatbot], [chatbot, msg], queue=False).then(
-        bot_turn, [chatbot, session_id_state, is_started_state], [chatbot, is_started_state, msg, btn_send]
+    # Do serwera trafia tylko nowa wiadomość - historia jest przechowywana po stronie serwera
+    msg.submit(user_turn, [msg, session_id_state, window_size_state], [chatbot, msg], queue=False).then(
+        bot_turn, [session_id_state, is_started_state, window_size_state], [chatbot, is_started_state, msg, btn_send]
     )
-    btn_send.click(user_turn, [msg, chatbot], [chatbot, msg], queue=False).then(
-        bot_turn, [chatbot, session_id_state, is_started_state], [chatbot, is_started_state, msg, btn_send]
+    btn_send.click(user_turn, [msg, session_id_state, window_size_state], [chatbot, msg], queue=False).then(
+        bot_turn, [session_id_state, is_started_state, window_size_state], [chatbot, is_started_state, msg, btn_send]
     )
+    btn_earlier.click(show_earlier, [session_id_state, window_size_state], [chatbot, window_size_state], queue=False)
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 7861))
@@ -0,0 +1,130 @@
+"""
+Prosta magistrala zdarzeń działająca w obrębie procesu.
+Storage publikuje zmiany sesji, a zainteresowane moduły (np. pipeline ankiet)
+subskrybują je bez tworzenia zależności cyklicznych.
+"""
+
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Callable
+
+# Typy zdarzeń
+SESSION_STATUS_CHANGED = "session_status_changed"
+SCENARIO_SAVED = "scenario_saved"
+
+# Subskrypcje dashboardów nieodbierane dłużej niż TTL (zamknięta karta) są usuwane;
+# odczyt wygasłej subskrypcji (np. karta wraca z tła) odtwarza ją pod tym samym ID
+SUBSCRIPTION_TTL = 300
+
+_subscribers: dict[str, list[Callable[[dict], None]]] = defaultdict(list)
+_lock = threading.Lock()
+
+
+def subscribe(event_type: str, callback: Callable[[dict], None]):
+    """Rejestruje funkcję wywoływaną przy każdym zdarzeniu danego typu."""
+    with _lock:
+        if callback not in _subscribers[event_type]:
+            _subscribers[event_type].append(callback)
+
+
+def unsubscribe(event_type: str, callback: Callable[[dict], None]):
+    """Wyrejestrowuje wcześniej dodaną funkcję."""
+    with _lock:
+        if callback in _subscribers[event_type]:
+            _subscribers[event_type].remove(callback)
+
+
+def publish(event_type: str, payload: dict):
+    """Przekazuje zdarzenie wszystkim subskrybentom.
+
+    Subskrybenci są wywoływani synchronicznie, więc powinni jedynie odłożyć pracę
+    (np. do kolejki). Błąd jednego subskrybenta nie przerywa pozostałych.
+    """
+    with _lock:
+        callbacks = list(_subscribers[event_type])
+    for callback in callbacks:
+        try:
+            callback(payload)
+        except Exception as e:
+            print(f"Błąd subskrybenta zdarzenia {event_type}: {e}")
+
+
+# --- SUBSKRYPCJE Z BUFOROWANIEM (np. otwarte dashboardy admina) ---
+
+class SessionUpdatesSubscription:
+    """Bufor zmian sesji dla jednego odbiorcy.
+
+    Kolejne zdarzenia dla tej samej sesji są scalane (coalescing), więc seria zmian
+    między odczytami daje jedną aktualizację wiersza.
+    """
+
+    def __init__(self, subscription_id: str = None):
+        self.id = subscription_id or uuid.uuid4().hex
+        self.last_drained = time.time()
+        self._pending: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, payload: dict):
+        with self._lock:
+            self._pending.setdefault(payload["session_id"], {}).update(payload)
+
+    def drain(self) -> dict[str, dict]:
+        """Zwraca i czyści zebrane zmiany (session_id -> scalone pola)."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self.last_drained = time.time()
+        return pending
+
+
+_subscriptions: dict[str, SessionUpdatesSubscription] = {}
+_subscriptions_lock = threading.Lock()
+
+
+def open_session_updates(subscription_id: str = None) -> str:
+    """Tworzy subskrypcję zmian sesji (opcjonalnie o podanym ID) i zwraca jej ID."""
+    _expire_subscriptions()
+    subscription = SessionUpdatesSubscription(subscription_id)
+    with _subscriptions_lock:
+        previous = _subscriptions.get(subscription.id)
+        if previous is not None:
+            return previous.id
+        _subscriptions[subscription.id] = subscription
+    subscribe(SCENARIO_SAVED, subscription)
+    subscribe(SESSION_STATUS_CHANGED, subscription)
+    return subscription.id
+
+
+def close_session_updates(subscription_id: str):
+    with _subscriptions_lock:
+        subscription = _subscriptions.pop(subscription_id, None)
+    if subscription:
+        unsubscribe(SCENARIO_SAVED, subscription)
+        unsubscribe(SESSION_STATUS_CHANGED, subscription)
+
+
+def drain_session_updates(subscription_id: str) -> dict[str, dict]:
+    """Zebrane zmiany dla subskrypcji.
+
+    Returns:
+        session_id -> scalone pola; None, gdy subskrypcja wygasła - zostaje wtedy odtworzona
+        pod tym samym ID, a odbiorca powinien przeładować widok (zmiany z przerwy przepadły).
+    """
+    with _subscriptions_lock:
+        subscription = _subscriptions.get(subscription_id)
+    if subscription is None:
+        open_session_updates(subscription_id)
+        return None
+    return subscription.drain()
+
+
+def _expire_subscriptions():
+    now = time.time()
+    with _subscriptions_lock:
+        expired = [
+            subscription_id for subscription_id, subscription in _subscriptions.items()
+            if now - subscription.last_drained > SUBSCRIPTION_TTL
+        ]
+    for subscription_id in expired:
+        close_session_updates(subscription_id)
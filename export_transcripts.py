@@ -0,0 +1,131 @@
+"""
+Strumieniowy eksport rozmów (scenariusz + transkrypt) do NDJSON lub Parquet.
+
+Sesje są czytane i zapisywane jedna po drugiej (Parquet: paczkami jako row groups),
+więc zużycie pamięci nie zależy od wielkości korpusu.
+
+Użycie:
+    python export_transcripts.py --output rozmowy.ndjson --status COMPLETED --from 2025-12-01 --to 2025-12-31
+    python export_transcripts.py --output rozmowy.ndjson.gz
+    python export_transcripts.py --output rozmowy.parquet --format parquet   (wymaga pyarrow)
+    python export_transcripts.py --output - | jq .session_id
+"""
+
+import argparse
+import gzip
+import sys
+import time
+from typing import BinaryIO, Iterable, Union
+
+from storage import iter_sessions
+from storage_backends import serialization
+
+PARQUET_BATCH_SIZE = 500
+
+
+def write_ndjson(sessions: Iterable[dict], stream: BinaryIO) -> int:
+    """Zapisuje sesje jako NDJSON (jeden obiekt JSON na linię). Zwraca liczbę sesji."""
+    count = 0
+    for session in sessions:
+        stream.write(serialization.dumps(session))
+        stream.write(b"\n")
+        count += 1
+    return count
+
+
+def _parquet_schema():
+    import pyarrow as pa
+    message = pa.struct([("role", pa.string()), ("content", pa.string())])
+    return pa.schema([
+        ("session_id", pa.string()),
+        ("candidate_name", pa.string()),
+        ("status", pa.string()),
+        ("created_at", pa.string()),
+        ("updated_at", pa.string()),
+        ("context", pa.string()),
+        ("history", pa.list_(message)),
+    ])
+
+
+def write_parquet(sessions: Iterable[dict], sink: Union[str, BinaryIO], batch_size: int = PARQUET_BATCH_SIZE) -> int:
+    """Zapisuje sesje do pliku Parquet paczkami po `batch_size` wierszy. Zwraca liczbę sesji."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Eksport do Parquet wymaga pakietu pyarrow (pip install pyarrow).")
+
+    schema = _parquet_schema()
+    count = 0
+    batch = []
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for session in sessions:
+            session = dict(session)
+            session["history"] = [
+                {"role": str(m.get("role", "")), "content": str(m.get("content", ""))}
+                for m in session.get("history") or []
+            ]
+            batch.append(session)
+            count += 1
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    return count
+
+
+def export_transcripts(
+    output: Union[str, BinaryIO],
+    fmt: str = "ndjson",
+    status: str = None,
+    date_from: str = None,
+    date_to: str = None,
+) -> int:
+    """Eksportuje rozmowy spełniające filtry do pliku (ścieżka, `-` = stdout) lub strumienia binarnego.
+
+    Args:
+        output: Ścieżka pliku (`.gz` = NDJSON kompresowany gzip), `-` lub otwarty strumień binarny
+        fmt: `ndjson` lub `parquet`
+        status: Dokładny status sesji (np. COMPLETED)
+        date_from: Data utworzenia od `RRRR-MM-DD` (włącznie)
+        date_to: Data utworzenia do `RRRR-MM-DD` (włącznie)
+
+    Returns:
+        Liczba wyeksportowanych sesji
+    """
+    sessions = iter_sessions(status=status, date_from=date_from, date_to=date_to)
+
+    if fmt == "parquet":
+        if output == "-":
+            output = sys.stdout.buffer
+        return write_parquet(sessions, output)
+    if fmt != "ndjson":
+        raise ValueError(f"Nieznany format eksportu: {fmt}")
+
+    if output == "-":
+        return write_ndjson(sessions, sys.stdout.buffer)
+    if not isinstance(output, str):
+        return write_ndjson(sessions, output)
+    opener = gzip.open if output.endswith(".gz") else open
+    with opener(output, "wb") as stream:
+        return write_ndjson(sessions, stream)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eksport rozmów do NDJSON / Parquet")
+    parser.add_argument("--output", "-o", required=True, help="Plik wynikowy lub - (stdout)")
+    parser.add_argument("--format", "-f", choices=["ndjson", "parquet"], help="Domyślnie na podstawie rozszerzenia pliku")
+    parser.add_argument("--status", choices=["GENERATED", "ONGOING", "COMPLETED"])
+    parser.add_argument("--from", dest="date_from", help="Data utworzenia od (RRRR-MM-DD)")
+    parser.add_argument("--to", dest="date_to", help="Data utworzenia do (RRRR-MM-DD)")
+    args = parser.parse_args()
+
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "ndjson")
+    start = time.perf_counter()
+    count = export_transcripts(args.output, fmt=fmt, status=args.status, date_from=args.date_from, date_to=args.date_to)
+    print(f"Wyeksportowano {count} rozmów ({fmt}) w {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
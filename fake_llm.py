@@ -0,0 +1,424 @@
+"""
+Deterministyczny model-atrapa do benchmarków i testów obciążeniowych bez sieci i bez kosztów Gemini.
+
+LLM_BACKEND=fake (zob. `llm_client.py`) podmienia model agentów ADK (rozmowa, planner,
+analityk) na `FakeLlm`, a klienta google-genai (ekstrakcja ankiet, kondensacja, tryb
+masowy) na `FakeGenaiClient`. Odpowiedzi zależą tylko od treści żądania (ziarno z hasha),
+więc wyniki kolejnych przebiegów są powtarzalne.
+
+Zachowanie ról:
+    interviewer - powitanie z prośbą o zgodę, po jednym pytaniu ze scenariusza na turę,
+                  na końcu wywołanie narzędzia `save_transcript` i pożegnanie z [KONIEC]
+    planner     - podsumowanie ustaleń, po akceptacji scenariusz w bloku ```json```
+    analyst     - raport Markdown (bez wyszukiwania w korpusie)
+
+Opóźnienia (sekundy): FAKE_LLM_LATENCY - czas do pierwszego tokenu, FAKE_LLM_TOKEN_DELAY -
+na token (odpowiedź strumieniowana paczkami po FAKE_LLM_CHUNK_TOKENS tokenów),
+FAKE_LLM_JITTER - względny rozrzut czasu do pierwszego tokenu (deterministyczny).
+
+FAKE_LLM_SCRIPT - plik JSON ze scenariuszami odpowiedzi per rola, np.:
+    {"interviewer": [{"match": "Anna Nowak", "turns": [
+        "Dzień dobry! Czy zgadzasz się na rozmowę?",
+        {"tool": "save_transcript", "args": {"transcript": "AI: ..."}},
+        "Dziękuję za rozmowę! [KONIEC]"
+    ]}]}
+`match` to fragment instrukcji agenta lub wiadomości użytkownika ("*" - każda rozmowa);
+kolejne elementy `turns` są kolejnymi odpowiedziami modelu (tekst albo wywołanie narzędzia).
+
+Test obciążeniowy ścieżki kandydata (scenariusze w storage, tury `bot_turn`, zapis transkryptu):
+    LLM_BACKEND=fake STORAGE_MODE=SQLITE SQLITE_PATH=/tmp/bench.db python fake_llm.py --interviews 20 --concurrency 5
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncGenerator
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.3"))
+FAKE_LLM_TOKEN_DELAY = float(os.getenv("FAKE_LLM_TOKEN_DELAY", "0.01"))
+FAKE_LLM_CHUNK_TOKENS = int(os.getenv("FAKE_LLM_CHUNK_TOKENS", "5"))
+FAKE_LLM_JITTER = float(os.getenv("FAKE_LLM_JITTER", "0.2"))
+FAKE_LLM_SCRIPT = os.getenv("FAKE_LLM_SCRIPT")
+
+END_MARKER = "[KONIEC]"
+
+_script = None
+
+
+def load_script() -> dict:
+    """Scenariusze odpowiedzi z FAKE_LLM_SCRIPT (wczytywane raz; brak pliku = zachowanie domyślne ról)."""
+    global _script
+    if _script is None:
+        _script = {}
+        if FAKE_LLM_SCRIPT:
+            with open(FAKE_LLM_SCRIPT, "r", encoding="utf-8") as f:
+                _script = json.load(f)
+    return _script
+
+
+def _rng(*parts) -> random.Random:
+    seed = hashlib.sha256("\x00".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return random.Random(int(seed[:16], 16))
+
+
+def _tokens(text: str) -> list[str]:
+    return re.findall(r"\S+\s*", text) or [text]
+
+
+def _delay(seed: str) -> tuple[float, float]:
+    """(czas do pierwszego tokenu, opóźnienie na token) - rozrzut deterministyczny per żądanie."""
+    jitter = 1 + FAKE_LLM_JITTER * (2 * _rng(seed).random() - 1)
+    return max(FAKE_LLM_LATENCY * jitter, 0.0), FAKE_LLM_TOKEN_DELAY
+
+
+def _usage(prompt: str, output: str) -> types.GenerateContentResponseUsageMetadata:
+    # Przybliżenie tokenizera: słowa
+    prompt_tokens, output_tokens = len(prompt.split()), len(output.split())
+    return types.GenerateContentResponseUsageMetadata(
+        prompt_token_count=prompt_tokens,
+        candidates_token_count=output_tokens,
+        total_token_count=prompt_tokens + output_tokens,
+    )
+
+
+# --- ODPOWIEDZI RÓL ---
+
+def _content_text(content: types.Content) -> str:
+    return "".join(part.text for part in content.parts or [] if part.text)
+
+
+def _user_messages(contents: list) -> list[str]:
+    # Wiadomości kandydata (bez odpowiedzi narzędzi, które ADK też przekazuje jako role="user")
+    return [
+        _content_text(content) for content in contents
+        if content.role == "user" and _content_text(content)
+    ]
+
+
+def _history_user_turns(instruction: str) -> int:
+    # Wznowiona sesja (agent odtworzony po restarcie): wcześniejsze tury są w instrukcji
+    history = instruction.partition("[HISTORIA ROZMOWY]:")[2].partition("[KONIEC HISTORII]")[0]
+    return sum(1 for line in history.splitlines() if line.strip().startswith("USER:"))
+
+
+def _scenario_from_instruction(instruction: str) -> tuple[str, list[str]]:
+    name = re.search(r"z kandydatem:\s*(.+?)\.\s*$", instruction, re.MULTILINE)
+    goals = instruction.partition("Twoje cele w tej rozmowie:")[2].partition("Zasady:")[0]
+    questions = [line.strip()[2:].strip() for line in goals.splitlines() if line.strip().startswith("- ")]
+    return (name.group(1).strip() if name else "Kandydacie"), questions
+
+
+def _build_transcript(contents: list) -> str:
+    lines = []
+    for content in contents:
+        text = _content_text(content)
+        if not text:
+            continue
+        lines.append(f"{'Kandydat' if content.role == 'user' else 'AI'}: {text}")
+    lines.append(f"Podsumowanie: czat feedbackowy, {time.strftime('%Y-%m-%d')}")
+    return "\n\n".join(lines)
+
+
+def _interviewer(instruction: str, contents: list) -> types.Content:
+    name, questions = _scenario_from_instruction(instruction)
+    last = contents[-1] if contents else None
+    if last is not None and any(part.function_response for part in last.parts or []):
+        return _text("Dziękuję za poświęcony czas i wszystkie odpowiedzi. Do usłyszenia! " + END_MARKER)
+
+    turn = _history_user_turns(instruction) + len(_user_messages(contents))
+    if turn <= 1:
+        return _text(
+            f"Dzień dobry, {name}! Jestem asystentem AI i kontaktuję się w sprawie Twojego procesu rekrutacji. "
+            "Czy zgadzasz się na przeprowadzenie tej rozmowy i przetworzenie Twoich odpowiedzi?"
+        )
+    if turn - 2 < len(questions):
+        intro = "Dziękuję za zgodę. " if turn == 2 else "Dziękuję za odpowiedź. "
+        return _text(intro + questions[turn - 2])
+    return _call("save_transcript", {"transcript": _build_transcript(contents)})
+
+
+def _planner(instruction: str, contents: list) -> types.Content:
+    messages = _user_messages(contents)
+    conversation = "\n".join(messages)
+    name = re.search(r"([A-ZĄĆĘŁŃÓŚŹŻ][a-ząćęłńóśźż]+ [A-ZĄĆĘŁŃÓŚŹŻ][a-ząćęłńóśźż]+)", conversation)
+    candidate_name = name.group(1) if name else "Jan Kowalski"
+    if len(messages) <= 1:
+        return _text(
+            f"Przygotuję scenariusz rozmowy feedbackowej dla kandydata: {candidate_name}. "
+            "Proponuję pytania o NPS, zadanie rekrutacyjne, komunikację i przebieg rozmów. Czy akceptujesz?"
+        )
+    scenario = {
+        "candidate_name": candidate_name,
+        "context": messages[0][:200],
+        "tone": "Profesjonalny i uprzejmy",
+        "key_questions": [
+            "W skali 0-10, jak bardzo prawdopodobne jest, że polecił(a)byś udział w naszej rekrutacji znajomemu?",
+            "Czy zakres zadania rekrutacyjnego był adekwatny do stanowiska?",
+            "Czy byłeś(-aś) na bieżąco informowany(-a) o statusie swojej aplikacji?",
+            "Czy osoby rekrutujące były przygotowane do rozmowy (znały Twoje CV/profil)?",
+            "Co powinniśmy poprawić w przyszłych rekrutacjach?",
+        ],
+    }
+    return _text("Oto gotowy scenariusz:\n```json\n" + json.dumps(scenario, ensure_ascii=False, indent=2) + "\n```")
+
+
+def _analyst(instruction: str, contents: list) -> types.Content:
+    question = (_user_messages(contents) or [""])[-1]
+    themes = instruction.partition("# Tematy odpowiedzi otwartych")[2].partition("\n")[2].strip()
+    rng = _rng("analyst", instruction, question)
+    nps = round(rng.uniform(5, 9), 1)
+    stages = ["screening_telefoniczny", "zadanie_rekrutacyjne", "rozmowa_techniczna", "rozmowa_hiring_manager_1"]
+    rows = "\n".join(f"| {stage} | {rng.uniform(2.5, 4.8):.1f} |" for stage in stages)
+    return _text(
+        f"## Podsumowanie wykonawcze\nRaport dla zapytania: {question[:200]}\n\n"
+        f"## Kluczowe wskaźniki\n- NPS (średnia): {nps}\n\n| Etap | Średnia ocena |\n|---|---|\n{rows}\n\n"
+        f"## Głos kandydata\n{themes or 'Brak danych z pól otwartych.'}\n\n"
+        "## Rekomendacje\n- Wprowadzić obowiązkowy feedback po zadaniu rekrutacyjnym.\n"
+        "- Skrócić czas oczekiwania na decyzję."
+    )
+
+
+def _generic(instruction: str, contents: list) -> types.Content:
+    return _text(f"OK: {(_user_messages(contents) or [''])[-1][:200]}")
+
+
+ROLES = {"interviewer": _interviewer, "planner": _planner, "analyst": _analyst, "generic": _generic}
+
+
+def _text(text: str) -> types.Content:
+    return types.Content(role="model", parts=[types.Part(text=text)])
+
+
+def _call(name: str, args: dict, text: str = None) -> types.Content:
+    parts = [types.Part(text=text)] if text else []
+    parts.append(types.Part(function_call=types.FunctionCall(name=name, args=args)))
+    return types.Content(role="model", parts=parts)
+
+
+def _scripted(role: str, instruction: str, contents: list):
+    """Odpowiedź z FAKE_LLM_SCRIPT (kolejny element `turns` pasującego scenariusza) lub None."""
+    entries = load_script().get(role) or []
+    if not entries:
+        return None
+    conversation = "\n".join(_user_messages(contents))
+    for entry in entries:
+        match = entry.get("match", "*")
+        if match != "*" and match not in instruction and match not in conversation:
+            continue
+        # Numer odpowiedzi = liczba wcześniejszych odpowiedzi modelu w tej rozmowie
+        turns = entry.get("turns") or []
+        index = sum(1 for content in contents if content.role == "model")
+        if index >= len(turns):
+            return _text(END_MARKER)
+        turn = turns[index]
+        if isinstance(turn, str):
+            return _text(turn)
+        if turn.get("tool"):
+            args = turn.get("args")
+            if args is None and turn["tool"] == "save_transcript":
+                args = {"transcript": _build_transcript(contents)}
+            return _call(turn["tool"], args or {}, turn.get("text"))
+        return _text(turn.get("text", ""))
+    return None
+
+
+# --- MODEL ADK ---
+
+class FakeLlm(BaseLlm):
+    """Model-atrapa dla agentów ADK (nazwa `model` np. "fake-gemini-3-pro-preview")."""
+
+    role: str = "generic"
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [r"fake-.*"]
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        instruction = ""
+        system_instruction = llm_request.config.system_instruction if llm_request.config else None
+        if isinstance(system_instruction, types.Content):
+            instruction = _content_text(system_instruction)
+        elif system_instruction:
+            instruction = str(system_instruction)
+        contents = llm_request.contents or []
+
+        content = _scripted(self.role, instruction, contents) or ROLES.get(self.role, _generic)(instruction, contents)
+        text = _content_text(content)
+        prompt = instruction + "\n" + "\n".join(_content_text(c) for c in contents)
+        first_token, token_delay = _delay(f"{self.model}\x00{prompt}")
+        await asyncio.sleep(first_token)
+
+        if stream and text:
+            tokens = _tokens(text)
+            for start in range(0, len(tokens), FAKE_LLM_CHUNK_TOKENS):
+                chunk = tokens[start:start + FAKE_LLM_CHUNK_TOKENS]
+                yield LlmResponse(content=_text("".join(chunk)), partial=True)
+                await asyncio.sleep(token_delay * len(chunk))
+        else:
+            await asyncio.sleep(token_delay * len(_tokens(text)) if text else 0)
+
+        yield LlmResponse(
+            content=content,
+            partial=False,
+            turn_complete=True,
+            finish_reason=types.FinishReason.STOP,
+            usage_metadata=_usage(prompt, text),
+        )
+
+
+# --- KLIENT GOOGLE-GENAI ---
+
+def _schema_dict(schema) -> dict:
+    if isinstance(schema, types.Schema):
+        return schema.model_dump(exclude_none=True, mode="json")
+    return schema if isinstance(schema, dict) else {}
+
+
+def _instance(schema: dict, rng: random.Random, name: str = ""):
+    """Deterministyczna wartość zgodna ze schematem odpowiedzi (OBJECT/ARRAY/STRING/INTEGER/NUMBER/BOOLEAN)."""
+    kind = str(schema.get("type", "STRING")).upper()
+    if schema.get("enum"):
+        return rng.choice(schema["enum"])
+    if kind == "OBJECT":
+        return {key: _instance(_schema_dict(value), rng, key) for key, value in (schema.get("properties") or {}).items()}
+    if kind == "ARRAY":
+        return [_instance(_schema_dict(schema.get("items") or {}), rng, f"{name} {i + 1}") for i in range(3)]
+    if kind == "INTEGER":
+        return rng.randint(1, 5)
+    if kind == "NUMBER":
+        return round(rng.uniform(1, 5), 1)
+    if kind == "BOOLEAN":
+        return rng.random() < 0.5
+    return f"Przykładowa odpowiedź ({name})" if name else "Brak danych"
+
+
+def _prompt_text(contents) -> str:
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, types.Content):
+        return _content_text(contents)
+    if isinstance(contents, list):
+        return "\n".join(_prompt_text(item) for item in contents)
+    return str(contents)
+
+
+class _AsyncModels:
+    async def generate_content(self, model: str, contents, config: types.GenerateContentConfig = None):
+        prompt = _prompt_text(contents)
+        response = _response(model, prompt, config)
+        first_token, token_delay = _delay(f"{model}\x00{prompt}")
+        await asyncio.sleep(first_token + token_delay * (response.usage_metadata.candidates_token_count or 0))
+        return response
+
+
+class _Models:
+    def generate_content(self, model: str, contents, config: types.GenerateContentConfig = None):
+        prompt = _prompt_text(contents)
+        response = _response(model, prompt, config)
+        first_token, token_delay = _delay(f"{model}\x00{prompt}")
+        time.sleep(first_token + token_delay * (response.usage_metadata.candidates_token_count or 0))
+        return response
+
+
+def _response(model: str, prompt: str, config: types.GenerateContentConfig = None) -> types.GenerateContentResponse:
+    schema = _schema_dict(config.response_schema) if config and config.response_schema is not None else None
+    if schema:
+        text = json.dumps(_instance(schema, _rng(model, prompt)), ensure_ascii=False)
+    else:
+        # Np. kondensacja dokumentu: końcówka promptu (treść dokumentu) jako "karta faktów"
+        text = "Fakty: " + " ".join(prompt.split()[-120:])
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=_text(text), finish_reason=types.FinishReason.STOP)],
+        usage_metadata=_usage(prompt, text),
+        model_version=f"fake-{model}",
+    )
+
+
+class _AsyncClient:
+    def __init__(self):
+        self.models = _AsyncModels()
+
+
+class FakeGenaiClient:
+    """Zamiennik `genai.Client` dla bezpośrednich wywołań (`models.generate_content`, `aio.models.generate_content`)."""
+
+    def __init__(self):
+        self.models = _Models()
+        self.aio = _AsyncClient()
+
+
+# --- TEST OBCIĄŻENIOWY ---
+
+def _candidate_reply(session_id: str, turn: int) -> str:
+    if turn == 0:
+        return "Cześć"
+    if turn == 1:
+        return "Tak, zgadzam się."
+    score = _rng(session_id, turn).randint(1, 5)
+    return f"Moja ocena to {score}. Proces był w porządku, choć czas oczekiwania na decyzję był długi."
+
+
+def _run_interview(session_id: str, max_turns: int) -> dict:
+    import app_candidac
+
+    async def interview():
+        started = False
+        for turn in range(max_turns):
+            app_candidac.user_turn(_candidate_reply(session_id, turn), session_id, app_candidac.CHAT_WINDOW)
+            _, started, textbox, _ = await app_candidac.bot_turn(session_id, started, app_candidac.CHAT_WINDOW)
+            if textbox.get("interactive") is False:
+                return {"turns": turn + 1, "completed": True}
+        return {"turns": max_turns, "completed": False}
+
+    return asyncio.run(interview())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test obciążeniowy rozmów kandydatów na modelu-atrapie (bez sieci)")
+    parser.add_argument("--interviews", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-turns", type=int, default=20)
+    args = parser.parse_args()
+
+    # Importy tutaj - LLM_BACKEND musi być ustawiony przed utworzeniem agentów
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    import latency
+    from interviewer.agent import mock_scenario
+    from storage import save_scenarios
+    from transcript_writer import transcript_writer
+
+    scenarios = [dict(mock_scenario, candidate_name=f"Kandydat Testowy {i + 1}") for i in range(args.interviews)]
+    session_ids = save_scenarios(scenarios)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda session_id: _run_interview(session_id, args.max_turns), session_ids))
+    elapsed = time.perf_counter() - start
+    transcript_writer.flush()
+
+    turns = sum(result["turns"] for result in results)
+    completed = sum(result["completed"] for result in results)
+    print(f"Rozmowy: {len(results)} (zakończone: {completed}), tury: {turns}, czas: {elapsed:.2f}s, {turns / elapsed:.1f} tur/s")
+    for phase, models in latency.stats().items():
+        for model, summary in models.items():
+            print(f"  {phase:<28} {model:<30} {summary}")
+
+
+if __name__ == "__main__":
+    main()
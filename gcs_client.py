@@ -0,0 +1,132 @@
+"""
+Wspólny klient Google Cloud Storage dla całego procesu (storage.py, GCSService).
+
+Jeden `storage.Client` na projekt ze strojoną pulą połączeń HTTP (keep-alive),
+więc żadne żądanie nie płaci ponownie za uwierzytelnienie i zestawienie TLS.
+Liczniki żądań i nowych połączeń pokazują, czy połączenia są faktycznie reużywane.
+"""
+
+import os
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Rozmiar puli połączeń do GCS (powinien pokrywać równoległe operacje, np. STORAGE_IO_WORKERS)
+GCS_HTTP_POOL_SIZE = int(os.getenv("GCS_HTTP_POOL_SIZE", "32"))
+GCS_HTTP_RETRIES = int(os.getenv("GCS_HTTP_RETRIES", "3"))
+# Strona listingu obiektów (storage_backends.gcs i GCSService)
+LIST_PAGE_SIZE = int(os.getenv("GCS_LIST_PAGE_SIZE", "1000"))
+
+_clients = {}
+_lock = threading.Lock()
+
+# Metryki połączeń
+connection_stats = {"requests": 0, "new_connections": 0, "warmup_seconds": None}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str):
+    with _stats_lock:
+        connection_stats[key] += 1
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count("new_connections")
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count("new_connections")
+        return super()._new_conn()
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """Adapter HTTP z większą pulą połączeń i licznikiem nowo otwieranych połączeń."""
+
+    def __init__(self, pool_size: int = GCS_HTTP_POOL_SIZE):
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=GCS_HTTP_RETRIES)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+def _on_response(response, *args, **kwargs):
+    _count("requests")
+
+
+def _credentials(scopes) -> tuple:
+    """Poświadczenia i domyślny projekt (z emulatorem STORAGE_EMULATOR_HOST - anonimowe)."""
+    if os.getenv("STORAGE_EMULATOR_HOST"):
+        from google.auth.credentials import AnonymousCredentials
+        return AnonymousCredentials(), None
+    import google.auth
+    return google.auth.default(scopes=scopes)
+
+
+def _authorized_session(credentials):
+    """Sesja requests z uwierzytelnianiem, strojoną pulą połączeń i licznikiem żądań."""
+    from google.auth.transport.requests import AuthorizedSession
+    session = AuthorizedSession(credentials)
+    adapter = PooledHTTPAdapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.hooks.setdefault("response", []).append(_on_response)
+    return session
+
+
+def get_storage_client(project: str = None):
+    """Zwraca współdzielony `storage.Client` (tworzony leniwie, raz na proces i projekt)."""
+    client = _clients.get(project)
+    if client is None:
+        with _lock:
+            client = _clients.get(project)
+            if client is None:
+                from google.cloud import storage
+                credentials, default_project = _credentials(storage.Client.SCOPE)
+                # Klient dostaje gotową sesję z naszą pulą połączeń (argument konstruktora `_http`)
+                client = storage.Client(
+                    project=project or default_project, credentials=credentials, _http=_authorized_session(credentials),
+                )
+                _clients[project] = client
+    return client
+
+
+def get_bucket(bucket_name: str, project: str = None):
+    return get_storage_client(project).bucket(bucket_name)
+
+
+def warm_up(bucket_name: str, project: str = None, background: bool = True):
+    """Zestawia uwierzytelnienie i połączenie TLS przed pierwszym żądaniem użytkownika."""
+    def run():
+        start = time.perf_counter()
+        try:
+            # Najtańsze żądanie do bucketu: jedna strona listingu z jednym elementem
+            list(get_storage_client(project).list_blobs(bucket_name, max_results=1, fields="items(name)"))
+            connection_stats["warmup_seconds"] = round(time.perf_counter() - start, 3)
+            print(f"GCS: połączenie z bucketem {bucket_name} gotowe ({connection_stats['warmup_seconds']}s)")
+        except Exception as e:
+            print(f"GCS: rozgrzewanie połączenia nieudane: {e}")
+
+    if background:
+        threading.Thread(target=run, name="gcs-warmup", daemon=True).start()
+    else:
+        run()
+
+
+def stats() -> dict:
+    with _stats_lock:
+        result = dict(connection_stats)
+    requests = result["requests"]
+    result["connection_reuse_ratio"] = round(1 - result["new_connections"] / requests, 3) if requests else None
+    return result
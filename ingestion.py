@@ -0,0 +1,213 @@
+"""
+Ingestia dokumentów wgrywanych w panelu admina (CV / notatki rekrutacyjne).
+- PDF: strony ekstrahowane równolegle w osobnych procesach, z limitem stron i twardym
+  limitem czasu (proces, który go przekroczy, jest zabijany - zawieszony PDF nie blokuje
+  kolejnych uploadów), strony z błędem ekstrakcji raportowane w statystykach,
+- DOCX: natywne parsowanie `word/document.xml` (bez zgadywania kodowania),
+- TXT: UTF-8 z fallbackiem na cp1250,
+- cache wyników po hashu zawartości - ponowne wgranie tego samego pliku jest natychmiastowe.
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+import metrics
+
+INGEST_MAX_PAGES = int(os.getenv("INGEST_MAX_PAGES", "50"))
+INGEST_TIMEOUT = float(os.getenv("INGEST_TIMEOUT", "30"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+INGEST_CACHE_SIZE = int(os.getenv("INGEST_CACHE_SIZE", "128"))
+# Minimalna liczba stron na jedno zadanie (każde zadanie otwiera PDF od nowa)
+PAGES_PER_TASK = 4
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+_cache: OrderedDict[str, dict] = OrderedDict()
+_cache_lock = threading.Lock()
+# Limit procesów ekstrakcji PDF działających naraz (wszystkie uploady łącznie)
+_process_slots = asyncio.Semaphore(INGEST_WORKERS)
+
+
+# --- EKSTRAKCJA (funkcje wykonywane w procesach roboczych) ---
+
+def _extract_pdf_pages(path: str, start: int, end: int) -> tuple[list[str], list[int]]:
+    """Tekst stron [start, end) i numery (od 1) stron, których nie udało się odczytać."""
+    import pypdf
+    reader = pypdf.PdfReader(path)
+    pages, failed = [], []
+    for i in range(start, end):
+        try:
+            pages.append(reader.pages[i].extract_text() or "")
+        except Exception:
+            failed.append(i + 1)
+    return pages, failed
+
+
+def _count_pdf_pages(path: str) -> int:
+    import pypdf
+    return len(pypdf.PdfReader(path).pages)
+
+
+def extract_docx_text(path: str) -> str:
+    """Tekst z pliku DOCX: akapity i wiersze tabel z `word/document.xml`."""
+    with zipfile.ZipFile(path) as archive:
+        root = ET.fromstring(archive.read("word/document.xml"))
+
+    paragraphs = []
+    for paragraph in root.iter(f"{WORD_NS}p"):
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == f"{WORD_NS}t" and node.text:
+                parts.append(node.text)
+            elif node.tag == f"{WORD_NS}tab":
+                parts.append("\t")
+            elif node.tag in (f"{WORD_NS}br", f"{WORD_NS}cr"):
+                parts.append("\n")
+        paragraphs.append("".join(parts))
+    return "\n".join(paragraphs).strip()
+
+
+def read_text_file(path: str) -> str:
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        return raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        # Pliki z Windows (Word "Zapisz jako TXT") często są w cp1250
+        return raw.decode("cp1250", errors="replace")
+
+
+def _process_main(conn, func, args):
+    try:
+        conn.send((True, func(*args)))
+    except BaseException as e:
+        conn.send((False, f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+async def _run_in_process(func, *args, deadline: float):
+    """Wywołuje `func(*args)` w osobnym procesie; po przekroczeniu `deadline` (time.monotonic) proces jest zabijany.
+
+    Raises:
+        TimeoutError: gdy wynik nie nadszedł przed terminem
+        RuntimeError: gdy funkcja rzuciła wyjątek lub proces zakończył się bez wyniku
+    """
+    async with _process_slots:
+        # "spawn" - procesy robocze nie dziedziczą wątków serwera Gradio
+        context = multiprocessing.get_context("spawn")
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_process_main, args=(sender, func, args), daemon=True)
+        process.start()
+        sender.close()
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not await asyncio.to_thread(receiver.poll, remaining):
+                raise TimeoutError(f"{func.__name__}: przekroczono limit czasu ({INGEST_TIMEOUT}s na plik)")
+            try:
+                ok, value = receiver.recv()
+            except EOFError:
+                await asyncio.to_thread(process.join)
+                raise RuntimeError(f"{func.__name__}: proces zakończył się bez wyniku (kod {process.exitcode})")
+            if not ok:
+                raise RuntimeError(value)
+            return value
+        finally:
+            if process.is_alive():
+                process.kill()
+            await asyncio.to_thread(process.join)
+            receiver.close()
+
+
+async def _extract_pdf(path: str) -> tuple[str, dict]:
+    # Jeden termin dla całego pliku (liczenie stron + ekstrakcja)
+    deadline = time.monotonic() + INGEST_TIMEOUT
+    try:
+        total_pages = await _run_in_process(_count_pdf_pages, path, deadline=deadline)
+    except TimeoutError:
+        return "", {"pages": None, "pages_read": 0, "pages_skipped": 0, "failed_pages": [], "timed_out": True}
+    pages_to_read = min(total_pages, INGEST_MAX_PAGES)
+
+    # Zakresy stron rozdzielone równo między procesy robocze
+    chunk = max(PAGES_PER_TASK, -(-pages_to_read // INGEST_WORKERS))
+    ranges = [(start, min(start + chunk, pages_to_read)) for start in range(0, pages_to_read, chunk)]
+    results = await asyncio.gather(
+        *(_run_in_process(_extract_pdf_pages, path, start, end, deadline=deadline) for start, end in ranges),
+        return_exceptions=True,
+    )
+
+    pages, failed_pages = [], []
+    timed_out = False
+    for (start, end), result in zip(ranges, results):
+        if isinstance(result, BaseException):
+            timed_out = timed_out or isinstance(result, TimeoutError)
+            print(f"Ingestia: strony {start + 1}-{end} pliku {os.path.basename(path)} nieodczytane: {result}")
+            failed_pages.extend(range(start + 1, end + 1))
+        else:
+            chunk_pages, chunk_failed = result
+            pages.extend(chunk_pages)
+            failed_pages.extend(chunk_failed)
+
+    info = {
+        "pages": total_pages,
+        "pages_read": pages_to_read - len(failed_pages),
+        "pages_skipped": total_pages - pages_to_read,
+        "failed_pages": failed_pages,
+        "timed_out": timed_out,
+    }
+    return "\n".join(pages), info
+
+
+# --- API ---
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+async def ingest_file(path: str) -> dict:
+    """Wyciąga tekst z pliku; wynik jest cache'owany po hashu zawartości.
+
+    Returns:
+        Słownik: text, format, cached, elapsed (s) oraz dla PDF: pages, pages_read,
+        pages_skipped, failed_pages (numery stron), timed_out.
+    """
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    content_hash = await loop.run_in_executor(None, _file_hash, path)
+
+    with _cache_lock:
+        cached = _cache.get(content_hash)
+        if cached is not None:
+            _cache.move_to_end(content_hash)
+    metrics.cache_lookup("ingestion", cached is not None)
+    if cached is not None:
+        return {**cached, "cached": True, "elapsed": time.perf_counter() - started}
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        text, info = await _extract_pdf(path)
+    elif extension == ".docx":
+        text, info = await loop.run_in_executor(None, extract_docx_text, path), {}
+    else:
+        text, info = await loop.run_in_executor(None, read_text_file, path), {}
+
+    result = {"text": text, "format": extension.lstrip(".") or "txt", **info}
+    # Niekompletnych wyników (timeout, nieodczytane strony) nie cache'ujemy - kolejna próba może się udać
+    if not info.get("timed_out") and not info.get("failed_pages"):
+        with _cache_lock:
+            _cache[content_hash] = result
+            while len(_cache) > INGEST_CACHE_SIZE:
+                _cache.popitem(last=False)
+
+    return {**result, "cached": False, "elapsed": time.perf_counter() - started}
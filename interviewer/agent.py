@@ -1,7 +1,8 @@
 from google.adk.agents.llm_agent import Agent
 import datetime
 import os
-from .gcs_service import GCSService
+from .gcs_service import get_gcs_service
+from llm_client import agent_model
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -19,7 +20,7 @@ def save_transcript(transcript: str):
         return "Błąd: Zmienna środowiskowa GCS_BUCKET_NAME nie jest ustawiona."
 
     try:
-        gcs_service = GCSService(bucket_name=bucket_name)
+        gcs_service = get_gcs_service(bucket_name)
         filename = f"transcriptions/transcript_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
         gcs_path = gcs_service.upload_string(transcript, filename, content_type="text/plain; charset=utf-8")
         return f"Zapisano transkrypcję do: {gcs_path}"
@@ -89,7 +90,7 @@ def create_interview_agent(scenario_data: dict, history_context: list = None):
         [KONIEC HISTORII]
         """
     
-    return Agent(model=MODEL, name="interview_agent", instruction=instruction, tools=[save_transcript])
+    return Agent(model=agent_model(MODEL, "interviewer"), name="interview_agent", instruction=instruction, tools=[save_transcript])
 
 mock_scenario = {
     "candidate_name": "Imię i Nazwisko Kandydata",
@@ -3,12 +3,33 @@ Google Cloud Storage Service dla agenta.
 Umożliwia przesyłanie plików i danych do GCS bucket.
 """
 
-from google.cloud import storage
 from google.cloud.exceptions import GoogleCloudError
-from typing import Optional, Union, BinaryIO
+from typing import Optional, Union, BinaryIO, Iterable, Iterator
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import json
+import re
+
+import tracing
+from gcs_client import get_storage_client, LIST_PAGE_SIZE
+
+# Domyślna projekcja pól listingu (bez ACL, linków i pozostałych metadanych)
+LIST_FIELDS = ("name", "size", "updated", "generation")
+
+# Operacje masowe: liczba równoległych żądań (nie więcej niż pula połączeń klienta)
+BULK_WORKERS = int(os.getenv("GCS_BULK_WORKERS", "16"))
+# Pliki od tego rozmiaru przesyłane jako równoległe części składane przez compose
+COMPOSITE_THRESHOLD = int(os.getenv("GCS_COMPOSITE_THRESHOLD", str(64 * 1024 * 1024)))
+COMPOSITE_CHUNK_SIZE = int(os.getenv("GCS_COMPOSITE_CHUNK_SIZE", str(16 * 1024 * 1024)))
+COMPOSE_MAX_COMPONENTS = 32
+
+
+def _blob_field(blob, field: str):
+    """Wartość pola zasobu obiektu przez właściwość `Blob` (np. `contentType` -> `content_type`)."""
+    return getattr(blob, re.sub(r"(?<!^)(?=[A-Z])", "_", field).lower())
 
 
 class GCSService:
@@ -24,7 +45,8 @@ class GCSService:
         """
         self.bucket_name = bucket_name
         self.project_id = project_id
-        self.client = storage.Client(project=project_id)
+        # Współdzielony klient procesu - bez ponownego uwierzytelniania i zestawiania połączeń
+        self.client = get_storage_client(project_id)
         self.bucket = self.client.bucket(bucket_name)
     
     def upload_file(
@@ -81,7 +103,8 @@ class GCSService:
             Publiczny URL do pliku w GCS
         """
         blob = self.bucket.blob(destination_blob_name)
-        blob.upload_from_string(data, content_type=content_type)
+        with tracing.span("gcs.upload", **{"gcs.bucket": self.bucket_name, "gcs.object": destination_blob_name, "gcs.bytes": len(data)}):
+            blob.upload_from_string(data, content_type=content_type)
         
         return f"gs://{self.bucket_name}/{destination_blob_name}"
     
@@ -143,8 +166,78 @@ class GCSService:
         Returns:
             Lista nazw plików
         """
-        blobs = self.client.list_blobs(self.bucket_name, prefix=prefix)
-        return [blob.name for blob in blobs]
+        return [item["name"] for item in self.iter_files(prefix=prefix, fields=("name",))]
+    
+    def iter_files(
+        self,
+        prefix: Optional[str] = None,
+        page_size: int = LIST_PAGE_SIZE,
+        fields: Iterable[str] = LIST_FIELDS,
+        start_offset: Optional[str] = None,
+        end_offset: Optional[str] = None,
+        match_glob: Optional[str] = None,
+    ) -> Iterator[dict]:
+        """
+        Strumieniowo listuje pliki w bucket (kolejne strony pobierane na żądanie).
+        
+        Args:
+            prefix: Opcjonalny prefix do filtrowania
+            page_size: Liczba obiektów na stronę odpowiedzi API
+            fields: Pola zasobu obiektu do pobrania (projekcja)
+            start_offset: Tylko nazwy >= start_offset (leksykograficznie)
+            end_offset: Tylko nazwy < end_offset
+            match_glob: Wzorzec glob po stronie serwera, np. "transcripts/**.json"
+            
+        Yields:
+            Słowniki z wybranymi polami obiektu
+        """
+        page_token = None
+        while True:
+            items, page_token = self.list_page(
+                prefix=prefix, page_size=page_size, fields=fields, start_offset=start_offset,
+                end_offset=end_offset, match_glob=match_glob, page_token=page_token,
+            )
+            yield from items
+            if not page_token:
+                return
+    
+    def list_page(
+        self,
+        prefix: Optional[str] = None,
+        page_size: int = LIST_PAGE_SIZE,
+        fields: Iterable[str] = LIST_FIELDS,
+        start_offset: Optional[str] = None,
+        end_offset: Optional[str] = None,
+        match_glob: Optional[str] = None,
+        page_token: Optional[str] = None,
+    ) -> tuple[list[dict], Optional[str]]:
+        """
+        Pobiera jedną stronę listingu. Token następnej strony pozwala wznowić listowanie
+        (np. w kolejnym uruchomieniu zadania) bez przechodzenia od początku.
+        
+        Args:
+            prefix, page_size, fields, start_offset, end_offset, match_glob: jak w `iter_files`
+            page_token: Token strony zwrócony przez poprzednie wywołanie
+            
+        Returns:
+            (obiekty na stronie, token następnej strony lub None)
+        """
+        fields = tuple(fields)
+        iterator = self.client.list_blobs(
+            self.bucket_name,
+            prefix=prefix,
+            page_size=page_size,
+            page_token=page_token,
+            start_offset=start_offset,
+            end_offset=end_offset,
+            match_glob=match_glob,
+            fields=f"items({','.join(fields)}),nextPageToken",
+        )
+        page = next(iterator.pages, None)
+        if page is None:
+            return [], None
+        items = [{field: _blob_field(blob, field) for field in fields} for blob in page]
+        return items, iterator.next_page_token
     
     def download_file(
         self,
@@ -193,6 +286,200 @@ class GCSService:
         blob.delete()
         return True
     
+    # --- OPERACJE MASOWE ---
+    
+    def upload_many(
+        self,
+        items: Iterable[tuple[str, Union[str, bytes]]],
+        content_type: Optional[str] = None,
+        max_workers: int = BULK_WORKERS
+    ) -> list[dict]:
+        """
+        Przesyła wiele obiektów równolegle (ograniczona pula wątków).
+        Duże pliki lokalne (>= COMPOSITE_THRESHOLD) są dzielone na części przesyłane
+        równolegle i składane w GCS (compose).
+        
+        Args:
+            items: Pary (nazwa pliku w GCS, ścieżka do pliku lokalnego lub treść jako bytes)
+            content_type: Typ contentu (opcjonalnie)
+            max_workers: Liczba równoległych operacji
+            
+        Returns:
+            Wynik dla każdego elementu: name, ok, error, seconds, url
+        """
+        def upload(destination_blob_name: str, source: Union[str, bytes]) -> str:
+            if isinstance(source, bytes):
+                blob = self.bucket.blob(destination_blob_name)
+                blob.upload_from_string(source, content_type=content_type or "application/octet-stream")
+                return f"gs://{self.bucket_name}/{destination_blob_name}"
+            return self.upload_file(source, destination_blob_name, content_type=content_type)
+        
+        items = list(items)
+        # Części dużych plików idą do tej samej puli co pozostałe obiekty (bez puli w puli)
+        composite = {
+            name: self._composite_parts(source, name)
+            for name, source in items if not isinstance(source, bytes) and self._is_composite(source)
+        }
+        tasks = [(name, upload, (name, source)) for name, source in items if name not in composite]
+        tasks += [(part[0], self._upload_part, part) for parts in composite.values() for part in parts]
+        results = {r["name"]: r for r in self._run_many(lambda name, func, args: func(*args), tasks, max_workers)}
+        
+        for name, parts in composite.items():
+            part_results = [results.pop(part[0]) for part in parts]
+            failed = [r for r in part_results if not r["ok"]]
+            result = {"name": name, "ok": not failed, "error": None, "result": None}
+            if failed:
+                result["error"] = f"Nie udało się przesłać części {failed[0]['name']}: {failed[0]['error']}"
+            else:
+                start = time.perf_counter()
+                try:
+                    result["result"] = self._compose_parts(name, [part[0] for part in parts], content_type)
+                except Exception as e:
+                    result.update(ok=False, error=str(e))
+                part_results.append({"seconds": time.perf_counter() - start})
+            result["seconds"] = round(sum(r["seconds"] for r in part_results), 4)
+            results[name] = result
+        self.delete_many([part[0] for parts in composite.values() for part in parts])
+        
+        ordered = [results[name] for name, _ in items]
+        for result in ordered:
+            result["url"] = result.pop("result")
+        return ordered
+    
+    def download_many(
+        self,
+        blob_names: Iterable[str],
+        destination_dir: Optional[str] = None,
+        max_workers: int = BULK_WORKERS
+    ) -> list[dict]:
+        """
+        Pobiera wiele obiektów równolegle.
+        
+        Args:
+            blob_names: Nazwy plików w GCS
+            destination_dir: Katalog docelowy (opcjonalnie); bez niego treść trafia do wyniku (`data`)
+            max_workers: Liczba równoległych operacji
+            
+        Returns:
+            Wynik dla każdego elementu: name, ok, error, seconds, data (bytes lub ścieżka pliku)
+        """
+        def download(blob_name: str):
+            blob = self.bucket.blob(blob_name)
+            if destination_dir is None:
+                return blob.download_as_bytes()
+            destination_file_path = self._local_path(destination_dir, blob_name)
+            os.makedirs(os.path.dirname(destination_file_path), exist_ok=True)
+            blob.download_to_filename(destination_file_path)
+            return destination_file_path
+        
+        results = self._run_many(download, [(name,) for name in blob_names], max_workers)
+        for result in results:
+            result["data"] = result.pop("result")
+        return results
+    
+    @staticmethod
+    def _local_path(destination_dir: str, blob_name: str) -> str:
+        """Ścieżka pliku dla obiektu; nazwy wychodzące poza katalog docelowy (`..`, ścieżki absolutne) są odrzucane."""
+        root = os.path.realpath(destination_dir)
+        path = os.path.realpath(os.path.join(root, blob_name))
+        if os.path.commonpath([root, path]) != root or path == root:
+            raise ValueError(f"Nazwa obiektu {blob_name!r} wychodzi poza katalog docelowy")
+        return path
+    
+    def delete_many(self, blob_names: Iterable[str], max_workers: int = BULK_WORKERS) -> list[dict]:
+        """
+        Usuwa wiele obiektów równolegle. Brak obiektu jest raportowany jako błąd elementu.
+        
+        Args:
+            blob_names: Nazwy plików w GCS
+            max_workers: Liczba równoległych operacji
+            
+        Returns:
+            Wynik dla każdego elementu: name, ok, error, seconds
+        """
+        results = self._run_many(self.delete_file, [(name,) for name in blob_names], max_workers)
+        for result in results:
+            result.pop("result")
+        return results
+    
+    def upload_composite(
+        self,
+        source_file_path: str,
+        destination_blob_name: str,
+        content_type: Optional[str] = None,
+        chunk_size: int = COMPOSITE_CHUNK_SIZE
+    ) -> str:
+        """
+        Równoległy upload dużego pliku: części przesyłane jako osobne obiekty,
+        następnie składane jednym żądaniem compose (maks. 32 części) i usuwane.
+        
+        Args:
+            source_file_path: Ścieżka do pliku lokalnego
+            destination_blob_name: Nazwa pliku w GCS
+            content_type: Typ contentu (opcjonalnie)
+            chunk_size: Minimalny rozmiar części w bajtach
+            
+        Returns:
+            Publiczny URL do pliku w GCS
+        """
+        parts = self._composite_parts(source_file_path, destination_blob_name, chunk_size)
+        results = self._run_many(self._upload_part, parts, BULK_WORKERS)
+        try:
+            failed = [r for r in results if not r["ok"]]
+            if failed:
+                raise GoogleCloudError(f"Nie udało się przesłać części {failed[0]['name']}: {failed[0]['error']}")
+            return self._compose_parts(destination_blob_name, [part[0] for part in parts], content_type)
+        finally:
+            self.delete_many([r["name"] for r in results if r["ok"]])
+    
+    @staticmethod
+    def _is_composite(source_file_path: str) -> bool:
+        try:
+            return os.path.getsize(source_file_path) >= COMPOSITE_THRESHOLD
+        except OSError:
+            # Błąd pliku zostanie zgłoszony przy zwykłym uploadzie jako błąd elementu
+            return False
+    
+    @staticmethod
+    def _composite_parts(source_file_path: str, destination_blob_name: str, chunk_size: int = COMPOSITE_CHUNK_SIZE) -> list[tuple]:
+        """Części pliku do równoległego uploadu: (nazwa części, ścieżka, offset, długość)."""
+        size = os.path.getsize(source_file_path)
+        parts = max(1, min(COMPOSE_MAX_COMPONENTS, -(-size // chunk_size)))
+        part_size = -(-size // parts)
+        return [
+            (f"{destination_blob_name}.part-{i:02d}", source_file_path, i * part_size, part_size)
+            for i in range(parts)
+        ]
+    
+    def _upload_part(self, part_name: str, source_file_path: str, offset: int, length: int):
+        with open(source_file_path, "rb") as f:
+            f.seek(offset)
+            self.bucket.blob(part_name).upload_from_string(f.read(length), content_type="application/octet-stream")
+    
+    def _compose_parts(self, destination_blob_name: str, part_names: list[str], content_type: Optional[str]) -> str:
+        destination = self.bucket.blob(destination_blob_name)
+        destination.content_type = content_type or "application/octet-stream"
+        destination.compose([self.bucket.blob(name) for name in part_names])
+        return f"gs://{self.bucket_name}/{destination_blob_name}"
+    
+    @staticmethod
+    def _run_many(func, items: list[tuple], max_workers: int) -> list[dict]:
+        """Wykonuje `func(*item)` dla elementów w puli wątków; błędy raportowane per element."""
+        def run(item: tuple) -> dict:
+            start = time.perf_counter()
+            result = {"name": item[0], "ok": True, "error": None, "result": None}
+            try:
+                result["result"] = func(*item)
+            except Exception as e:
+                result.update(ok=False, error=str(e))
+            result["seconds"] = round(time.perf_counter() - start, 4)
+            return result
+        
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+            return list(pool.map(run, items))
+    
     def file_exists(self, blob_name: str) -> bool:
         """
         Sprawdza czy plik istnieje w GCS.
@@ -258,6 +545,28 @@ class GCSService:
         return f"gs://{self.bucket_name}/{destination_blob_name}"
 
 
+_services: dict[tuple, GCSService] = {}
+_services_lock = threading.Lock()
+
+
+def get_gcs_service(bucket_name: str, project_id: Optional[str] = None) -> GCSService:
+    """
+    Zwraca współdzieloną instancję GCSService dla bucketu (tworzoną raz na proces).
+    
+    Args:
+        bucket_name: Nazwa bucket GCS
+        project_id: ID projektu GCP (opcjonalne)
+        
+    Returns:
+        Instancja GCSService
+    """
+    key = (bucket_name, project_id)
+    with _services_lock:
+        if key not in _services:
+            _services[key] = GCSService(bucket_name, project_id)
+        return _services[key]
+
+
 # Przykładowe użycie z funkcjami pomocniczymi dla agenta
 def create_timestamped_filename(base_name: str, extension: str = "json") -> str:
     """
@@ -0,0 +1,252 @@
+"""
+Pomiar opóźnień tury rozmowy z kandydatem w rozbiciu na fazy.
+
+Każda tura `bot_turn` mierzy swoje fazy (pobranie scenariusza, budowa agenta/runnera,
+sesja ADK, czas do pierwszego zdarzenia modelu i czas całkowity modelu, narzędzia,
+zapis transkryptu). Czasy trafiają do histogramów per (faza, model) o stałych
+przedziałach, a ostatnie tury każdej sesji są dostępne w rozbiciu na fazy, więc
+zgłoszenie „bot jest wolny” można sprawdzić dla konkretnej sesji.
+
+LATENCY_METRICS=0 wyłącza pomiar: `start_turn` zwraca obiekt no-op (bez pomiaru czasu,
+blokad ani alokacji na turę).
+"""
+
+import bisect
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+
+LATENCY_METRICS_ENABLED = os.getenv("LATENCY_METRICS", "1") != "0"
+# LATENCY_LOG=1 wypisuje rozbicie każdej tury
+LATENCY_LOG = os.getenv("LATENCY_LOG", "0") == "1"
+# Liczba ostatnich tur pamiętanych per sesja i liczba pamiętanych sesji
+LATENCY_TURNS_PER_SESSION = int(os.getenv("LATENCY_TURNS_PER_SESSION", "20"))
+LATENCY_MAX_SESSIONS = int(os.getenv("LATENCY_MAX_SESSIONS", "1000"))
+
+# Górne granice przedziałów histogramu w sekundach (jak domyślne przedziały Prometheusa, rozszerzone o wolne wywołania modelu)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+# Fazy tury
+SCENARIO_FETCH = "scenario_fetch"
+RUNNER_BUILD = "runner_build"
+ADK_SESSION = "adk_session"
+# Runner działa bez strumieniowania - mierzony jest czas do pierwszego zdarzenia ADK (pełnej odpowiedzi
+# lub wywołania narzędzia), a nie do pierwszego tokenu
+MODEL_FIRST_RESPONSE = "model_first_response"
+MODEL_TOTAL = "model_total"
+TOOL = "tool"
+# Przekazanie historii do bufora write-behind (w każdej turze)
+TRANSCRIPT_ENQUEUE = "transcript_enqueue"
+# Oczekiwanie tury na trwały zapis (ostatnia tura, przed statusem COMPLETED)
+TRANSCRIPT_FLUSH = "transcript_flush"
+# Faktyczny zapis transkryptu do storage (mierzony w wątku zapisu, poza turą)
+TRANSCRIPT_SAVE = "transcript_save"
+STATUS_UPDATE = "status_update"
+TURN_TOTAL = "turn_total"
+
+
+class Histogram:
+    """Histogram o stałych przedziałach (liczniki skumulowane liczone przy odczycie)."""
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # ostatni przedział: +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        """Przybliżony kwantyl (interpolacja liniowa w przedziale)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "avg": round(self.sum / self.count, 4) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+# (faza, model) -> Histogram
+_histograms: dict[tuple[str, str], Histogram] = {}
+# session_id -> ostatnie tury (najdawniej używane sesje usuwane po przekroczeniu limitu)
+_recent_turns: OrderedDict[str, deque] = OrderedDict()
+_lock = threading.Lock()
+# Wywołania modelu w toku (współbieżność)
+_model_calls = 0
+
+
+def _observe_locked(name: str, model: str, seconds: float):
+    key = (name, model)
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms[key] = Histogram()
+    histogram.observe(seconds)
+
+
+def observe(name: str, seconds: float, model: str = ""):
+    """Pomiar fazy wykonywanej poza turą (np. zapis transkryptu w wątku w tle)."""
+    if not LATENCY_METRICS_ENABLED:
+        return
+    with _lock:
+        _observe_locked(name, model, seconds)
+
+
+class TurnTimer:
+    """Pomiar jednej tury: czasy faz zbierane lokalnie, zapis do histogramów w `finish`."""
+
+    def __init__(self, session_id: str, model: str = ""):
+        self.session_id = session_id
+        self.model = model or ""
+        self.phases: list[tuple[str, float]] = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def observe(self, name: str, seconds: float):
+        self.phases.append((name, seconds))
+
+    def set_model(self, model: str):
+        self.model = model or ""
+
+    def model_events(self, events):
+        """Przepuszcza zdarzenia runnera ADK, mierząc czas do pierwszego zdarzenia modelu,
+        czas wywołań narzędzi (od function_call do function_response) i czas samego modelu."""
+        global _model_calls
+        start = time.perf_counter()
+        first = True
+        tool_starts = {}
+        tools_seconds = 0.0
+        with _lock:
+            _model_calls += 1
+        try:
+            for event in events:
+                now = time.perf_counter()
+                if first:
+                    self.observe(MODEL_FIRST_RESPONSE, now - start)
+                    first = False
+                for call in event.get_function_calls():
+                    tool_starts[call.id] = (call.name, now)
+                for response in event.get_function_responses():
+                    name, started = tool_starts.pop(response.id, (response.name, now))
+                    self.observe(f"{TOOL}.{name}", now - started)
+                    tools_seconds += now - started
+                yield event
+        finally:
+            with _lock:
+                _model_calls -= 1
+        self.observe(MODEL_TOTAL, time.perf_counter() - start - tools_seconds)
+
+    def finish(self):
+        total = time.perf_counter() - self._start
+        self.phases.append((TURN_TOTAL, total))
+        with _lock:
+            for name, seconds in self.phases:
+                _observe_locked(name, self.model, seconds)
+
+            turns = _recent_turns.get(self.session_id)
+            if turns is None:
+                turns = _recent_turns[self.session_id] = deque(maxlen=LATENCY_TURNS_PER_SESSION)
+                if len(_recent_turns) > LATENCY_MAX_SESSIONS:
+                    _recent_turns.popitem(last=False)
+            else:
+                _recent_turns.move_to_end(self.session_id)
+            turns.append({
+                "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "model": self.model,
+                "phases": [(name, round(seconds, 4)) for name, seconds in self.phases],
+            })
+
+        if LATENCY_LOG:
+            breakdown = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.phases)
+            print(f"LATENCY: sesja {self.session_id} ({self.model}): {breakdown}")
+
+
+class _NoopTurn:
+    """Tura bez pomiaru (LATENCY_METRICS=0)."""
+
+    session_id = model = ""
+
+    def phase(self, name: str):
+        return nullcontext()
+
+    def observe(self, name: str, seconds: float):
+        pass
+
+    def set_model(self, model: str):
+        pass
+
+    def model_events(self, events):
+        return events
+
+    def finish(self):
+        pass
+
+
+_NOOP_TURN = _NoopTurn()
+
+
+def start_turn(session_id: str, model: str = ""):
+    """Rozpoczyna pomiar tury (lub zwraca współdzielony obiekt no-op, gdy pomiar jest wyłączony)."""
+    if not LATENCY_METRICS_ENABLED:
+        return _NOOP_TURN
+    return TurnTimer(session_id, model)
+
+
+def model_name(agent) -> str:
+    """Nazwa modelu agenta ADK (model może być tekstem lub obiektem `BaseLlm`)."""
+    model = getattr(agent, "model", "")
+    return model if isinstance(model, str) else getattr(model, "model", type(model).__name__)
+
+
+def model_calls_in_flight() -> int:
+    return _model_calls
+
+
+def histograms() -> dict[tuple[str, str], Histogram]:
+    """Kopia histogramów (faza, model) -> Histogram (np. do eksportu metryk)."""
+    with _lock:
+        result = {}
+        for key, histogram in _histograms.items():
+            copy = Histogram(histogram.buckets)
+            copy.counts, copy.count, copy.sum = list(histogram.counts), histogram.count, histogram.sum
+            result[key] = copy
+    return result
+
+
+def stats() -> dict:
+    """Podsumowanie per faza i model: count, avg, p50, p95, p99 (sekundy)."""
+    result = {}
+    for (name, model), histogram in sorted(histograms().items()):
+        result.setdefault(name, {})[model] = histogram.summary()
+    return result
+
+
+def session_turns(session_id: str) -> list[dict]:
+    """Rozbicie ostatnich tur sesji na fazy (diagnostyka zgłoszeń konkretnego kandydata)."""
+    with _lock:
+        return list(_recent_turns.get(session_id, ()))
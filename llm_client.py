@@ -0,0 +1,48 @@
+"""
+Wspólny klient Gemini (google-genai) dla bezpośrednich wywołań modelu
+poza agentami ADK (ekstrakcja ankiet, kondensacja dokumentów) oraz wybór
+modelu agentów ADK.
+
+LLM_BACKEND=fake przełącza oba na deterministyczny model-atrapę z `fake_llm.py`
+(benchmarki i testy obciążeniowe bez sieci).
+"""
+
+import os
+import threading
+
+from google import genai
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# gemini (domyślnie) lub fake
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+
+_client = None
+_lock = threading.Lock()
+
+
+def is_fake_backend() -> bool:
+    return LLM_BACKEND == "fake"
+
+
+def get_genai_client() -> genai.Client:
+    """Zwraca współdzielony klient (tworzony leniwie, raz na proces)."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                if is_fake_backend():
+                    from fake_llm import FakeGenaiClient
+                    _client = FakeGenaiClient()
+                else:
+                    _client = genai.Client()
+    return _client
+
+
+def agent_model(model: str, role: str = "generic"):
+    """Model agenta ADK: nazwa modelu Gemini albo `FakeLlm` w danej roli (interviewer / planner / analyst)."""
+    if is_fake_backend():
+        from fake_llm import FakeLlm
+        return FakeLlm(model=f"fake-{model}", role=role)
+    return model
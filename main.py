@@ -0,0 +1,142 @@
+"""
+Host FastAPI dla obu aplikacji Gradio (panel admina pod /admin, rozmowa kandydata pod /candidate)
+z endpointami `/health` i `/metrics` (format tekstowy Prometheusa).
+
+Panel admina jest montowany tylko przy ustawionym ADMIN_PASSWORD (login z ADMIN_USER, domyślnie "admin").
+
+Uruchomienie:
+    python main.py                        (port z PORT, domyślnie 8000)
+    uvicorn main:app --host 0.0.0.0 --port 8080
+"""
+
+import os
+import time
+
+import gradio as gr
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, RedirectResponse
+
+import app_candidac
+import gcs_client
+import metrics
+from analyst.report_cache import report_cache
+from app_admin import demo as admin_demo
+from storage_backends import retention
+from transcript_writer import transcript_writer
+
+app = FastAPI()
+
+
+# --- METRYKI ---
+
+def _app_label(path: str) -> str:
+    # Etykieta o stałej liczbie wartości (ścieżki Gradio zawierają identyfikatory sesji/plików)
+    for prefix in ("/admin", "/candidate"):
+        if path.startswith(prefix):
+            return prefix.strip("/")
+    return "host"
+
+
+@app.middleware("http")
+async def http_metrics(request: Request, call_next):
+    app_name = _app_label(request.url.path)
+    start = time.perf_counter()
+    status = 500
+    with metrics.in_flight("http_requests_in_flight", app=app_name):
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            metrics.inc("http_requests_total", app=app_name, method=request.method, status=status)
+            metrics.observe("http_request_duration_seconds", time.perf_counter() - start, app=app_name)
+
+
+def _register_metrics():
+    metrics.register_callback(
+        "interview_runner_cache_size", lambda: len(app_candidac.active_runners),
+        description="Runnery ADK w pamięci (cache agentów rozmów)",
+    )
+    metrics.register_callback(
+        "interviews_active", lambda: len(app_candidac.conversations),
+        description="Rozmowy z historią w pamięci serwera",
+    )
+    metrics.register_callback(
+        "transcript_writer_pending", lambda: transcript_writer.stats()["pending"],
+        description="Transkrypty oczekujące na zapis (write-behind)",
+    )
+    metrics.register_callback(
+        "transcript_writer_written_total", lambda: transcript_writer.stats()["written"], kind="counter",
+        description="Transkrypty zapisane przez bufor write-behind",
+    )
+    metrics.register_callback(
+        "transcript_writer_failed_total", lambda: transcript_writer.stats()["failed"], kind="counter",
+        description="Nieudane zapisy transkryptów z bufora write-behind",
+    )
+    metrics.register_callback(
+        "gcs_http_requests_total", lambda: gcs_client.stats()["requests"], kind="counter",
+        description="Żądania HTTP do GCS (współdzielony klient)",
+    )
+    metrics.register_callback(
+        "gcs_http_new_connections_total", lambda: gcs_client.stats()["new_connections"], kind="counter",
+        description="Nowo otwarte połączenia do GCS (reszta żądań reużywa połączeń z puli)",
+    )
+    metrics.register_cache("report", lambda: (report_cache.hits, report_cache.misses))
+    # Retencja w tle procesu (RETENTION_EVERY_HOURS) - liczniki narastająco od startu
+    for key, description in (
+        ("runs", "Uruchomienia retencji"),
+        ("expired_sessions", "Sesje wygasłe według TTL statusu"),
+        ("archived_sessions", "Sesje zarchiwizowane przed usunięciem"),
+        ("archived_bytes", "Bajty zapisanych archiwów retencji"),
+        ("deleted_objects", "Obiekty / wiersze usunięte przez retencję"),
+        ("failed_batches", "Paczki retencji zakończone błędem (bez usunięcia)"),
+    ):
+        metrics.register_callback(
+            f"retention_{key}_total", lambda key=key: retention.stats()[key], kind="counter", description=description,
+        )
+    metrics.register_callback(
+        "retention_last_run_seconds", lambda: retention.stats()["last_run_seconds"] or 0,
+        description="Czas ostatniego uruchomienia retencji",
+    )
+
+
+_register_metrics()
+retention.start_retention_job()
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/health")
+def health_check():
+    return {"status": "ok"}
+
+
+# Przekierowanie z głównego adresu "/" na "/candidate" (link kandydata ma postać /?id=...)
+@app.get("/")
+async def root(request: Request):
+    url = "/candidate"
+    if request.query_params:
+        url += f"?{request.query_params}"
+    return RedirectResponse(url=url)
+
+
+# --- APLIKACJE GRADIO ---
+
+ADMIN_USER = os.getenv("ADMIN_USER", "admin")
+# Bez domyślnego hasła - bez ADMIN_PASSWORD panel admina nie jest wystawiany
+ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
+
+if ADMIN_PASSWORD:
+    app = gr.mount_gradio_app(app, admin_demo, path="/admin", auth=(ADMIN_USER, ADMIN_PASSWORD))
+else:
+    print("⚠️ Brak ADMIN_PASSWORD - panel admina (/admin) nie zostanie udostępniony")
+app = gr.mount_gradio_app(app, app_candidac.demo, path="/candidate")
+
+
+if __name__ == "__main__":
+    import uvicorn
+    # Port z env (dla Cloud Run) lub domyślnie 8000
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 8000)))
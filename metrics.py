@@ -0,0 +1,226 @@
+"""
+Metryki procesu w formacie tekstowym Prometheusa (endpoint `/metrics` w `main.py`).
+
+Liczniki i histogramy z etykietami są aktualizowane na gorącej ścieżce (żądania HTTP,
+operacje storage, trafienia cache). Wartości, które już są liczone gdzie indziej
+(rozmiar cache runnerów, bufor transkryptów, pula połączeń GCS), rejestrowane są jako
+funkcje odczytywane dopiero przy pobraniu `/metrics` - bez kosztu na gorącej ścieżce.
+Histogramy faz tury kandydata pochodzą z `latency.py`.
+"""
+
+import functools
+import inspect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+import latency
+from latency import Histogram
+
+# Opisy metryk (# HELP); nazwa bez opisu dostaje pusty opis
+DESCRIPTIONS = {
+    "http_requests_total": "Żądania HTTP według aplikacji, metody i kodu odpowiedzi",
+    "http_request_duration_seconds": "Czas obsługi żądania HTTP",
+    "http_requests_in_flight": "Żądania HTTP w trakcie obsługi",
+    "interview_turns_in_flight": "Tury rozmów z kandydatami w trakcie przetwarzania",
+    "interview_turn_phase_seconds": "Czas faz tury rozmowy (faza, model)",
+    "model_calls_in_flight": "Równoległe wywołania modelu agenta rozmowy",
+    "storage_operation_seconds": "Czas operacji storage",
+    "storage_operation_errors_total": "Błędy operacji storage",
+    "cache_requests_total": "Odczyty cache według wyniku (hit / miss)",
+    "cache_hit_ratio": "Odsetek trafień cache od startu procesu",
+    "interview_payload_bytes_total": "Bajty wymieniane z przeglądarką w turach rozmów (delta - obecny model, full - pełna historia w obie strony)",
+}
+
+_counters: dict[tuple[str, tuple], float] = {}
+_gauges: dict[tuple[str, tuple], float] = {}
+_histograms: dict[tuple[str, tuple], Histogram] = {}
+# nazwa -> (typ, funkcja zwracająca wartość lub {etykiety (tuple par): wartość})
+_callbacks: dict[str, tuple[str, Callable]] = {}
+# cache -> funkcja zwracająca (trafienia, chybienia) dla cache z własnymi licznikami
+_cache_sources: dict[str, Callable[[], tuple[int, int]]] = {}
+_lock = threading.Lock()
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def add_gauge(name: str, value: float, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        _gauges[key] = _gauges.get(key, 0) + value
+
+
+def observe(name: str, seconds: float, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+
+def register_callback(name: str, func: Callable, kind: str = "gauge", description: str = None):
+    """Metryka odczytywana przy pobraniu `/metrics`: `func()` zwraca liczbę lub {etykiety: liczba}."""
+    if description:
+        DESCRIPTIONS[name] = description
+    _callbacks[name] = (kind, func)
+
+
+@contextmanager
+def in_flight(name: str, **labels):
+    """Licznik operacji w toku (gauge zwiększany na wejściu i zmniejszany na wyjściu)."""
+    add_gauge(name, 1, **labels)
+    try:
+        yield
+    finally:
+        add_gauge(name, -1, **labels)
+
+
+def track_in_flight(name: str, **labels):
+    """Dekorator (także funkcji async) liczący wywołania w toku."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with in_flight(name, **labels):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with in_flight(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed(name: str, errors: str = None, **labels):
+    """Dekorator mierzący czas wywołania (histogram `name`) i liczący wyjątki (licznik `errors`)."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                if errors:
+                    inc(errors, **labels)
+                raise
+            finally:
+                observe(name, time.perf_counter() - start, **labels)
+        return wrapper
+    return decorator
+
+
+def cache_lookup(cache: str, hit: bool):
+    inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+def register_cache(cache: str, func: Callable[[], tuple[int, int]]):
+    """Cache liczący trafienia sam (np. cache raportów): `func()` zwraca (trafienia, chybienia)."""
+    _cache_sources[cache] = func
+
+
+# --- FORMAT TEKSTOWY PROMETHEUSA ---
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _render_histogram(lines: list, name: str, labels: tuple, histogram: Histogram):
+    cumulative = 0
+    for upper, bucket_count in zip(list(histogram.buckets) + [math.inf], histogram.counts):
+        cumulative += bucket_count
+        lines.append(f"{name}_bucket{_format_labels(labels, (('le', _format_value(float(upper))),))} {cumulative}")
+    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+
+def _cache_hit_ratios(counters: dict) -> dict:
+    totals = {}
+    for (name, labels), value in counters.items():
+        if name != "cache_requests_total":
+            continue
+        label_map = dict(labels)
+        hits, total = totals.get(label_map["cache"], (0, 0))
+        totals[label_map["cache"]] = (hits + (value if label_map["result"] == "hit" else 0), total + value)
+    return {(("cache", cache),): hits / total for cache, (hits, total) in totals.items() if total}
+
+
+def render() -> str:
+    """Wszystkie metryki w formacie tekstowym Prometheusa (text/plain; version=0.0.4)."""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        histograms = {key: (h.counts[:], h.count, h.sum) for key, h in _histograms.items()}
+    for cache, func in list(_cache_sources.items()):
+        hits, misses = func()
+        counters[("cache_requests_total", _labels({"cache": cache, "result": "hit"}))] = hits
+        counters[("cache_requests_total", _labels({"cache": cache, "result": "miss"}))] = misses
+
+    # name -> (typ, [(etykiety, wartość lub Histogram)])
+    families: dict[str, tuple[str, list]] = {}
+    for (name, labels), value in counters.items():
+        families.setdefault(name, ("counter", []))[1].append((labels, value))
+    for (name, labels), value in gauges.items():
+        families.setdefault(name, ("gauge", []))[1].append((labels, value))
+    for (name, labels), (counts, count, total) in histograms.items():
+        histogram = Histogram()
+        histogram.counts, histogram.count, histogram.sum = counts, count, total
+        families.setdefault(name, ("histogram", []))[1].append((labels, histogram))
+    for (phase, model), histogram in latency.histograms().items():
+        families.setdefault("interview_turn_phase_seconds", ("histogram", []))[1].append(
+            (_labels({"phase": phase, "model": model}), histogram)
+        )
+    families["model_calls_in_flight"] = ("gauge", [((), latency.model_calls_in_flight())])
+    ratios = _cache_hit_ratios(counters)
+    if ratios:
+        families["cache_hit_ratio"] = ("gauge", list(ratios.items()))
+
+    for name, (kind, func) in list(_callbacks.items()):
+        try:
+            value = func()
+        except Exception as e:
+            print(f"Metryki: błąd odczytu {name}: {e}")
+            continue
+        if value is None:
+            continue
+        samples = list(value.items()) if isinstance(value, dict) else [((), value)]
+        families[name] = (kind, [(labels, sample) for labels, sample in samples if sample is not None])
+
+    lines = []
+    for name in sorted(families):
+        kind, samples = families[name]
+        lines.append(f"# HELP {name} {DESCRIPTIONS.get(name, '')}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(samples, key=lambda sample: sample[0]):
+            if kind == "histogram":
+                _render_histogram(lines, name, labels, value)
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -1,94 +1,65 @@
-import json
 import os
+import threading
 import uuid
 from pathlib import Path
+from typing import Iterator
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import events
+import metrics
+import tracing
+from storage_backends import StorageBackend, LocalJSONBackend, GCSBackend, SQLiteBackend, get_io_pool
 
 from dotenv import load_dotenv
 load_dotenv()
 
 
-# Konfiguracja trybu (LOCAL lub GCS)
+# Konfiguracja trybu (LOCAL, GCS lub SQLITE)
 STORAGE_MODE = os.getenv("STORAGE_MODE", "LOCAL") # Domyślnie lokalnie
 BUCKET_NAME = os.getenv("BUCKET_NAME", "adk-hr-feedback-data")
 
 # --- KONFIGURACJA LOKALNA ---
 BASE_DIR = Path(__file__).parent / "data"
-SCENARIOS_DIR = BASE_DIR / "scenarios"
-TRANSCRIPTS_DIR = BASE_DIR / "transcripts"
-
-if STORAGE_MODE == "LOCAL":
-    SCENARIOS_DIR.mkdir(parents=True, exist_ok=True)
-    TRANSCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
-
-# --- KONFIGURACJA GCS (Lazy loading) ---
-gcs_client = None
-gcs_bucket = None
-
-def get_gcs_bucket():
-    global gcs_client, gcs_bucket
-    if gcs_client is None:
-        from google.cloud import storage
-        gcs_client = storage.Client()
-        gcs_bucket = gcs_client.bucket(BUCKET_NAME)
-    return gcs_bucket
-
-# --- FUNKCJE POMOCNICZE ---
-
-def _save_json(path_key: str, data: dict):
-    if STORAGE_MODE == "GCS":
-        bucket = get_gcs_bucket()
-        blob = bucket.blob(path_key)
-        blob.upload_from_string(json.dumps(data, ensure_ascii=False, indent=2), content_type='application/json')
-    else:
-        # Local
-        file_path = BASE_DIR / path_key
-        # Upewnij się, że podkatalog istnieje (dla bezpieczeństwa przy manualnych ścieżkach)
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-
-def _load_json(path_key: str) -> dict:
+SQLITE_PATH = Path(os.getenv("SQLITE_PATH", str(BASE_DIR / "hr_feedback.db")))
+
+# --- SILNIK PRZECHOWYWANIA (Lazy loading) ---
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend() -> StorageBackend:
+    """Silnik wybrany przez STORAGE_MODE (tworzony przy pierwszym użyciu)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if STORAGE_MODE == "GCS":
+                    _backend = GCSBackend(BUCKET_NAME)
+                elif STORAGE_MODE == "SQLITE":
+                    _backend = SQLiteBackend(SQLITE_PATH)
+                else:
+                    _backend = LocalJSONBackend(BASE_DIR)
+    return _backend
+
+def warm_up_storage():
+    """Przy starcie aplikacji zestawia w tle połączenia z bucketami (storage i transkrypty agenta)."""
+    from gcs_client import warm_up
     if STORAGE_MODE == "GCS":
-        bucket = get_gcs_bucket()
-        blob = bucket.blob(path_key)
-        if not blob.exists():
-            return None
-        return json.loads(blob.download_as_string())
-    else:
-        # Local
-        file_path = BASE_DIR / path_key
-        if not file_path.exists():
-            return None
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-
-def _list_files(prefix: str) -> list:
-    """Zwraca listę obiektów JSON (ich zawartość) z danego katalogu/prefixu."""
-    results = []
-    if STORAGE_MODE == "GCS":
-        bucket = get_gcs_bucket()
-        blobs = bucket.list_blobs(prefix=prefix)
-        for blob in blobs:
-            if blob.name.endswith(".json"):
-                try:
-                    results.append(json.loads(blob.download_as_string()))
-                except:
-                    pass
-    else:
-        # Local
-        target_dir = BASE_DIR / prefix
-        if target_dir.exists():
-            for file_path in target_dir.glob("*.json"):
-                try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        results.append(json.load(f))
-                except:
-                    pass
-    return results
+        warm_up(BUCKET_NAME)
+    agent_bucket = os.getenv("GCS_BUCKET_NAME")
+    if agent_bucket and not (STORAGE_MODE == "GCS" and agent_bucket == BUCKET_NAME):
+        warm_up(agent_bucket)
+
+def _storage_op(func):
+    """Czas i błędy operacji storage (metryki `storage_operation_*` per operacja i silnik) oraz span `storage.*`."""
+    timed = metrics.timed(
+        "storage_operation_seconds", errors="storage_operation_errors_total", operation=func.__name__, backend=STORAGE_MODE,
+    )(func)
+    return tracing.traced(f"storage.{func.__name__}", **{"storage.backend": STORAGE_MODE})(timed)
 
 # --- GŁÓWNE API STORAGE ---
 
+@_storage_op
 def save_scenario(data: dict) -> str:
     """Zapisuje konfigurację scenariusza i zwraca ID sesji."""
     session_id = data.get("session_id")
@@ -101,73 +72,204 @@ def save_scenario(data: dict) -> str:
     if "status" not in data:
         data["status"] = "GENERATED"
         
-    # Ścieżka względna (dla GCS i Local)
-    path_key = f"scenarios/{session_id}.json"
-    _save_json(path_key, data)
+    get_backend().save_scenario(data)
+    events.publish(events.SCENARIO_SAVED, {
+        "session_id": session_id,
+        "candidate_name": data.get("candidate_name", "N/A"),
+        "status": data["status"],
+        "created_at": data["created_at"],
+    })
     
     return session_id
 
+def save_scenarios(items: list[dict], max_workers: int = 8, return_exceptions: bool = False) -> list:
+    """Zapisuje wiele scenariuszy naraz (w GCS równolegle) i zwraca ich ID sesji.
+
+    Args:
+        return_exceptions: Zamiast przerywać na pierwszym błędzie, zwraca wyjątek na pozycji
+            nieudanego zapisu (pozostałe scenariusze są zapisywane i mają swoje ID)
+    """
+    def save(item: dict):
+        try:
+            return save_scenario(item)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            return e
+
+    if STORAGE_MODE == "GCS" and len(items) > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(tracing.with_context(save), item) for item in items]
+            return [future.result() for future in futures]
+    return [save(item) for item in items]
+
+def build_candidate_link(session_id: str) -> str:
+    """Link dla kandydata do rozmowy feedbackowej."""
+    # W trybie Cloud Run URL musi być dynamiczny lub z env, 
+    # ale dla uproszczenia zostawiamy localhost lub pobieramy BASE_URL
+    base_url = os.getenv("BASE_URL", "http://127.0.0.1:7861")
+    return f"{base_url}/?id={session_id}"
+
+@_storage_op
 def update_session_status(session_id: str, new_status: str):
     """Aktualizuje status sesji."""
-    data = get_scenario(session_id)
-    if data:
-        data["status"] = new_status
-        # Nadpisujemy plik
-        path_key = f"scenarios/{session_id}.json"
-        _save_json(path_key, data)
+    if not get_backend().update_status(session_id, new_status):
+        return
+    events.publish(events.SESSION_STATUS_CHANGED, {"session_id": session_id, "status": new_status})
 
+@_storage_op
 def get_scenario(session_id: str) -> dict:
     """Pobiera scenariusz na podstawie ID."""
-    path_key = f"scenarios/{session_id}.json"
-    return _load_json(path_key)
+    return get_backend().get_scenario(session_id)
 
+@_storage_op
 def save_transcript(session_id: str, history: list):
     """Zapisuje/Aktualizuje przebieg rozmowy."""
-    path_key = f"transcripts/{session_id}_transcript.json"
-    
     data = {
         "session_id": session_id,
         "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "history": history
     }
-    _save_json(path_key, data)
+    get_backend().save_transcript(session_id, data)
+
+@_storage_op
+def get_transcript_data(session_id: str) -> dict:
+    """Pobiera pełny dokument transkryptu (z `updated_at`) dla danej sesji."""
+    return get_backend().get_transcript(session_id)
 
 def get_transcript(session_id: str) -> list:
     """Pobiera historię rozmowy dla danej sesji."""
-    path_key = f"transcripts/{session_id}_transcript.json"
-    data = _load_json(path_key)
+    data = get_transcript_data(session_id)
     if data:
         return data.get("history", [])
     return None
 
+@_storage_op
+def load_session_data(session_id: str) -> tuple[dict, list]:
+    """Pobiera równolegle scenariusz i historię rozmowy (jedno opóźnienie sieciowe zamiast kilku).
+
+    Returns:
+        (scenariusz lub None, historia lub None)
+    """
+    pool = get_io_pool()
+    scenario_future = pool.submit(get_scenario, session_id)
+    transcript_future = pool.submit(get_transcript, session_id)
+    return scenario_future.result(), transcript_future.result()
+
+@_storage_op
 def get_all_transcripts() -> list[dict]:
     """Pobiera wszystkie zapisane rozmowy do analizy."""
-    return _list_files("transcripts")
+    return get_backend().list_transcripts()
+
+def iter_sessions(status: str = None, date_from: str = None, date_to: str = None, prefetch: int = 8) -> Iterator[dict]:
+    """Strumieniowo zwraca sesje (scenariusz + historia) spełniające filtry, jedna po drugiej.
 
+    Pamięć nie rośnie z liczbą sesji: w danej chwili trzymamy najwyżej `prefetch`
+    transkryptów pobieranych z wyprzedzeniem w puli I/O.
+
+    Args:
+        status: Dokładny status (np. COMPLETED)
+        date_from: Data utworzenia od `RRRR-MM-DD` (włącznie)
+        date_to: Data utworzenia do `RRRR-MM-DD` (włącznie)
+        prefetch: Liczba transkryptów pobieranych równolegle z wyprzedzeniem
+    """
+    for scenario, transcript in get_backend().iter_session_documents(
+        status=status, date_from=date_from, date_to=date_to, prefetch=prefetch,
+    ):
+        yield {
+            "session_id": scenario.get("session_id"),
+            "candidate_name": scenario.get("candidate_name", ""),
+            "status": scenario.get("status", ""),
+            "created_at": scenario.get("created_at", ""),
+            "updated_at": (transcript or {}).get("updated_at", ""),
+            "context": scenario.get("context", ""),
+            "history": (transcript or {}).get("history", []),
+        }
+
+@_storage_op
+def save_survey(session_id: str, survey: dict):
+    """Zapisuje ustrukturyzowaną ankietę wyekstrahowaną z rozmowy."""
+    get_backend().save_survey(session_id, survey)
+
+@_storage_op
+def get_survey(session_id: str) -> dict:
+    """Pobiera ustrukturyzowaną ankietę dla danej sesji."""
+    return get_backend().get_survey(session_id)
+
+@_storage_op
+def get_all_surveys() -> list[dict]:
+    """Pobiera wszystkie ustrukturyzowane ankiety."""
+    return get_backend().list_surveys()
+
+@_storage_op
+def get_completed_corpus_version() -> str:
+    """Zwraca wersję korpusu ukończonych rozmów (liczba transkryptów + znacznik ich zmian).
+
+    Zmienia się, gdy pojawi się nowa (lub zaktualizowana) ukończona rozmowa, dzięki czemu
+    może służyć jako klucz unieważniania cache raportów analitycznych. Silniki obiektowe
+    liczą ją z samego listingu (nazwy i wersje obiektów), SQLite - jednym zapytaniem.
+    """
+    return get_backend().completed_corpus_version()
+
+def _session_row(data: dict) -> list:
+    """Wiersz tabeli sesji w Admin Panelu."""
+    return [
+        data.get("session_id"),
+        data.get("candidate_name", "N/A"),
+        data.get("status", "UNKNOWN"),
+        data.get("created_at", ""),
+        build_candidate_link(data.get("session_id")),
+    ]
+
+@_storage_op
 def get_sessions_summary() -> list[list]:
     """Zwraca listę sesji do tabeli w Admin Panelu."""
-    sessions = []
-    scenarios = _list_files("scenarios")
-    
-    for data in scenarios:
-        # W trybie Cloud Run URL musi być dynamiczny lub z env, 
-        # ale dla uproszczenia zostawiamy localhost lub pobieramy BASE_URL
-        base_url = os.getenv("BASE_URL", "http://127.0.0.1:7861")
-        
-        link = f"{base_url}/?id={data.get('session_id')}"
-        
-        sessions.append([
-            data.get("session_id"),
-            data.get("candidate_name", "N/A"),
-            data.get("status", "UNKNOWN"),
-            data.get("created_at", ""),
-            link
-        ])
+    sessions = [_session_row(data) for data in get_backend().list_scenarios()]
             
     # Sortowanie od najnowszych
     sessions.sort(key=lambda x: x[3], reverse=True)
     return sessions
 
+@_storage_op
+def query_sessions(
+    status: str = None,
+    candidate: str = None,
+    date_from: str = None,
+    date_to: str = None,
+    descending: bool = True,
+    page_size: int = 20,
+    cursor: str = None,
+) -> dict:
+    """Zwraca jedną stronę sesji (filtrowanie i sortowanie po stronie serwera).
+
+    Args:
+        status: Dokładny status (GENERATED / ONGOING / COMPLETED)
+        candidate: Fragment imienia/nazwiska kandydata (bez rozróżniania wielkości liter)
+        date_from: Data początkowa `RRRR-MM-DD` (włącznie)
+        date_to: Data końcowa `RRRR-MM-DD` (włącznie)
+        descending: Sortowanie po `created_at` od najnowszych
+        page_size: Liczba wierszy na stronie
+        cursor: Kursor z poprzedniej strony (`next_cursor`)
+
+    Returns:
+        Słownik: rows (wiersze tabeli), next_cursor (None na ostatniej stronie), total
+    """
+    # Silnik SQLITE realizuje zapytanie na indeksach, pozostałe - skanem dokumentów
+    page, next_cursor, total = get_backend().query_sessions(
+        status=status,
+        candidate=candidate,
+        date_from=date_from,
+        date_to=date_to,
+        descending=descending,
+        page_size=page_size,
+        cursor=cursor,
+    )
+    return {
+        "rows": [_session_row(data) for data in page],
+        "next_cursor": next_cursor,
+        "total": total,
+    }
+
 def load_survey_text() -> str:
     return """
 Jesteś Asystentem HR (Managerem Procesu). Twoim zadaniem jest przygotowanie scenariusza rozmowy feedbackowej (Candidate Experience).
@@ -0,0 +1,4 @@
+from .base import StorageBackend, get_io_pool
+from .local import LocalJSONBackend
+from .gcs import GCSBackend
+from .sqlite import SQLiteBackend
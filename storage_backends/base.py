@@ -0,0 +1,537 @@
+"""
+Interfejs silnika przechowywania danych (scenariusze, transkrypty, ankiety).
+`storage.py` wybiera implementację na podstawie STORAGE_MODE i udostępnia
+aplikacjom stabilne API funkcyjne.
+"""
+
+import contextvars
+import hashlib
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+
+from . import serialization
+
+# Kolejność statusów - zapis nie może cofnąć sesji (np. COMPLETED -> ONGOING)
+STATUS_ORDER = {"GENERATED": 0, "ONGOING": 1, "COMPLETED": 2}
+
+# Indeks paczek ukończonych sesji (kompakcja)
+BUNDLE_INDEX_KEY = "bundles/index.json"
+# Jak często brak sesji w indeksie może wymusić sprawdzenie, czy indeks się zmienił (s)
+BUNDLE_INDEX_REFRESH_SECONDS = float(os.getenv("BUNDLE_INDEX_REFRESH_SECONDS", "30"))
+BUNDLE_INDEX_WRITE_ATTEMPTS = 5
+
+# Pula wątków do równoległych odczytów (np. scenariusz + transkrypt przy starcie sesji)
+_io_pool = None
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """Pula, w której zadanie wykonuje się w kopii contextvars zlecającego
+    (np. bieżący span śledzenia przechodzi do wątku roboczego)."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def get_io_pool() -> ThreadPoolExecutor:
+    global _io_pool
+    if _io_pool is None:
+        _io_pool = ContextThreadPoolExecutor(max_workers=int(os.getenv("STORAGE_IO_WORKERS", "8")))
+    return _io_pool
+
+
+def is_status_regression(current: str, new_status: str) -> bool:
+    if current not in STATUS_ORDER or new_status not in STATUS_ORDER:
+        return False
+    return STATUS_ORDER[new_status] < STATUS_ORDER[current]
+
+
+def session_sort_key(data: dict) -> tuple:
+    """Klucz sortowania listy sesji; kursor stronicowania to klucz ostatniego wiersza strony."""
+    return (data.get("created_at", ""), data.get("session_id", ""))
+
+
+def matches_filters(data: dict, status: str = None, date_from: str = None, date_to: str = None) -> bool:
+    """Czy scenariusz spełnia filtr statusu i zakresu dat utworzenia (`RRRR-MM-DD`, włącznie)."""
+    created_at = data.get("created_at", "")
+    if status and data.get("status") != status:
+        return False
+    if date_from and created_at[:10] < date_from:
+        return False
+    if date_to and created_at[:10] > date_to:
+        return False
+    return True
+
+
+def encode_cursor(key: tuple) -> str:
+    return "|".join(key)
+
+
+def decode_cursor(cursor: str) -> tuple:
+    return tuple(cursor.split("|", 1))
+
+
+class StorageBackend(ABC):
+    """Silnik przechowywania. Metody operują na gotowych dokumentach (dict);
+    nadawanie ID, dat i publikacja zdarzeń odbywa się w `storage.py`."""
+
+    name = "base"
+
+    # --- scenariusze ---
+
+    @abstractmethod
+    def save_scenario(self, data: dict):
+        """Zapisuje (nadpisuje) scenariusz o `data["session_id"]`."""
+
+    @abstractmethod
+    def get_scenario(self, session_id: str) -> dict:
+        """Scenariusz z aktualnym statusem lub None."""
+
+    @abstractmethod
+    def list_scenarios(self) -> list[dict]:
+        """Wszystkie scenariusze z aktualnym statusem."""
+
+    @abstractmethod
+    def update_status(self, session_id: str, new_status: str) -> bool:
+        """Zmienia status sesji. False, gdy sesji nie ma lub zmiana cofnęłaby status."""
+
+    # --- transkrypty ---
+
+    @abstractmethod
+    def save_transcript(self, session_id: str, data: dict):
+        """Zapisuje dokument transkryptu (`session_id`, `updated_at`, `history`)."""
+
+    @abstractmethod
+    def get_transcript(self, session_id: str) -> dict:
+        """Dokument transkryptu lub None."""
+
+    @abstractmethod
+    def list_transcripts(self) -> list[dict]:
+        """Wszystkie dokumenty transkryptów."""
+
+    # --- usuwanie (retencja) ---
+
+    @abstractmethod
+    def delete_sessions(self, session_ids: list[str]) -> int:
+        """Usuwa scenariusze, transkrypty i ankiety podanych sesji jedną paczką operacji. Zwraca liczbę usuniętych obiektów."""
+
+    # --- ankiety ---
+
+    @abstractmethod
+    def save_survey(self, session_id: str, survey: dict):
+        """Zapisuje ustrukturyzowaną ankietę."""
+
+    @abstractmethod
+    def get_survey(self, session_id: str) -> dict:
+        """Ankieta lub None."""
+
+    @abstractmethod
+    def list_surveys(self) -> list[dict]:
+        """Wszystkie ankiety."""
+
+    # --- odczyt strumieniowy (stała pamięć niezależnie od liczby sesji) ---
+
+    def iter_scenarios(self, status: str = None, date_from: str = None, date_to: str = None) -> Iterator[dict]:
+        """Kolejne scenariusze (z aktualnym statusem) spełniające filtry."""
+        for data in self.list_scenarios():
+            if matches_filters(data, status, date_from, date_to):
+                yield data
+
+    def iter_transcripts(self) -> Iterator[dict]:
+        """Kolejne dokumenty transkryptów."""
+        yield from self.list_transcripts()
+
+    def iter_session_documents(
+        self, status: str = None, date_from: str = None, date_to: str = None, prefetch: int = 8,
+    ) -> Iterator[tuple[dict, dict]]:
+        """Pary (scenariusz, transkrypt lub None) dla sesji spełniających filtry."""
+        scenarios = self.iter_scenarios(status=status, date_from=date_from, date_to=date_to)
+        yield from self._with_transcripts(scenarios, prefetch)
+
+    def _with_transcripts(self, scenarios: Iterator[dict], prefetch: int) -> Iterator[tuple[dict, dict]]:
+        # Transkrypty pobierane z wyprzedzeniem w puli I/O; w pamięci najwyżej `prefetch` naraz
+        pool = get_io_pool()
+        window = deque()
+        for scenario in scenarios:
+            window.append((scenario, pool.submit(self.get_transcript, scenario.get("session_id"))))
+            if len(window) >= prefetch:
+                done, future = window.popleft()
+                yield done, future.result()
+        while window:
+            done, future = window.popleft()
+            yield done, future.result()
+
+    # --- zapytania (domyślnie pełny skan; silniki z indeksami nadpisują) ---
+
+    def query_sessions(
+        self,
+        status: str = None,
+        candidate: str = None,
+        date_from: str = None,
+        date_to: str = None,
+        descending: bool = True,
+        page_size: int = 20,
+        cursor: str = None,
+    ) -> tuple[list[dict], str, int]:
+        """Strona scenariuszy spełniających filtry.
+
+        Returns:
+            (scenariusze na stronie, kursor następnej strony lub None, liczba wszystkich wyników)
+        """
+        candidate = (candidate or "").strip().lower()
+        matching = [
+            data for data in self.iter_scenarios(status=status, date_from=date_from, date_to=date_to)
+            if not candidate or candidate in (data.get("candidate_name") or "").lower()
+        ]
+
+        matching.sort(key=session_sort_key, reverse=descending)
+        remaining = matching
+        if cursor:
+            last_key = decode_cursor(cursor)
+            if descending:
+                remaining = [d for d in matching if session_sort_key(d) < last_key]
+            else:
+                remaining = [d for d in matching if session_sort_key(d) > last_key]
+
+        page = remaining[:page_size]
+        next_cursor = encode_cursor(session_sort_key(page[-1])) if len(remaining) > page_size else None
+        return page, next_cursor, len(matching)
+
+    def completed_corpus_version(self) -> str:
+        """Liczba transkryptów ukończonych sesji + ostatni `updated_at`."""
+        completed_ids = {
+            data.get("session_id")
+            for data in self.list_scenarios()
+            if data.get("status") == "COMPLETED"
+        }
+        count = 0
+        latest_update = ""
+        for data in self.list_transcripts():
+            if data.get("session_id") in completed_ids:
+                count += 1
+                latest_update = max(latest_update, data.get("updated_at", ""))
+        return f"{count}@{latest_update}"
+
+
+class KeyValueBackend(StorageBackend):
+    """Wspólna logika silników dokumentowych (pliki JSON / obiekty GCS) o układzie:
+    `scenarios/{id}.json`, `transcripts/{id}_transcript.json`, `surveys/{id}.json`.
+
+    Ukończone sesje mogą być spakowane (zob. `compaction.py`) do dziennych paczek
+    NDJSON `bundles/...ndjson`; indeks `bundles/index.json` wskazuje paczkę, offset
+    i długość rekordu, więc pojedynczy odczyt to jedno żądanie zakresu bajtów.
+    Dokument luźny (np. zapisany ponownie po spakowaniu) ma pierwszeństwo przed paczką.
+    """
+
+    @abstractmethod
+    def _save_json(self, path_key: str, data: dict):
+        pass
+
+    @abstractmethod
+    def _load_json(self, path_key: str) -> dict:
+        """Dokument lub None, gdy nie istnieje (bez wstępnego sprawdzania istnienia)."""
+
+    @abstractmethod
+    def _iter_files(self, prefix: str) -> Iterator[dict]:
+        """Strumieniowo: zawartość kolejnych dokumentów JSON pod danym prefixem."""
+
+    def _list_files(self, prefix: str) -> list[dict]:
+        """Zawartość wszystkich dokumentów JSON pod danym prefixem."""
+        return list(self._iter_files(prefix))
+
+    # --- surowe obiekty (paczki i indeks) ---
+
+    @abstractmethod
+    def _write_bytes(self, path_key: str, payload: bytes, content_type: str):
+        pass
+
+    @abstractmethod
+    def _replace_bytes(self, path_key: str, payload: bytes, content_type: str, expected_version) -> object:
+        """Zapis warunkowy: tylko gdy obiekt ma wersję `expected_version` (None = nie istnieje).
+
+        Returns:
+            Nowy znacznik wersji lub None, gdy obiekt zmienił się w międzyczasie (konflikt).
+        """
+
+    @abstractmethod
+    def _read_bytes(self, path_key: str, start: int = None, length: int = None) -> bytes:
+        """Treść (lub zakres bajtów) obiektu; None, gdy nie istnieje."""
+
+    @abstractmethod
+    def _iter_lines(self, path_key: str) -> Iterator[bytes]:
+        """Strumieniowo: kolejne linie obiektu (bez wczytywania całości)."""
+
+    @abstractmethod
+    def _delete(self, path_key: str) -> bool:
+        """Usuwa obiekt. False, gdy obiekt nie istniał (to nie jest błąd)."""
+
+    def _delete_many(self, path_keys: list[str]) -> int:
+        """Usuwa wiele obiektów (domyślnie równolegle w puli I/O). Zwraca liczbę usuniętych."""
+        return sum(get_io_pool().map(self._delete, path_keys))
+
+    @abstractmethod
+    def _version(self, path_key: str):
+        """Znacznik wersji obiektu (np. generacja / mtime); None, gdy nie istnieje."""
+
+    @abstractmethod
+    def _iter_versions(self, prefix: str) -> Iterator[tuple[str, object]]:
+        """Strumieniowo: (klucz, znacznik wersji) dokumentów JSON pod prefixem - z samego listingu, bez pobierania treści."""
+
+    def _completed_session_ids(self) -> set:
+        """ID ukończonych sesji z metadanych (bez czytania scenariuszy) lub None, gdy silnik ich nie zna."""
+        return None
+
+    def _overlay_statuses(self, scenarios: Iterator[dict]) -> Iterator[dict]:
+        """Nakłada aktualny status na strumień scenariuszy (silniki z osobnym statusem nadpisują)."""
+        return scenarios
+
+    # --- indeks paczek ---
+
+    def _bundle_index(self, refresh: bool = False) -> dict:
+        """Indeks paczek: {"sessions": {id: [paczka, offset, długość]}, "bundles": [...]}."""
+        cached = getattr(self, "_bundle_index_cache", None)
+        if cached is not None and not refresh:
+            return cached
+        version = self._version(BUNDLE_INDEX_KEY)
+        self._bundle_index_checked_at = time.monotonic()
+        if cached is not None and version == getattr(self, "_bundle_index_version", None):
+            return cached
+        raw = self._read_bytes(BUNDLE_INDEX_KEY)
+        index = serialization.decode(raw) if raw else {"sessions": {}, "bundles": []}
+        self._bundle_index_cache, self._bundle_index_version = index, version
+        return index
+
+    def _update_bundle_index(self, update) -> dict:
+        """Read-modify-write indeksu paczek z zapisem warunkowym na wersję - równoległe
+        zadania (kompakcja, retencja) nie nadpisują sobie zmian; przy konflikcie ponawiamy.
+
+        `update(index)` dostaje kopię indeksu i zwraca nowy indeks lub None (bez zmian).
+        """
+        for _ in range(BUNDLE_INDEX_WRITE_ATTEMPTS):
+            index = self._bundle_index(refresh=True)
+            version = self._bundle_index_version
+            updated = update({"sessions": dict(index["sessions"]), "bundles": list(index["bundles"])})
+            if updated is None:
+                return index
+            new_version = self._replace_bytes(
+                BUNDLE_INDEX_KEY, serialization.dumps(updated), content_type="application/json", expected_version=version,
+            )
+            if new_version is not None:
+                self._bundle_index_cache, self._bundle_index_version = updated, new_version
+                return updated
+        raise RuntimeError("Nie udało się zapisać indeksu paczek (konflikt zapisów)")
+
+    def _bundle_record(self, session_id: str) -> dict:
+        """Rekord sesji z paczki ({"session_id", "scenario", "transcript"}) lub None."""
+        entry = self._bundle_index()["sessions"].get(session_id)
+        checked_at = getattr(self, "_bundle_index_checked_at", 0.0)
+        if entry is None and time.monotonic() - checked_at >= BUNDLE_INDEX_REFRESH_SECONDS:
+            # Sesja mogła zostać spakowana po wczytaniu indeksu - sprawdzamy, czy indeks się zmienił,
+            # ale nie przy każdym braku (nowe sesje nie mają jeszcze transkryptu i nie płacą za to żądaniem)
+            entry = self._bundle_index(refresh=True)["sessions"].get(session_id)
+        if entry is None:
+            return None
+        bundle_key, offset, length = entry
+        raw = self._read_bytes(bundle_key, start=offset, length=length)
+        return serialization.loads(raw) if raw else None
+
+    def _iter_bundle_records(self) -> Iterator[dict]:
+        index = self._bundle_index(refresh=True)
+        for bundle_key in index["bundles"]:
+            for line in self._iter_lines(bundle_key):
+                if not line.strip():
+                    continue
+                record = serialization.loads(line)
+                # Pomijamy rekordy usunięte z indeksu (retencja) lub zastąpione nowszą paczką
+                entry = index["sessions"].get(record["session_id"])
+                if entry and entry[0] == bundle_key:
+                    yield record
+
+    def _rewrite_bundle(self, bundle_key: str, keep: set) -> tuple[str, dict]:
+        """Nowa paczka z rekordami sesji `keep` ze starej (jeden strumieniowy odczyt).
+
+        Returns:
+            (klucz nowej paczki, {session_id: [paczka, offset, długość]})
+        """
+        lines, entries, offset = [], {}, 0
+        for line in self._iter_lines(bundle_key):
+            line = line.rstrip(b"\n")
+            if not line.strip():
+                continue
+            session_id = serialization.loads(line)["session_id"]
+            if session_id not in keep or session_id in entries:
+                continue
+            entries[session_id] = [None, offset, len(line)]
+            lines.append(line + b"\n")
+            offset += len(line) + 1
+        # Znacznik przepisania zastępuje poprzedni - nazwa nie rośnie przy kolejnych retencjach
+        stem = re.sub(r"-r\d+$", "", bundle_key.removesuffix(".ndjson"))
+        new_key = f"{stem}-r{int(time.time() * 1000)}.ndjson"
+        self._write_bytes(new_key, b"".join(lines), content_type="application/x-ndjson")
+        for entry in entries.values():
+            entry[0] = new_key
+        return new_key, entries
+
+    def _drop_from_bundles(self, session_ids: list[str]) -> int:
+        """Usuwa sesje z paczek: paczki bez żadnej sesji są kasowane, a paczki współdzielone
+        z żywymi sesjami przepisywane bez usuniętych rekordów (dane faktycznie znikają).
+
+        Returns:
+            Liczba usuniętych starych paczek
+        """
+        dropped = set(session_ids)
+        index = self._bundle_index(refresh=True)
+        affected = {entry[0] for sid, entry in index["sessions"].items() if sid in dropped}
+        if not affected:
+            return 0
+        # Nowe paczki powstają przed zmianą indeksu - czytelnicy cały czas widzą kompletne dane
+        rewritten = {}
+        for bundle_key in affected:
+            keep = {sid for sid, entry in index["sessions"].items() if entry[0] == bundle_key and sid not in dropped}
+            if keep:
+                rewritten[bundle_key] = self._rewrite_bundle(bundle_key, keep)
+
+        def update(index: dict) -> dict:
+            sessions = {}
+            for sid, entry in index["sessions"].items():
+                if sid in dropped:
+                    continue
+                if entry[0] in rewritten and sid in rewritten[entry[0]][1]:
+                    entry = rewritten[entry[0]][1][sid]
+                sessions[sid] = entry
+            if sessions == index["sessions"]:
+                return None
+            bundles = [rewritten[key][0] if key in rewritten else key for key in index["bundles"]]
+            used = {entry[0] for entry in sessions.values()}
+            return {"sessions": sessions, "bundles": [key for key in bundles if key in used]}
+
+        # Najpierw indeks (czytelnicy przestają widzieć usunięte sesje), potem stare paczki
+        self._update_bundle_index(update)
+        # Przepisana paczka, do której indeks nie trafił (np. równoległa zmiana), jest porzucana
+        live = {entry[0] for entry in self._bundle_index()["sessions"].values()}
+        orphans = [new_key for new_key, _ in rewritten.values() if new_key not in live]
+        self._delete_many(orphans)
+        return self._delete_many(sorted(affected - live))
+
+    # --- wersja korpusu (cache raportów) ---
+
+    def completed_corpus_version(self) -> str:
+        """Liczba transkryptów ukończonych sesji + skrót nazw i wersji ich transkryptów oraz ankiet.
+
+        Do wersji trafiają tylko sesje COMPLETED (statusy z metadanych GCS / indeksu statusów
+        silnika lokalnego), więc tury trwających rozmów i nowe scenariusze nie unieważniają
+        cache raportów. Silnik bez statusów (None) haszuje wszystkie transkrypty i scenariusze -
+        wersja zmienia się wtedy częściej, ale nigdy za rzadko.
+        """
+        completed = self._completed_session_ids()
+        digest = hashlib.sha1()
+        count = 0
+        for key, version in sorted(self._iter_versions("transcripts")):
+            session_id = key.rsplit("/", 1)[-1].removesuffix("_transcript.json")
+            if completed is not None and session_id not in completed:
+                continue
+            count += 1
+            digest.update(f"{key}:{version}\n".encode("utf-8"))
+        if completed is None:
+            for key, version in sorted(self._iter_versions("scenarios")):
+                digest.update(f"{key}:{version}\n".encode("utf-8"))
+        # Ankiety powstają w tle już po COMPLETED - ich pojawienie się też zmienia wersję
+        for key, version in sorted(self._iter_versions("surveys")):
+            digest.update(f"{key}:{version}\n".encode("utf-8"))
+        # Spakowane sesje są zawsze ukończone; zmieniają się tylko razem z indeksem paczek
+        count += len(self._bundle_index(refresh=True)["sessions"])
+        digest.update(f"{BUNDLE_INDEX_KEY}:{self._bundle_index_version}".encode("utf-8"))
+        return f"{count}@{digest.hexdigest()[:16]}"
+
+    # --- scenariusze ---
+
+    def save_scenario(self, data: dict):
+        self._save_json(f"scenarios/{data['session_id']}.json", data)
+
+    def get_scenario(self, session_id: str) -> dict:
+        data = self._load_json(f"scenarios/{session_id}.json")
+        if data is None:
+            record = self._bundle_record(session_id)
+            data = record and record["scenario"]
+        return data
+
+    def list_scenarios(self) -> list[dict]:
+        return list(self.iter_scenarios())
+
+    def iter_scenarios(self, status: str = None, date_from: str = None, date_to: str = None) -> Iterator[dict]:
+        seen = set()
+        for data in self._overlay_statuses(self._iter_files("scenarios")):
+            seen.add(data.get("session_id"))
+            if matches_filters(data, status, date_from, date_to):
+                yield data
+        for record in self._iter_bundle_records():
+            if record["session_id"] not in seen and matches_filters(record["scenario"], status, date_from, date_to):
+                yield record["scenario"]
+
+    def iter_session_documents(
+        self, status: str = None, date_from: str = None, date_to: str = None, prefetch: int = 8,
+    ) -> Iterator[tuple[dict, dict]]:
+        # Luźne sesje: transkrypt pobierany osobno; spakowane: transkrypt jest w tym samym rekordzie
+        seen = set()
+
+        def loose_scenarios():
+            for data in self._overlay_statuses(self._iter_files("scenarios")):
+                seen.add(data.get("session_id"))
+                if matches_filters(data, status, date_from, date_to):
+                    yield data
+
+        yield from self._with_transcripts(loose_scenarios(), prefetch)
+        for record in self._iter_bundle_records():
+            if record["session_id"] not in seen and matches_filters(record["scenario"], status, date_from, date_to):
+                yield record["scenario"], record.get("transcript")
+
+    # --- transkrypty ---
+
+    def save_transcript(self, session_id: str, data: dict):
+        self._save_json(f"transcripts/{session_id}_transcript.json", data)
+
+    def get_transcript(self, session_id: str) -> dict:
+        data = self._load_json(f"transcripts/{session_id}_transcript.json")
+        if data is None:
+            record = self._bundle_record(session_id)
+            data = record and record.get("transcript")
+        return data
+
+    def list_transcripts(self) -> list[dict]:
+        return list(self.iter_transcripts())
+
+    def iter_transcripts(self) -> Iterator[dict]:
+        seen = set()
+        for data in self._iter_files("transcripts"):
+            seen.add(data.get("session_id"))
+            yield data
+        for record in self._iter_bundle_records():
+            if record.get("transcript") and record["session_id"] not in seen:
+                yield record["transcript"]
+
+    # --- usuwanie (retencja) ---
+
+    def _session_keys(self, session_id: str) -> list[str]:
+        """Obiekty należące do sesji (silniki z dodatkowymi obiektami nadpisują)."""
+        return [
+            f"scenarios/{session_id}.json", f"transcripts/{session_id}_transcript.json", f"surveys/{session_id}.json",
+        ]
+
+    def delete_sessions(self, session_ids: list[str]) -> int:
+        keys = [key for session_id in session_ids for key in self._session_keys(session_id)]
+        return self._delete_many(keys) + self._drop_from_bundles(session_ids)
+
+    # --- ankiety ---
+
+    def save_survey(self, session_id: str, survey: dict):
+        self._save_json(f"surveys/{session_id}.json", survey)
+
+    def get_survey(self, session_id: str) -> dict:
+        return self._load_json(f"surveys/{session_id}.json")
+
+    def list_surveys(self) -> list[dict]:
+        return self._list_files("surveys")
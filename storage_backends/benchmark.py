@@ -0,0 +1,436 @@
+"""
+Benchmarki warstwy storage (bez sieci i bez prawdziwego bucketu).
+
+Użycie:
+    python -m storage_backends.benchmark serialization
+    python -m storage_backends.benchmark listing
+    python -m storage_backends.benchmark bulk
+"""
+
+import argparse
+import base64
+import bisect
+import fnmatch
+import hashlib
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from . import serialization
+from .local import LocalJSONBackend
+
+_WORDS = (
+    "rekrutacja proces zadanie feedback rozmowa manager zespół wynagrodzenie benefity etap decyzja "
+    "czas oczekiwania kontakt informacja techniczne pytania kandydat oferta ocena transparentność "
+    "weekend szybko długo jasno chaotycznie profesjonalnie dobrze źle polecił"
+).split()
+
+
+def sample_transcript(turns: int = 50, seed: int = 0) -> dict:
+    """Transkrypt o realistycznej długości i słownictwie (`turns` par pytanie-odpowiedź)."""
+    rng = random.Random(seed)
+
+    def sentence(words: int) -> str:
+        return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+    history = [{"role": "assistant", "content": "👋 **Witaj!** " + sentence(40)}]
+    for _ in range(turns):
+        history.append({"role": "user", "content": " ".join(sentence(rng.randint(8, 20)) for _ in range(rng.randint(1, 4)))})
+        history.append({"role": "assistant", "content": sentence(rng.randint(15, 35))})
+    return {"session_id": f"bench{seed:04d}", "updated_at": "2025-12-04 12:00:00", "history": history}
+
+
+def bench_serialization(samples: int = 200):
+    """Bajty zapisane, czas zapisu (plik lokalny jako zastępstwo uploadu) i czas odczytu+parsowania."""
+    docs = [sample_transcript(seed=i) for i in range(samples)]
+    variants = {
+        "json indent=2 (dawny)": lambda d: (json.dumps(d, ensure_ascii=False, indent=2).encode("utf-8"), None),
+        "kompaktowy": lambda d: serialization.encode(d, compression="none"),
+        "kompaktowy + gzip": lambda d: serialization.encode(d, compression="gzip"),
+    }
+    print(f"Transkrypty 50 tur, codec: {'orjson' if serialization.orjson else 'json'}, próbek: {samples}")
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = LocalJSONBackend(tmp)
+        for name, encoder in variants.items():
+            total_bytes = 0
+            start = time.perf_counter()
+            for i, doc in enumerate(docs):
+                payload, _ = encoder(doc)
+                total_bytes += len(payload)
+                with open(backend.base_dir / f"bench_{i}.json", "wb") as f:
+                    f.write(payload)
+            write_ms = (time.perf_counter() - start) * 1000 / samples
+            start = time.perf_counter()
+            for i in range(samples):
+                with open(backend.base_dir / f"bench_{i}.json", "rb") as f:
+                    serialization.decode(f.read())
+            read_ms = (time.perf_counter() - start) * 1000 / samples
+            print(f"  {name:24s} {total_bytes // samples:7d} B/transkrypt | zapis {write_ms:.3f} ms | odczyt+parsowanie {read_ms:.3f} ms")
+
+
+# --- LOKALNY ZAMIENNIK GCS (JSON API przez HTTP, dla STORAGE_EMULATOR_HOST) ---
+
+class FakeGCSServer:
+    """Bucket w pamięci obsługujący podzbiór JSON API GCS używany przez aplikację.
+
+    Prawdziwy klient `google-cloud-storage` łączy się z nim przez STORAGE_EMULATOR_HOST,
+    więc benchmark mierzy rzeczywistą ścieżkę kodu (stronicowanie, projekcję pól, HTTP).
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.objects: dict[str, bytes] = {}
+        self.resumable: dict[str, tuple] = {}
+        self._names: list[str] = []
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self._previous_host = os.environ.get("STORAGE_EMULATOR_HOST")
+        os.environ["STORAGE_EMULATOR_HOST"] = self.url
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        if self._previous_host is None:
+            os.environ.pop("STORAGE_EMULATOR_HOST", None)
+        else:
+            os.environ["STORAGE_EMULATOR_HOST"] = self._previous_host
+
+    def put(self, name: str, data: bytes):
+        with self._lock:
+            if name not in self.objects:
+                bisect.insort(self._names, name)
+            self.objects[name] = data
+
+    def fill(self, names):
+        """Szybkie zasilenie bucketu wieloma (pustymi) obiektami."""
+        with self._lock:
+            for name in names:
+                self.objects.setdefault(name, b"{}")
+            self._names = sorted(self.objects)
+
+    def delete(self, name: str) -> bool:
+        with self._lock:
+            if self.objects.pop(name, None) is None:
+                return False
+            self._names.pop(bisect.bisect_left(self._names, name))
+            return True
+
+    def resource(self, bucket: str, name: str) -> dict:
+        # Importowane dopiero przy użyciu zamiennika - benchmarki bez GCS nie wymagają pakietu
+        import google_crc32c
+        data = self.objects[name]
+        generation = str(abs(hash((name, len(data)))) % 10**12 + 1)
+        return {
+            "kind": "storage#object", "id": f"{bucket}/{name}/{generation}", "name": name, "bucket": bucket,
+            "selfLink": f"{self.url}/storage/v1/b/{bucket}/o/{name}",
+            "mediaLink": f"{self.url}/download/storage/v1/b/{bucket}/o/{name}?alt=media",
+            "generation": generation, "metageneration": "1", "contentType": "application/json",
+            "storageClass": "STANDARD", "size": str(len(data)), "etag": "CAE=",
+            "md5Hash": base64.b64encode(hashlib.md5(data).digest()).decode(),
+            "crc32c": base64.b64encode(google_crc32c.value(data).to_bytes(4, "big")).decode(),
+            "timeCreated": "2025-12-04T12:00:00.000Z", "updated": "2025-12-04T12:00:00.000Z",
+            "timeStorageClassUpdated": "2025-12-04T12:00:00.000Z",
+        }
+
+    def list_objects(self, bucket: str, query: dict) -> dict:
+        prefix = query.get("prefix", "")
+        page_size = min(int(query.get("maxResults", 1000)), 1000)
+        start = query.get("pageToken") or query.get("startOffset") or prefix
+        end = query.get("endOffset")
+        glob = query.get("matchGlob")
+        pattern = re.compile(fnmatch.translate(glob.replace("**", "*"))) if glob else None
+        item_fields = None
+        match = re.match(r"items\(([^)]*)\)", query.get("fields", ""))
+        if match:
+            item_fields = match.group(1).split(",")
+
+        with self._lock:
+            index = bisect.bisect_left(self._names, start)
+            if query.get("pageToken"):
+                index = bisect.bisect_right(self._names, start)
+            items, next_token = [], None
+            while index < len(self._names):
+                name = self._names[index]
+                if not name.startswith(prefix) or (end and name >= end):
+                    break
+                index += 1
+                if pattern and not pattern.match(name):
+                    continue
+                if len(items) == page_size:
+                    next_token = items[-1]["name"]
+                    break
+                resource = self.resource(bucket, name)
+                items.append({k: resource[k] for k in item_fields if k in resource} if item_fields else resource)
+        result = {"kind": "storage#objects", "items": items}
+        if next_token:
+            result["nextPageToken"] = next_token
+        return result
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body: bytes = b"", content_type: str = "application/json", headers: dict = None):
+                fake.requests += 1
+                fake.bytes_sent += len(body)
+                if fake.latency:
+                    time.sleep(fake.latency)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                for header, value in (headers or {}).items():
+                    self.send_header(header, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, payload: dict, status: int = 200):
+                self._reply(status, json.dumps(payload).encode("utf-8"))
+
+            def _parse(self):
+                url = urlparse(self.path)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                return url.path, query
+
+            def do_GET(self):
+                path, query = self._parse()
+                match = re.match(r"^(?:/download)?/storage/v1/b/([^/]+)/o(?:/(.+))?$", path)
+                if not match:
+                    return self._json({"error": {"code": 404, "message": "Not Found"}}, 404)
+                bucket, name = match.group(1), match.group(2) and unquote(match.group(2))
+                if name is None:
+                    return self._json(fake.list_objects(bucket, query))
+                if name not in fake.objects:
+                    return self._json({"error": {"code": 404, "message": "No such object"}}, 404)
+                if query.get("alt") == "media":
+                    data = fake.objects[name]
+                    generation = fake.resource(bucket, name)["generation"]
+                    # Odczyt zakresu (Range: bytes=start-end) - kompakcja czyta pojedyncze rekordy paczek
+                    byte_range = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+                    if byte_range:
+                        start = int(byte_range.group(1))
+                        end = min(int(byte_range.group(2) or len(data) - 1), len(data) - 1)
+                        headers = {"Content-Range": f"bytes {start}-{end}/{len(data)}", "x-goog-generation": generation}
+                        return self._reply(206, data[start:end + 1], "application/octet-stream", headers)
+                    return self._reply(200, data, "application/octet-stream", {"x-goog-generation": generation})
+                return self._json(fake.resource(bucket, name))
+
+            def _read_body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            def _store(self, bucket: str, name: str, data: bytes):
+                fake.put(name, data)
+                self._json(fake.resource(bucket, name))
+
+            def do_POST(self):
+                path, query = self._parse()
+                body = self._read_body()
+                match = re.match(r"^/upload/storage/v1/b/([^/]+)/o$", path)
+                if match:
+                    bucket = match.group(1)
+                    upload_type = query.get("uploadType")
+                    if upload_type == "media":
+                        return self._store(bucket, query["name"], body)
+                    if upload_type == "multipart":
+                        # multipart/related: metadane JSON + treść obiektu
+                        boundary = re.search(r'boundary="?([^";]+)"?', self.headers["Content-Type"]).group(1).encode()
+                        parts = [p for p in body.split(b"--" + boundary) if p.strip() not in (b"", b"--")]
+                        metadata = json.loads(parts[0].split(b"\r\n\r\n", 1)[1])
+                        media = parts[1].split(b"\r\n\r\n", 1)[1]
+                        return self._store(bucket, metadata["name"], media[:-2] if media.endswith(b"\r\n") else media)
+                    if upload_type == "resumable":
+                        metadata = json.loads(body or b"{}")
+                        upload_id = f"upload{len(fake.resumable)}-{time.monotonic_ns()}"
+                        fake.resumable[upload_id] = (bucket, metadata.get("name") or query.get("name"), bytearray())
+                        fake.requests += 1
+                        self.send_response(200)
+                        self.send_header("Location", f"{fake.url}/upload/resumable/{upload_id}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                match = re.match(r"^/storage/v1/b/([^/]+)/o/(.+)/compose$", path)
+                if match:
+                    bucket, name = match.group(1), unquote(match.group(2))
+                    sources = [s["name"] for s in json.loads(body)["sourceObjects"]]
+                    missing = [s for s in sources if s not in fake.objects]
+                    if missing:
+                        return self._json({"error": {"code": 404, "message": f"No such object: {missing[0]}"}}, 404)
+                    return self._store(bucket, name, b"".join(fake.objects[s] for s in sources))
+                if path == "/batch/storage/v1":
+                    return self._batch(body)
+                self._json({"error": {"code": 404, "message": "Not Found"}}, 404)
+
+            def _batch(self, body: bytes):
+                # multipart/mixed z żądaniami DELETE (bucket.delete_blobs w client.batch())
+                boundary = re.search(r'boundary="?([^";]+)"?', self.headers["Content-Type"]).group(1).encode()
+                parts = [p for p in body.split(b"--" + boundary) if p.strip() not in (b"", b"--")]
+                responses = []
+                for index, part in enumerate(parts, 1):
+                    request_line = re.search(rb"^(\w+) (\S+) HTTP/1\.1", part, re.MULTILINE)
+                    method, url = request_line.group(1).decode(), request_line.group(2).decode()
+                    match = re.match(r"^/storage/v1/b/([^/]+)/o/([^?]+)", urlparse(url).path)
+                    deleted = method == "DELETE" and match and fake.delete(unquote(match.group(2)))
+                    status = "204 No Content" if deleted else "404 Not Found"
+                    responses.append(
+                        f"--batch\r\nContent-Type: application/http\r\nContent-ID: <response-{index}>\r\n\r\n"
+                        f"HTTP/1.1 {status}\r\nContent-Length: 0\r\n\r\n"
+                    )
+                payload = ("".join(responses) + "--batch--\r\n").encode()
+                self._reply(200, payload, 'multipart/mixed; boundary="batch"')
+
+            def do_PUT(self):
+                path, _ = self._parse()
+                body = self._read_body()
+                upload_id = path.rsplit("/", 1)[1]
+                if upload_id not in fake.resumable:
+                    return self._json({"error": {"code": 404, "message": "No such upload"}}, 404)
+                bucket, name, buffer = fake.resumable[upload_id]
+                buffer.extend(body)
+                content_range = self.headers.get("Content-Range", "")
+                if content_range.endswith("/*"):
+                    # Kolejny fragment - serwer potwierdza przyjęty zakres
+                    fake.requests += 1
+                    self.send_response(308)
+                    self.send_header("Range", f"bytes=0-{len(buffer) - 1}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                fake.resumable.pop(upload_id)
+                self._store(bucket, name, bytes(buffer))
+
+            def do_DELETE(self):
+                path, _ = self._parse()
+                match = re.match(r"^/storage/v1/b/([^/]+)/o/(.+)$", path)
+                if not match or not fake.delete(unquote(match.group(2))):
+                    return self._json({"error": {"code": 404, "message": "No such object"}}, 404)
+                self._reply(204)
+
+        return Handler
+
+
+def bench_listing(objects: int = 100_000, page_size: int = 1000):
+    """Listing dużego bucketu: dawna lista pełnych zasobów vs generator z projekcją pól."""
+    from interviewer.gcs_service import GCSService
+
+    with FakeGCSServer() as fake:
+        fake.fill(f"transcripts/{i:08d}_transcript.json" for i in range(objects))
+        # Współdzielony klient procesu łączy się z zamiennikiem przez STORAGE_EMULATOR_HOST
+        service = GCSService("bench")
+        print(f"Bucket: {objects} obiektów, strona: {page_size}")
+
+        def measure(name, run):
+            fake.bytes_sent = 0
+            start = time.perf_counter()
+            count = run()
+            elapsed = time.perf_counter() - start
+            transfer = fake.bytes_sent
+            # Osobny przebieg z tracemalloc (śledzenie alokacji spowalnia pomiar czasu)
+            tracemalloc.start()
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"  {name:34s} {count:7d} obiektów | {elapsed:6.2f} s | pamięć szczyt {peak / 2**20:6.1f} MiB | transfer {transfer / 2**20:6.1f} MiB")
+
+        # Dawny wzorzec: pełne zasoby, wszystkie nazwy w liście
+        measure("lista pełnych zasobów (dawniej)", lambda: len([b.name for b in service.client.list_blobs("bench", prefix="transcripts/")]))
+        measure("iter_files (projekcja pól)", lambda: sum(1 for _ in service.iter_files(prefix="transcripts/", page_size=page_size)))
+        measure("iter_files (tylko nazwy)", lambda: sum(1 for _ in service.iter_files(prefix="transcripts/", page_size=page_size, fields=("name",))))
+        measure("iter_files (start_offset: 2. połowa)", lambda: sum(1 for _ in service.iter_files(
+            prefix="transcripts/", fields=("name",), start_offset=f"transcripts/{objects // 2:08d}")))
+
+        # Wznowienie listingu z tokenu strony
+        items, token = service.list_page(prefix="transcripts/", page_size=page_size)
+        resumed, _ = service.list_page(prefix="transcripts/", page_size=page_size, page_token=token)
+        print(f"  wznowienie z page_token: strona 2 zaczyna się od {resumed[0]['name']} (poprzednia kończy się na {items[-1]['name']})")
+
+
+def bench_bulk(objects: int = 400, latency: float = 0.02, workers: int = 16):
+    """Przepustowość operacji masowych GCSService: pętla sekwencyjna vs upload/download/delete_many."""
+    from interviewer.gcs_service import GCSService
+
+    payloads = [(f"transcripts/bulk{i:05d}_transcript.json", serialization.encode(sample_transcript(seed=i))[0]) for i in range(objects)]
+    names = [name for name, _ in payloads]
+    with FakeGCSServer(latency=latency) as fake:
+        service = GCSService("bench")
+        print(f"{objects} transkryptów, opóźnienie odpowiedzi {latency * 1000:.0f} ms, równoległość {workers}")
+
+        def measure(name, run):
+            start = time.perf_counter()
+            failed = run()
+            elapsed = time.perf_counter() - start
+            print(f"  {name:28s} {elapsed:6.2f} s | {objects / elapsed:7.1f} obiektów/s | błędy: {failed}")
+
+        def sequential(op):
+            failed = 0
+            for item in payloads:
+                try:
+                    op(*item)
+                except Exception:
+                    failed += 1
+            return failed
+
+        def failures(results):
+            return sum(not r["ok"] for r in results)
+
+        measure("upload sekwencyjnie", lambda: sequential(lambda name, data: service.bucket.blob(name).upload_from_string(data)))
+        measure("upload_many", lambda: failures(service.upload_many(payloads, max_workers=workers)))
+        measure("download sekwencyjnie", lambda: sequential(lambda name, _: service.bucket.blob(name).download_as_bytes()))
+        measure("download_many", lambda: failures(service.download_many(names, max_workers=workers)))
+        measure("delete sekwencyjnie", lambda: sequential(lambda name, _: service.delete_file(name)))
+        service.upload_many(payloads, max_workers=workers)
+        measure("delete_many", lambda: failures(service.delete_many(names, max_workers=workers)))
+
+        # Duży plik: pojedynczy upload (resumable) vs równoległe części + compose
+        fake.latency = 0
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "export.ndjson")
+            with open(path, "wb") as f:
+                f.write(os.urandom(64 * 1024 * 1024))
+            for name, run in (
+                ("duży plik: upload_file", lambda: service.upload_file(path, "exports/single.bin")),
+                ("duży plik: upload_composite", lambda: service.upload_composite(path, "exports/composite.bin")),
+            ):
+                start = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - start
+                print(f"  {name:28s} {elapsed:6.2f} s | {64 / elapsed:7.1f} MiB/s")
+
+
+BENCHMARKS = {
+    "serialization": bench_serialization,
+    "listing": bench_listing,
+    "bulk": bench_bulk,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarki warstwy storage")
+    parser.add_argument("name", choices=sorted(BENCHMARKS), nargs="?", help="Benchmark (domyślnie wszystkie)")
+    args = parser.parse_args()
+    for name in [args.name] if args.name else sorted(BENCHMARKS):
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
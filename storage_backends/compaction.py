@@ -0,0 +1,108 @@
+"""
+Kompakcja ukończonych sesji do dziennych paczek NDJSON.
+
+Każda ukończona sesja to dwa małe obiekty (`scenarios/{id}.json`,
+`transcripts/{id}_transcript.json`), a analityka i eksport płacą opóźnienie za każdy
+z nich. Zadanie (uruchamiane raz dziennie, np. z Cloud Scheduler / cron) pakuje
+sesje COMPLETED z zamkniętych dni do paczki `bundles/{dzień}-{znacznik}.ndjson`
+(jeden rekord {"session_id", "scenario", "transcript"} na linię) i dopisuje do indeksu
+`bundles/index.json` offset i długość rekordu. Dopiero po zapisaniu indeksu usuwa
+małe obiekty, więc odczyt przez `get_scenario` / `get_transcript` działa cały czas.
+
+Użycie:
+    python -m storage_backends.compaction --dry-run
+    python -m storage_backends.compaction --before 2025-12-04
+"""
+
+import argparse
+import time
+from collections import defaultdict
+from datetime import date
+
+from . import serialization
+from .base import KeyValueBackend
+
+
+def compact_completed_sessions(backend: KeyValueBackend, before: str = None, dry_run: bool = False) -> dict:
+    """Pakuje ukończone sesje utworzone przed dniem `before` (`RRRR-MM-DD`, domyślnie dziś).
+
+    Returns:
+        Raport: days, sessions, bundles, bytes, deleted_objects, seconds
+    """
+    start = time.perf_counter()
+    before = before or date.today().isoformat()
+    report = {"days": {}, "sessions": 0, "bundles": [], "bytes": 0, "deleted_objects": 0, "dry_run": dry_run}
+
+    # Tylko luźne dokumenty - sesje już spakowane nie są ponownie przetwarzane
+    by_day = defaultdict(list)
+    for scenario in backend._overlay_statuses(backend._iter_files("scenarios")):
+        created_day = scenario.get("created_at", "")[:10]
+        if scenario.get("status") == "COMPLETED" and created_day and created_day < before:
+            by_day[created_day].append(scenario)
+
+    for day in sorted(by_day):
+        lines, offsets = [], {}
+        offset = 0
+        for scenario in sorted(by_day[day], key=lambda d: d.get("session_id", "")):
+            session_id = scenario["session_id"]
+            record = {"session_id": session_id, "scenario": scenario, "transcript": backend.get_transcript(session_id)}
+            line = serialization.dumps(record) + b"\n"
+            # Długość bez znaku nowej linii - zakres to dokładnie jeden dokument JSON
+            offsets[session_id] = (offset, len(line) - 1)
+            offset += len(line)
+            lines.append(line)
+
+        report["days"][day] = len(offsets)
+        report["sessions"] += len(offsets)
+        report["bytes"] += offset
+        if dry_run:
+            continue
+
+        # Paczki są niezmienne - kolejna kompakcja tego samego dnia tworzy nową
+        bundle_key = f"bundles/{day}-{int(time.time() * 1000)}.ndjson"
+        backend._write_bytes(bundle_key, b"".join(lines), content_type="application/x-ndjson")
+
+        def add_bundle(index: dict) -> dict:
+            index["bundles"].append(bundle_key)
+            for session_id, (record_offset, length) in offsets.items():
+                index["sessions"][session_id] = [bundle_key, record_offset, length]
+            return index
+
+        # Zapis warunkowy z ponowieniem - równoległa retencja nie zgubi wpisów tej paczki (ani odwrotnie)
+        backend._update_bundle_index(add_bundle)
+        report["bundles"].append(bundle_key)
+
+        # Indeks zapisany - małe obiekty można usunąć
+        for session_id in offsets:
+            report["deleted_objects"] += backend._delete(f"scenarios/{session_id}.json")
+            report["deleted_objects"] += backend._delete(f"transcripts/{session_id}_transcript.json")
+
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kompakcja ukończonych sesji do dziennych paczek")
+    parser.add_argument("--before", help="Pakuj sesje utworzone przed tym dniem (RRRR-MM-DD, domyślnie dziś)")
+    parser.add_argument("--dry-run", action="store_true", help="Tylko raport, bez zapisu i usuwania")
+    args = parser.parse_args()
+
+    # Import tutaj - storage wybiera silnik na podstawie STORAGE_MODE
+    from storage import get_backend
+    backend = get_backend()
+    if not isinstance(backend, KeyValueBackend):
+        print(f"Silnik {backend.name} nie wymaga kompakcji (dane są już w jednym pliku z indeksami).")
+        return
+
+    report = compact_completed_sessions(backend, before=args.before, dry_run=args.dry_run)
+    prefix = "[dry-run] " if args.dry_run else ""
+    for day, count in sorted(report["days"].items()):
+        print(f"{prefix}{day}: {count} sesji")
+    print(
+        f"{prefix}Razem: {report['sessions']} sesji, {report['bytes'] / 1024:.1f} KiB w {len(report['bundles'])} paczkach, "
+        f"usunięte obiekty: {report['deleted_objects']} ({report['seconds']}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
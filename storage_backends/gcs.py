@@ -0,0 +1,237 @@
+"""
+Silnik GCS: dokumenty JSON w buckecie.
+
+Status nie jest zapisywany przez nadpisanie całego scenariusza: trzymamy go
+w małym obiekcie `status/{session_id}` (treść + metadane), zapisywanym z warunkiem
+na generację obiektu. Zmiana statusu to jedno małe żądanie, a równoległe zapisy
+nie gubią się i nie cofają statusu (np. COMPLETED -> ONGOING).
+"""
+
+from typing import Iterator
+
+from gcs_client import LIST_PAGE_SIZE
+from . import serialization
+from .base import KeyValueBackend, is_status_regression
+
+STATUS_WRITE_ATTEMPTS = 5
+# Limit żądań w jednym zbiorczym żądaniu JSON API (batch)
+DELETE_BATCH_SIZE = 100
+# Rozmiar kawałka przy strumieniowym czytaniu paczek (linie dzielimy sami)
+LINE_READ_CHUNK = 1024 * 1024
+
+
+class GCSBackend(KeyValueBackend):
+    name = "GCS"
+
+    def __init__(self, bucket_name: str):
+        self.bucket_name = bucket_name
+        self._bucket = None
+        # session_id -> (generacja, status) ostatnio widzianego obiektu statusu;
+        # pozwala sprawdzić regresję i pominąć odczyt przed zapisem
+        self._status_cache: dict[str, tuple[int, str]] = {}
+
+    @property
+    def bucket(self):
+        # Lazy loading - współdzielony klient procesu tworzony dopiero przy pierwszym użyciu
+        if self._bucket is None:
+            from gcs_client import get_bucket
+            self._bucket = get_bucket(self.bucket_name)
+        return self._bucket
+
+    # --- dokumenty ---
+
+    def _save_json(self, path_key: str, data: dict):
+        blob = self.bucket.blob(path_key)
+        payload, content_encoding = serialization.encode(data)
+        # Content-Encoding: gzip - klienci HTTP dostają treść rozpakowaną (transkodowanie GCS)
+        blob.content_encoding = content_encoding
+        blob.upload_from_string(payload, content_type='application/json')
+
+    def _load_json(self, path_key: str) -> dict:
+        from google.cloud.exceptions import NotFound
+        blob = self.bucket.blob(path_key)
+        try:
+            # raw_download - bez transkodowania; format rozpoznaje `serialization.decode`
+            return serialization.decode(blob.download_as_bytes(raw_download=True))
+        except NotFound:
+            return None
+
+    def _iter_files(self, prefix: str) -> Iterator[dict]:
+        # Listing stronami z projekcją samych nazw - treść i tak pobieramy osobno
+        blobs = self.bucket.list_blobs(
+            prefix=prefix, page_size=LIST_PAGE_SIZE, match_glob=f"{prefix}/**.json", fields="items(name),nextPageToken",
+        )
+        for blob in blobs:
+            try:
+                data = serialization.decode(blob.download_as_bytes(raw_download=True))
+            except Exception:
+                continue
+            yield data
+
+    # --- surowe obiekty (paczki i indeks) ---
+
+    def _write_bytes(self, path_key: str, payload: bytes, content_type: str):
+        self.bucket.blob(path_key).upload_from_string(payload, content_type=content_type)
+
+    def _replace_bytes(self, path_key: str, payload: bytes, content_type: str, expected_version) -> object:
+        from google.api_core.exceptions import PreconditionFailed
+        blob = self.bucket.blob(path_key)
+        try:
+            # Generacja 0 = obiekt nie może jeszcze istnieć
+            blob.upload_from_string(payload, content_type=content_type, if_generation_match=expected_version or 0)
+        except PreconditionFailed:
+            return None
+        return blob.generation
+
+    def _read_bytes(self, path_key: str, start: int = None, length: int = None) -> bytes:
+        from google.cloud.exceptions import NotFound
+        blob = self.bucket.blob(path_key)
+        end = start + length - 1 if start is not None and length is not None else None
+        try:
+            # Odczyt zakresu bajtów (nagłówek Range) - z paczki pobieramy tylko jeden rekord
+            return blob.download_as_bytes(start=start, end=end, raw_download=True)
+        except NotFound:
+            return None
+
+    def _iter_lines(self, path_key: str) -> Iterator[bytes]:
+        from google.cloud.exceptions import NotFound
+        try:
+            # Strumieniowy odczyt dużymi kawałkami - iteracja po liniach BlobReadera czyta po bajcie
+            with self.bucket.blob(path_key).open("rb", raw_download=True, chunk_size=LINE_READ_CHUNK) as f:
+                rest = b""
+                while chunk := f.read(LINE_READ_CHUNK):
+                    lines = (rest + chunk).split(b"\n")
+                    rest = lines.pop()
+                    for line in lines:
+                        yield line + b"\n"
+                if rest:
+                    yield rest
+        except NotFound:
+            return
+
+    def _delete(self, path_key: str) -> bool:
+        from google.cloud.exceptions import NotFound
+        try:
+            self.bucket.blob(path_key).delete()
+            return True
+        except NotFound:
+            return False
+
+    def _delete_many(self, path_keys: list[str]) -> int:
+        """Usuwa obiekty zbiorczymi żądaniami (do 100 DELETE w jednym żądaniu HTTP).
+
+        Zwraca liczbę faktycznie usuniętych obiektów (odpowiedzi 2xx); brakujące (404) są pomijane.
+
+        Raises:
+            RuntimeError: Gdy część usunięć zakończyła się innym błędem (po przetworzeniu wszystkich paczek)
+        """
+        deleted, failed = 0, []
+        for start in range(0, len(path_keys), DELETE_BATCH_SIZE):
+            chunk = path_keys[start:start + DELETE_BATCH_SIZE]
+            with self.bucket.client.batch(raise_exception=False) as batch:
+                self.bucket.delete_blobs(chunk)
+            # Odpowiedzi (po jednej na DELETE, w kolejności zleceń) zostają w batchu po finish()
+            for path_key, response in zip(chunk, batch._responses):
+                if 200 <= response.status_code < 300:
+                    deleted += 1
+                elif response.status_code != 404:
+                    failed.append((path_key, response.status_code))
+        if failed:
+            print(f"GCS: nie usunięto {len(failed)} z {len(path_keys)} obiektów, np. {failed[:5]}")
+            raise RuntimeError(f"Zbiorcze usuwanie: {len(failed)} błędów (usunięto {deleted})")
+        return deleted
+
+    def _version(self, path_key: str):
+        blob = self.bucket.get_blob(path_key)
+        return blob.generation if blob else None
+
+    def _iter_versions(self, prefix: str) -> Iterator[tuple[str, object]]:
+        blobs = self.bucket.list_blobs(
+            prefix=prefix, page_size=LIST_PAGE_SIZE, match_glob=f"{prefix}/**.json", fields="items(name,generation),nextPageToken",
+        )
+        for blob in blobs:
+            yield blob.name, blob.generation
+
+    # --- status ---
+
+    @staticmethod
+    def _status_key(session_id: str) -> str:
+        return f"status/{session_id}"
+
+    def _get_status(self, session_id: str) -> str:
+        blob = self.bucket.get_blob(self._status_key(session_id))
+        if blob is None:
+            self._status_cache[session_id] = (0, None)
+            return None
+        status = (blob.metadata or {}).get("status")
+        self._status_cache[session_id] = (blob.generation, status)
+        return status
+
+    def _list_statuses(self) -> dict:
+        """Mapa session_id -> status z jednego listowania (status jest w metadanych, bez pobierania treści)."""
+        statuses = {}
+        for blob in self.bucket.list_blobs(prefix="status/", fields="items(name,metadata,generation),nextPageToken"):
+            session_id = blob.name.split("/", 1)[1]
+            statuses[session_id] = (blob.metadata or {}).get("status")
+            self._status_cache[session_id] = (blob.generation, statuses[session_id])
+        return statuses
+
+    def _completed_session_ids(self) -> set:
+        return {session_id for session_id, status in self._list_statuses().items() if status == "COMPLETED"}
+
+    def update_status(self, session_id: str, new_status: str) -> bool:
+        """Zapisuje status z warunkiem na generację.
+
+        Zwraca False, gdy sesji nie ma, status się nie zmienia lub zapis cofnąłby status.
+        """
+        from google.api_core.exceptions import PreconditionFailed
+        blob = self.bucket.blob(self._status_key(session_id))
+        blob.metadata = {"status": new_status}
+        for _ in range(STATUS_WRITE_ATTEMPTS):
+            if session_id not in self._status_cache:
+                self._get_status(session_id)
+            expected_generation, current = self._status_cache[session_id]
+            if expected_generation == 0:
+                # Brak obiektu statusu: sesja musi mieć scenariusz, a ten niesie status startowy
+                scenario = super().get_scenario(session_id)
+                if scenario is None:
+                    return False
+                current = scenario.get("status")
+            # Sprawdzenie przed każdym zapisem - generacja chroni tylko przed równoległym zapisem
+            if current == new_status or is_status_regression(current, new_status):
+                return False
+            try:
+                # 0 = obiekt nie może jeszcze istnieć; w innym wypadku oczekujemy znanej generacji
+                blob.upload_from_string(new_status, content_type="text/plain", if_generation_match=expected_generation)
+                self._status_cache[session_id] = (blob.generation, new_status)
+                return True
+            except PreconditionFailed:
+                # Ktoś zapisał status w międzyczasie - odczytujemy aktualny i ponawiamy
+                self._get_status(session_id)
+        raise RuntimeError(f"Nie udało się zapisać statusu sesji {session_id} (konflikt zapisów)")
+
+    def get_scenario(self, session_id: str) -> dict:
+        # Status pobierany w tym samym wątku - metoda bywa wołana z zadań działających już na get_io_pool(),
+        # a zagnieżdżone zadanie w tej samej puli może się zakleszczyć przy jej wysyceniu.
+        data = super().get_scenario(session_id)
+        status = self._get_status(session_id) if data else None
+        if data and status:
+            data["status"] = status
+        return data
+
+    def _session_keys(self, session_id: str) -> list[str]:
+        return super()._session_keys(session_id) + [self._status_key(session_id)]
+
+    def delete_sessions(self, session_ids: list[str]) -> int:
+        deleted = super().delete_sessions(session_ids)
+        for session_id in session_ids:
+            self._status_cache.pop(session_id, None)
+        return deleted
+
+    def _overlay_statuses(self, scenarios: Iterator[dict]) -> Iterator[dict]:
+        # Mapa statusów (krótkie teksty z jednego listingu) + strumień dokumentów scenariuszy
+        statuses = self._list_statuses()
+        for data in scenarios:
+            if statuses.get(data.get("session_id")):
+                data["status"] = statuses[data.get("session_id")]
+            yield data
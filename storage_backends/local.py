@@ -0,0 +1,132 @@
+"""Silnik lokalny: dokumenty JSON w katalogu `data/`."""
+
+import os
+import threading
+from pathlib import Path
+from typing import Iterator
+
+from . import serialization
+from .base import KeyValueBackend, is_status_regression
+
+
+class LocalJSONBackend(KeyValueBackend):
+    name = "LOCAL"
+
+    def __init__(self, base_dir: Path):
+        self.base_dir = Path(base_dir)
+        (self.base_dir / "scenarios").mkdir(parents=True, exist_ok=True)
+        (self.base_dir / "transcripts").mkdir(parents=True, exist_ok=True)
+        self._status_lock = threading.Lock()
+        # Zapisy warunkowe (indeks paczek): sprawdzenie wersji i podmiana pliku są niepodzielne w procesie
+        self._replace_lock = threading.Lock()
+        # Indeks statusów: klucz scenariusza -> (mtime_ns, status); pliki czytane ponownie tylko po zmianie
+        self._status_index: dict[str, tuple[int, str]] = {}
+        self._status_index_lock = threading.Lock()
+
+    def _save_json(self, path_key: str, data: dict):
+        file_path = self.base_dir / path_key
+        # Upewnij się, że podkatalog istnieje (dla bezpieczeństwa przy manualnych ścieżkach)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        payload, _ = serialization.encode(data)
+        with open(file_path, "wb") as f:
+            f.write(payload)
+
+    def _load_json(self, path_key: str) -> dict:
+        try:
+            with open(self.base_dir / path_key, "rb") as f:
+                return serialization.decode(f.read())
+        except FileNotFoundError:
+            return None
+
+    def _iter_files(self, prefix: str) -> Iterator[dict]:
+        target_dir = self.base_dir / prefix
+        if not target_dir.exists():
+            return
+        for file_path in target_dir.glob("*.json"):
+            try:
+                with open(file_path, "rb") as f:
+                    data = serialization.decode(f.read())
+            except (OSError, ValueError):
+                continue
+            yield data
+
+    def _write_bytes(self, path_key: str, payload: bytes, content_type: str):
+        file_path = self.base_dir / path_key
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        # Zapis do pliku tymczasowego i podmiana - czytelnicy nie widzą połowy pliku
+        tmp_path = file_path.with_name(file_path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, file_path)
+
+    def _replace_bytes(self, path_key: str, payload: bytes, content_type: str, expected_version) -> object:
+        with self._replace_lock:
+            if self._version(path_key) != expected_version:
+                return None
+            self._write_bytes(path_key, payload, content_type)
+            return self._version(path_key)
+
+    def _read_bytes(self, path_key: str, start: int = None, length: int = None) -> bytes:
+        try:
+            with open(self.base_dir / path_key, "rb") as f:
+                if start is not None:
+                    f.seek(start)
+                return f.read(length if length is not None else -1)
+        except FileNotFoundError:
+            return None
+
+    def _iter_lines(self, path_key: str) -> Iterator[bytes]:
+        try:
+            with open(self.base_dir / path_key, "rb") as f:
+                yield from f
+        except FileNotFoundError:
+            return
+
+    def _delete(self, path_key: str) -> bool:
+        try:
+            (self.base_dir / path_key).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _version(self, path_key: str):
+        try:
+            return (self.base_dir / path_key).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _iter_versions(self, prefix: str) -> Iterator[tuple[str, object]]:
+        target_dir = self.base_dir / prefix
+        if not target_dir.exists():
+            return
+        with os.scandir(target_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json"):
+                    yield f"{prefix}/{entry.name}", entry.stat().st_mtime_ns
+
+    def _completed_session_ids(self) -> set:
+        with self._status_index_lock:
+            versions = dict(self._iter_versions("scenarios"))
+            for key in self._status_index.keys() - versions.keys():
+                del self._status_index[key]
+            for key, version in versions.items():
+                cached = self._status_index.get(key)
+                if cached is None or cached[0] != version:
+                    data = self._load_json(key) or {}
+                    self._status_index[key] = (version, data.get("status"))
+            return {
+                key.rsplit("/", 1)[-1].removesuffix(".json")
+                for key, (_, status) in self._status_index.items() if status == "COMPLETED"
+            }
+
+    def update_status(self, session_id: str, new_status: str) -> bool:
+        # Status jest częścią dokumentu scenariusza - odczyt i zapis pod blokadą
+        with self._status_lock:
+            data = self.get_scenario(session_id)
+            if not data:
+                return False
+            if data.get("status") == new_status or is_status_regression(data.get("status"), new_status):
+                return False
+            data["status"] = new_status
+            self.save_scenario(data)
+        return True
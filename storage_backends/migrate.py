@@ -0,0 +1,65 @@
+"""
+Migracja istniejących danych (katalogi JSON) do bazy SQLite.
+
+Użycie:
+    python -m storage_backends.migrate --source data --db data/hr_feedback.db
+    python -m storage_backends.migrate --source data --source 08-adk-HRfeedback/data
+
+Operacja jest idempotentna - ponowne uruchomienie nadpisuje rekordy o tych samych ID.
+"""
+
+import argparse
+import time
+
+from .base import StorageBackend
+from .local import LocalJSONBackend
+from .sqlite import SQLiteBackend
+
+
+def migrate(source: StorageBackend, target: StorageBackend) -> dict:
+    """Kopiuje scenariusze, transkrypty i ankiety z `source` do `target`. Zwraca liczniki."""
+    counts = {"scenarios": 0, "transcripts": 0, "surveys": 0, "skipped": 0}
+
+    for data in source.list_scenarios():
+        if not data.get("session_id"):
+            counts["skipped"] += 1
+            continue
+        target.save_scenario(data)
+        counts["scenarios"] += 1
+
+    for data in source.list_transcripts():
+        if not data.get("session_id"):
+            counts["skipped"] += 1
+            continue
+        target.save_transcript(data["session_id"], data)
+        counts["transcripts"] += 1
+
+    for survey in source.list_surveys():
+        session_id = survey.get("id_ankiety") or survey.get("session_id")
+        if not session_id:
+            counts["skipped"] += 1
+            continue
+        target.save_survey(session_id, survey)
+        counts["surveys"] += 1
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migracja danych JSON do SQLite")
+    parser.add_argument("--source", action="append", required=True, help="Katalog z danymi (scenarios/, transcripts/, surveys/)")
+    parser.add_argument("--db", default="data/hr_feedback.db", help="Ścieżka bazy SQLite")
+    args = parser.parse_args()
+
+    target = SQLiteBackend(args.db)
+    for source_dir in args.source:
+        start = time.perf_counter()
+        counts = migrate(LocalJSONBackend(source_dir), target)
+        print(
+            f"{source_dir} -> {args.db}: scenariusze {counts['scenarios']}, transkrypty {counts['transcripts']}, "
+            f"ankiety {counts['surveys']}, pominięte {counts['skipped']} ({time.perf_counter() - start:.2f}s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
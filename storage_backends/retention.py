@@ -0,0 +1,236 @@
+"""
+Retencja danych: usuwanie sesji starszych niż TTL ustawiony dla ich statusu.
+
+Porzucone scenariusze GENERATED i stare rozmowy nigdy nie znikały, więc rosły koszty
+listowania i każdego pełnego skanu. Zadanie (uruchamiane z harmonogramu, np. Cloud
+Scheduler / cron, albo w pętli `--every-hours`) dla każdego statusu z TTL:
+
+1. wybiera wygasłe sesje (SQLite: zapytanie po indeksie (status, created_at),
+   silniki obiektowe: strumieniowy skan łącznie z paczkami z `compaction.py`),
+2. archiwizuje je paczkami (NDJSON gzip, rekord {"session_id", "scenario", "transcript", "survey"}
+   jak w paczkach kompakcji, plus ankieta) w `archive/`,
+3. dopiero po zapisaniu archiwum usuwa paczkę sesji jedną operacją silnika
+   (`delete_sessions`: transakcja SQLite / zbiorcze żądania DELETE w GCS; paczki
+   kompakcji współdzielone z żywymi sesjami są przepisywane bez usuniętych rekordów).
+
+Wiek sesji liczony jest od daty utworzenia (`created_at`). Status bez TTL nie jest czyszczony.
+
+Z RETENTION_EVERY_HOURS zadanie działa też w tle procesu aplikacji (`main.py`),
+a jego liczniki są wtedy widoczne w `/metrics` (`retention_*`).
+
+Użycie:
+    python -m storage_backends.retention --dry-run
+    python -m storage_backends.retention --ttl GENERATED=14,ONGOING=60 --no-archive
+    python -m storage_backends.retention --every-hours 24
+"""
+
+import argparse
+import gzip
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+from . import serialization
+from .base import KeyValueBackend, StorageBackend
+
+# TTL w dniach per status, np. "GENERATED=30,ONGOING=90,COMPLETED=365"
+RETENTION_TTL_DAYS = os.getenv("RETENTION_TTL_DAYS", "GENERATED=30,ONGOING=90,COMPLETED=365")
+# Liczba sesji archiwizowanych i usuwanych jedną operacją
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "100"))
+# RETENTION_ARCHIVE=0 wyłącza archiwizację przed usunięciem
+RETENTION_ARCHIVE = os.getenv("RETENTION_ARCHIVE", "1") != "0"
+# Lokalny katalog archiwum; domyślnie `archive/` w tym samym storage (bucket / katalog danych)
+RETENTION_ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR")
+# Co ile godzin uruchamiać retencję w tle procesu aplikacji; 0 = tylko z harmonogramu (CLI)
+RETENTION_EVERY_HOURS = float(os.getenv("RETENTION_EVERY_HOURS", "0"))
+# Wątki wczytujące scenariusze i ankiety paczki do archiwum (osobna pula, nie współdzielona get_io_pool())
+RETENTION_LOAD_WORKERS = int(os.getenv("RETENTION_LOAD_WORKERS", "8"))
+
+# Metryki (narastająco od startu procesu)
+retention_stats = {
+    "runs": 0,
+    "expired_sessions": 0,
+    "archived_sessions": 0,
+    "archived_bytes": 0,
+    "deleted_objects": 0,
+    "failed_batches": 0,
+    "last_run_at": None,
+    "last_run_seconds": None,
+}
+_stats_lock = threading.Lock()
+_job_thread = None
+
+
+def parse_ttl(spec: str) -> dict[str, int]:
+    """`"GENERATED=30,ONGOING=90"` -> {"GENERATED": 30, "ONGOING": 90}."""
+    policy = {}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        status, _, days = item.partition("=")
+        policy[status.strip().upper()] = int(days)
+    return policy
+
+
+def _archive(backend: StorageBackend, key: str, payload: bytes):
+    if RETENTION_ARCHIVE_DIR or not isinstance(backend, KeyValueBackend):
+        base_dir = Path(RETENTION_ARCHIVE_DIR) if RETENTION_ARCHIVE_DIR else Path(backend.db_path).parent
+        file_path = base_dir / key
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(payload)
+    else:
+        backend._write_bytes(key, payload, content_type="application/x-ndjson")
+
+
+def _expired_session_ids(backend: StorageBackend, status: str, ttl_days: int, today: date) -> list[str]:
+    # Ostatni dzień utworzenia, który już wygasł (filtr dat jest włączny)
+    date_to = (today - timedelta(days=ttl_days + 1)).isoformat()
+    # Najpierw same ID: usuwanie w trakcie otwartego kursora / listingu nie jest bezpieczne
+    return [data["session_id"] for data in backend.iter_scenarios(status=status, date_to=date_to)]
+
+
+def apply_retention(
+    backend: StorageBackend,
+    policy: dict[str, int] = None,
+    dry_run: bool = False,
+    archive: bool = RETENTION_ARCHIVE,
+    batch_size: int = RETENTION_BATCH_SIZE,
+    today: date = None,
+) -> dict:
+    """Usuwa (po archiwizacji) sesje starsze niż TTL ich statusu.
+
+    Args:
+        policy: {status: TTL w dniach}; domyślnie z RETENTION_TTL_DAYS
+        dry_run: Tylko raport, bez archiwizacji i usuwania
+        archive: Zapis wygasłych sesji do `archive/` przed usunięciem
+
+    Returns:
+        Raport: statuses ({status: {ttl_days, expired, deleted_objects}}), archives, archived_sessions, archived_bytes,
+        deleted_objects, failed_batches, seconds
+    """
+    start = time.perf_counter()
+    policy = parse_ttl(RETENTION_TTL_DAYS) if policy is None else policy
+    today = today or date.today()
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    report = {"statuses": {}, "archives": [], "archived_sessions": 0, "archived_bytes": 0, "deleted_objects": 0, "failed_batches": 0, "dry_run": dry_run}
+
+    for status, ttl_days in policy.items():
+        session_ids = _expired_session_ids(backend, status, ttl_days, today)
+        status_report = {"ttl_days": ttl_days, "expired": len(session_ids), "deleted_objects": 0}
+        report["statuses"][status] = status_report
+        if dry_run:
+            continue
+
+        for batch_start in range(0, len(session_ids), batch_size):
+            batch = session_ids[batch_start:batch_start + batch_size]
+            try:
+                if archive:
+                    # Osobna pula: odczyty silnika mogą same korzystać z get_io_pool(), a zadanie
+                    # zagnieżdżone we wspólnej puli może się zakleszczyć przy jej wysyceniu
+                    with ThreadPoolExecutor(max_workers=RETENTION_LOAD_WORKERS) as loader:
+                        scenarios = list(loader.map(backend.get_scenario, batch))
+                        surveys = dict(zip(batch, loader.map(backend.get_survey, batch)))
+                    lines = [
+                        serialization.dumps({
+                            "session_id": scenario["session_id"], "scenario": scenario, "transcript": transcript,
+                            "survey": surveys.get(scenario["session_id"]),
+                        }) + b"\n"
+                        for scenario, transcript in backend._with_transcripts((s for s in scenarios if s), prefetch=16)
+                    ]
+                    payload = gzip.compress(b"".join(lines))
+                    key = f"archive/{stamp}-{status.lower()}-{batch_start // batch_size:04d}.ndjson.gz"
+                    _archive(backend, key, payload)
+                    report["archives"].append(key)
+                    report["archived_sessions"] += len(lines)
+                    report["archived_bytes"] += len(payload)
+                deleted = backend.delete_sessions(batch)
+            except Exception as e:
+                # Paczka bez archiwum nie jest usuwana; kolejne uruchomienie spróbuje ponownie
+                print(f"Retencja: błąd paczki {status} ({len(batch)} sesji): {e}")
+                report["failed_batches"] += 1
+                continue
+            status_report["deleted_objects"] += deleted
+            report["deleted_objects"] += deleted
+
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    if not dry_run:
+        with _stats_lock:
+            retention_stats["runs"] += 1
+            retention_stats["expired_sessions"] += sum(s["expired"] for s in report["statuses"].values())
+            retention_stats["archived_sessions"] += report["archived_sessions"]
+            retention_stats["archived_bytes"] += report["archived_bytes"]
+            retention_stats["deleted_objects"] += report["deleted_objects"]
+            retention_stats["failed_batches"] += report["failed_batches"]
+            retention_stats["last_run_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            retention_stats["last_run_seconds"] = report["seconds"]
+    return report
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return dict(retention_stats)
+
+
+def start_retention_job(every_hours: float = RETENTION_EVERY_HOURS):
+    """Uruchamia retencję cyklicznie w wątku w tle (raz na proces). Bez interwału nic nie robi.
+
+    Kilka instancji może czyścić równolegle: usunięcia są idempotentne, a indeks paczek
+    zapisywany warunkowo.
+    """
+    global _job_thread
+    if every_hours <= 0 or _job_thread is not None:
+        return None
+
+    def run():
+        from storage import get_backend
+        while True:
+            try:
+                _print_report(apply_retention(get_backend()))
+            except Exception as e:
+                print(f"Retencja: błąd uruchomienia: {e}")
+            time.sleep(every_hours * 3600)
+
+    _job_thread = threading.Thread(target=run, name="retention", daemon=True)
+    _job_thread.start()
+    return _job_thread
+
+
+def _print_report(report: dict):
+    prefix = "[dry-run] " if report["dry_run"] else ""
+    for status, item in report["statuses"].items():
+        print(f"{prefix}{status} (TTL {item['ttl_days']} dni): wygasłe sesje {item['expired']}, usunięte obiekty {item['deleted_objects']}")
+    print(
+        f"{prefix}Razem: usunięte obiekty {report['deleted_objects']}, archiwa {len(report['archives'])} "
+        f"({report['archived_bytes'] / 1024:.1f} KiB), błędne paczki {report['failed_batches']} ({report['seconds']}s)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retencja sesji (TTL per status, archiwizacja przed usunięciem)")
+    parser.add_argument("--ttl", default=RETENTION_TTL_DAYS, help="TTL w dniach, np. GENERATED=30,ONGOING=90,COMPLETED=365")
+    parser.add_argument("--dry-run", action="store_true", help="Tylko raport, bez archiwizacji i usuwania")
+    parser.add_argument("--no-archive", action="store_true", help="Usuwanie bez archiwizacji")
+    parser.add_argument("--batch-size", type=int, default=RETENTION_BATCH_SIZE)
+    parser.add_argument("--every-hours", type=float, help="Uruchamiaj cyklicznie co tyle godzin (bez zewnętrznego harmonogramu)")
+    args = parser.parse_args()
+
+    # Import tutaj - storage wybiera silnik na podstawie STORAGE_MODE
+    from storage import get_backend
+    backend = get_backend()
+    policy = parse_ttl(args.ttl)
+
+    while True:
+        report = apply_retention(
+            backend, policy=policy, dry_run=args.dry_run, archive=not args.no_archive, batch_size=args.batch_size,
+        )
+        _print_report(report)
+        if not args.every_hours:
+            break
+        time.sleep(args.every_hours * 3600)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Serializacja dokumentów zapisywanych w storage.
+
+Domyślnie kompaktowy JSON (bez wcięć), opcjonalnie gzip (STORAGE_COMPRESSION=gzip,
+w GCS z nagłówkiem `Content-Encoding: gzip`). Jeśli zainstalowany jest `orjson`,
+używamy go zamiast modułu `json`. Odczyt rozpoznaje format po zawartości, więc
+stare pliki (JSON z wcięciami) i nowe (kompaktowe / gzip) czytają się tak samo.
+
+Benchmark na realistycznych transkryptach (50 tur):
+    python -m storage_backends.benchmark serialization
+"""
+
+import gzip
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# none | gzip
+STORAGE_COMPRESSION = os.getenv("STORAGE_COMPRESSION", "none").lower()
+# STORAGE_JSON_INDENT=1 przywraca czytelne pliki z wcięciami (np. do ręcznego podglądu)
+STORAGE_JSON_INDENT = os.getenv("STORAGE_JSON_INDENT", "0") == "1"
+GZIP_LEVEL = int(os.getenv("STORAGE_GZIP_LEVEL", "6"))
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def dumps(data, indent: bool = False) -> bytes:
+    """Dokument -> JSON w UTF-8 (kompaktowy, chyba że `indent`)."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(raw):
+    """JSON (bytes lub str) -> dokument."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def encode(data, compression: str = None) -> tuple[bytes, str]:
+    """Dokument -> (treść do zapisu, Content-Encoding lub None)."""
+    compression = compression or STORAGE_COMPRESSION
+    raw = dumps(data, indent=STORAGE_JSON_INDENT)
+    if compression == "gzip":
+        # mtime=0 - ta sama treść daje te same bajty (stabilne sumy kontrolne)
+        return gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0), "gzip"
+    return raw, None
+
+
+def decode(raw: bytes):
+    """Treść zapisana przez `encode` lub stary plik JSON -> dokument."""
+    if raw[:2] == GZIP_MAGIC:
+        raw = gzip.decompress(raw)
+    return loads(raw)
@@ -0,0 +1,225 @@
+"""
+Silnik SQLite z indeksami na statusie, dacie utworzenia i kandydacie.
+Listowanie, filtrowanie, stronicowanie i zmiana statusu to operacje na indeksach,
+a nie skan wszystkich plików/obiektów.
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterator
+
+from . import serialization
+from .base import StorageBackend, STATUS_ORDER, encode_cursor, decode_cursor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    session_id TEXT PRIMARY KEY,
+    candidate_name TEXT NOT NULL DEFAULT '',
+    candidate_key TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scenarios_created ON scenarios (created_at, session_id);
+CREATE INDEX IF NOT EXISTS idx_scenarios_status_created ON scenarios (status, created_at, session_id);
+-- Filtr kandydata to wyszukiwanie fragmentu (skan tabeli) - indeksy po nazwisku nie są używane
+DROP INDEX IF EXISTS idx_scenarios_candidate;
+DROP INDEX IF EXISTS idx_scenarios_candidate_nocase;
+
+CREATE TABLE IF NOT EXISTS transcripts (
+    session_id TEXT PRIMARY KEY,
+    updated_at TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transcripts_updated ON transcripts (updated_at);
+
+CREATE TABLE IF NOT EXISTS surveys (
+    session_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+
+class SQLiteBackend(StorageBackend):
+    name = "SQLITE"
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Jedno połączenie na wątek (sqlite3 nie współdzieli połączeń między wątkami)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _scenario_from_row(row) -> dict:
+        data = serialization.loads(row["data"])
+        data["status"] = row["status"]
+        return data
+
+    # --- scenariusze ---
+
+    def save_scenario(self, data: dict):
+        candidate_name = data.get("candidate_name", "") or ""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO scenarios (session_id, candidate_name, candidate_key, status, created_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    data["session_id"],
+                    candidate_name,
+                    candidate_name.lower(),
+                    data.get("status", "GENERATED"),
+                    data.get("created_at", ""),
+                    serialization.dumps(data).decode("utf-8"),
+                ),
+            )
+
+    def get_scenario(self, session_id: str) -> dict:
+        row = self._connect().execute("SELECT status, data FROM scenarios WHERE session_id = ?", (session_id,)).fetchone()
+        return self._scenario_from_row(row) if row else None
+
+    def list_scenarios(self) -> list[dict]:
+        rows = self._connect().execute("SELECT status, data FROM scenarios ORDER BY created_at DESC, session_id DESC")
+        return [self._scenario_from_row(row) for row in rows]
+
+    def iter_scenarios(self, status: str = None, date_from: str = None, date_to: str = None) -> Iterator[dict]:
+        conditions, params = self._filter_conditions(status=status, date_from=date_from, date_to=date_to)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        # Kursor SQLite zwraca wiersze na bieżąco - bez wczytywania całej tabeli
+        for row in self._connect().execute(f"SELECT status, data FROM scenarios {where} ORDER BY created_at, session_id", params):
+            yield self._scenario_from_row(row)
+
+    def update_status(self, session_id: str, new_status: str) -> bool:
+        # Status trzymany tylko w kolumnie (nakładany na dokument przy odczycie) - jedno UPDATE po kluczu.
+        # Warunek w WHERE blokuje cofnięcie statusu przy równoległych zapisach i pomija zapis bez zmiany.
+        higher = [s for s, order in STATUS_ORDER.items() if new_status in STATUS_ORDER and order > STATUS_ORDER[new_status]]
+        guard = f" AND status NOT IN ({', '.join('?' for _ in higher)})" if higher else ""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE scenarios SET status = ? WHERE session_id = ? AND status != ?{guard}",
+                (new_status, session_id, new_status, *higher),
+            )
+        return cursor.rowcount > 0
+
+    # --- transkrypty ---
+
+    def save_transcript(self, session_id: str, data: dict):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO transcripts (session_id, updated_at, data) VALUES (?, ?, ?)",
+                (session_id, data.get("updated_at", ""), serialization.dumps(data).decode("utf-8")),
+            )
+
+    def get_transcript(self, session_id: str) -> dict:
+        row = self._connect().execute("SELECT data FROM transcripts WHERE session_id = ?", (session_id,)).fetchone()
+        return serialization.loads(row["data"]) if row else None
+
+    def list_transcripts(self) -> list[dict]:
+        return list(self.iter_transcripts())
+
+    def iter_transcripts(self) -> Iterator[dict]:
+        for row in self._connect().execute("SELECT data FROM transcripts"):
+            yield serialization.loads(row["data"])
+
+    # --- usuwanie (retencja) ---
+
+    def delete_sessions(self, session_ids: list[str]) -> int:
+        if not session_ids:
+            return 0
+        # Jedna transakcja na paczkę: DELETE po kluczu głównym dla wszystkich tabel sesji
+        placeholders = ", ".join("?" for _ in session_ids)
+        deleted = 0
+        with self._connect() as conn:
+            for table in ("scenarios", "transcripts", "surveys"):
+                deleted += conn.execute(f"DELETE FROM {table} WHERE session_id IN ({placeholders})", session_ids).rowcount
+        return deleted
+
+    # --- ankiety ---
+
+    def save_survey(self, session_id: str, survey: dict):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO surveys (session_id, data) VALUES (?, ?)",
+                (session_id, serialization.dumps(survey).decode("utf-8")),
+            )
+
+    def get_survey(self, session_id: str) -> dict:
+        row = self._connect().execute("SELECT data FROM surveys WHERE session_id = ?", (session_id,)).fetchone()
+        return serialization.loads(row["data"]) if row else None
+
+    def list_surveys(self) -> list[dict]:
+        return [serialization.loads(row["data"]) for row in self._connect().execute("SELECT data FROM surveys")]
+
+    # --- zapytania na indeksach ---
+
+    @staticmethod
+    def _filter_conditions(status: str = None, candidate: str = None, date_from: str = None, date_to: str = None) -> tuple[list, list]:
+        conditions, params = [], []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if candidate and candidate.strip():
+            # Fragment imienia lub nazwiska w dowolnym miejscu (candidate_key = nazwa małymi literami);
+            # instr() zamiast LIKE - bez escapowania "%" i "_" z wejścia
+            conditions.append("instr(candidate_key, ?) > 0")
+            params.append(candidate.strip().lower())
+        if date_from:
+            conditions.append("created_at >= ?")
+            params.append(date_from)
+        if date_to:
+            # Daty w formacie "RRRR-MM-DD GG:MM:SS" - koniec dnia włącznie
+            conditions.append("created_at <= ?")
+            params.append(f"{date_to} 99")
+        return conditions, params
+
+    def query_sessions(
+        self,
+        status: str = None,
+        candidate: str = None,
+        date_from: str = None,
+        date_to: str = None,
+        descending: bool = True,
+        page_size: int = 20,
+        cursor: str = None,
+    ) -> tuple[list[dict], str, int]:
+        conditions, params = self._filter_conditions(status, candidate, date_from, date_to)
+        conn = self._connect()
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        total = conn.execute(f"SELECT COUNT(*) FROM scenarios {where}", params).fetchone()[0]
+
+        page_conditions, page_params = list(conditions), list(params)
+        if cursor:
+            page_conditions.append(f"(created_at, session_id) {'<' if descending else '>'} (?, ?)")
+            page_params.extend(decode_cursor(cursor))
+        page_where = f"WHERE {' AND '.join(page_conditions)}" if page_conditions else ""
+        order = "DESC" if descending else "ASC"
+        rows = conn.execute(
+            f"SELECT status, data, created_at, session_id FROM scenarios {page_where} "
+            f"ORDER BY created_at {order}, session_id {order} LIMIT ?",
+            (*page_params, page_size + 1),
+        ).fetchall()
+
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_cursor((rows[-1]["created_at"], rows[-1]["session_id"]))
+        return [self._scenario_from_row(row) for row in rows], next_cursor, total
+
+    def completed_corpus_version(self) -> str:
+        count, latest_update, surveys = self._connect().execute(
+            "SELECT COUNT(*), MAX(t.updated_at), (SELECT COUNT(*) FROM surveys) FROM transcripts t "
+            "JOIN scenarios s ON s.session_id = t.session_id WHERE s.status = 'COMPLETED'"
+        ).fetchone()
+        return f"{count}@{latest_update or ''}/{surveys}"
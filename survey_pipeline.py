@@ -0,0 +1,116 @@
+"""
+Kolejka zadań w tle: po zakończeniu rozmowy (status COMPLETED) wyciąga
+ustrukturyzowaną ankietę z historii czatu i zapisuje ją jako `surveys/{session_id}.json`.
+Ostatnia wiadomość kandydata nie czeka na ekstrakcję - zdarzenie jedynie trafia do kolejki.
+"""
+
+import os
+import queue
+import threading
+import time
+
+import events
+from storage import get_scenario, get_transcript_data, get_survey, save_survey
+from analyst.survey_extractor import extract_survey
+
+# Liczba wątków roboczych (ogranicza równoległe wywołania modelu)
+SURVEY_WORKERS = int(os.getenv("SURVEY_WORKERS", "2"))
+SURVEY_MAX_ATTEMPTS = int(os.getenv("SURVEY_MAX_ATTEMPTS", "3"))
+SURVEY_RETRY_DELAY = float(os.getenv("SURVEY_RETRY_DELAY", "5"))
+
+
+class SurveyPipeline:
+    """Pula wątków przetwarzająca kolejkę sesji do ekstrakcji ankiet."""
+
+    def __init__(self, workers: int = SURVEY_WORKERS, max_attempts: int = SURVEY_MAX_ATTEMPTS):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._queue: queue.Queue = queue.Queue()
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def start(self):
+        """Uruchamia wątki robocze i subskrybuje zmiany statusu sesji."""
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"survey-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        events.subscribe(events.SESSION_STATUS_CHANGED, self._on_status_changed)
+
+    def _on_status_changed(self, payload: dict):
+        if payload.get("status") == "COMPLETED":
+            self.enqueue(payload["session_id"])
+
+    def enqueue(self, session_id: str):
+        """Dodaje sesję do kolejki (duplikaty oczekujące w kolejce są pomijane)."""
+        with self._lock:
+            if session_id in self._pending:
+                return
+            self._pending.add(session_id)
+        self._queue.put((session_id, 1))
+
+    def _worker(self):
+        while True:
+            session_id, attempt = self._queue.get()
+            try:
+                self._process(session_id)
+                with self._lock:
+                    self._pending.discard(session_id)
+            except Exception as e:
+                if attempt < self.max_attempts:
+                    print(f"Ekstrakcja ankiety {session_id} nieudana (próba {attempt}): {e}")
+                    # Ponowienie z wykładniczym opóźnieniem, bez blokowania wątku roboczego
+                    delay = SURVEY_RETRY_DELAY * 2 ** (attempt - 1)
+                    threading.Timer(delay, self._queue.put, args=((session_id, attempt + 1),)).start()
+                else:
+                    print(f"Ekstrakcja ankiety {session_id} porzucona po {attempt} próbach: {e}")
+                    with self._lock:
+                        self._pending.discard(session_id)
+                        self.failed += 1
+            finally:
+                self._queue.task_done()
+
+    def _process(self, session_id: str):
+        transcript = get_transcript_data(session_id)
+        if not transcript or not transcript.get("history"):
+            raise ValueError("Brak transkryptu")
+
+        # Idempotencja: ankieta z tej samej wersji transkryptu już istnieje
+        existing = get_survey(session_id)
+        source_version = transcript.get("updated_at")
+        if existing and existing.get("metadata", {}).get("source_updated_at") == source_version:
+            with self._lock:
+                self.skipped += 1
+            return
+
+        started = time.perf_counter()
+        survey = extract_survey(session_id, transcript["history"], get_scenario(session_id))
+        survey["metadata"]["source_updated_at"] = source_version
+        save_survey(session_id, survey)
+        with self._lock:
+            self.processed += 1
+        print(f"Zapisano ankietę {session_id} ({time.perf_counter() - started:.1f}s)")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "pending": len(self._pending),
+                "processed": self.processed,
+                "skipped": self.skipped,
+                "failed": self.failed,
+            }
+
+
+survey_pipeline = SurveyPipeline()
+
+
+def start_survey_pipeline() -> SurveyPipeline:
+    survey_pipeline.start()
+    return survey_pipeline
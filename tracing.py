@@ -0,0 +1,159 @@
+"""
+Śledzenie (tracing) zgodne z OpenTelemetry.
+
+Każde żądanie (`bot_turn`, `chat_setup`, `chat_analytics`) ma span główny, a pod nim
+spany operacji storage, przebiegu runnera ADK (zdarzenia jako span events; spany
+`invoke_agent` / `call_llm` / `execute_tool` tworzy sam ADK), bezpośrednich wywołań
+modelu i uploadu transkryptu do GCS. Kontekst przechodzi przez pulę I/O
+(`storage_backends.get_io_pool` kopiuje contextvars) i zadania asyncio; zapisy
+write-behind są łączone ze spanami tur, które je zleciły (span links).
+
+TRACING_EXPORTER:
+    none    - domyślnie; API OpenTelemetry bez dostawcy działa jako no-op
+    console - spany jako JSON (jedna linia na span) na stdout
+    file    - spany jako JSON Lines do pliku TRACING_FILE (działa offline)
+"""
+
+import atexit
+import contextvars
+import functools
+import inspect
+import os
+import threading
+from typing import Iterable
+
+from opentelemetry import trace
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "hr-feedback")
+
+# Tracer-proxy: do czasu `setup_tracing` (lub gdy eksport jest wyłączony) spany są no-op
+tracer = trace.get_tracer("hr_feedback")
+
+_configured = False
+_lock = threading.Lock()
+
+
+def setup_tracing():
+    """Konfiguruje dostawcę spanów i eksporter (raz na proces; kolejne wywołania nic nie robią)."""
+    global _configured
+    if _configured:
+        return
+    with _lock:
+        if _configured:
+            return
+        _configured = True
+        if TRACING_EXPORTER in ("", "none", "0"):
+            return
+        try:
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+        except ImportError:
+            print("Tracing: brak pakietu opentelemetry-sdk - spany nie będą eksportowane.")
+            return
+
+        def formatter(span) -> str:
+            return span.to_json(indent=None) + "\n"
+
+        out = None
+        if TRACING_EXPORTER == "file":
+            out = open(TRACING_FILE, "a", encoding="utf-8")
+            exporter = ConsoleSpanExporter(out=out, formatter=formatter)
+        elif TRACING_EXPORTER == "console":
+            exporter = ConsoleSpanExporter(formatter=formatter)
+        else:
+            print(f"Tracing: nieznany TRACING_EXPORTER={TRACING_EXPORTER} (dostępne: none, console, file)")
+            return
+
+        provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+        trace.set_tracer_provider(provider)
+        # Spany z bufora eksportera zapisywane przy zamknięciu procesu, potem zamknięcie pliku
+        # (atexit wywołuje funkcje w odwrotnej kolejności rejestracji)
+        if out is not None:
+            atexit.register(out.close)
+        atexit.register(provider.shutdown)
+        print(f"Tracing: eksport spanów ({TRACING_EXPORTER})")
+
+
+def _attributes(attributes: dict) -> dict:
+    # OpenTelemetry przyjmuje tylko typy proste (None pomijamy)
+    return {
+        key: value if isinstance(value, (str, bool, int, float)) else str(value)
+        for key, value in attributes.items() if value is not None
+    }
+
+
+def span(name: str, links: list = None, **attributes):
+    """Span potomny bieżącego kontekstu (context manager)."""
+    return tracer.start_as_current_span(name, attributes=_attributes(attributes), links=links)
+
+
+def set_attributes(**attributes):
+    """Dodaje atrybuty do bieżącego spanu (np. ID sesji znane dopiero w treści handlera)."""
+    trace.get_current_span().set_attributes(_attributes(attributes))
+
+
+def traced(name: str = None, **attributes):
+    """Dekorator: wywołanie funkcji (także async) w osobnym spanie."""
+    def decorator(func):
+        span_name = name or func.__name__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, **attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def runner_events(events: Iterable) -> Iterable:
+    """Przepuszcza zdarzenia runnera ADK, dopisując każde jako span event bieżącego spanu."""
+    current = trace.get_current_span()
+    if not current.is_recording():
+        yield from events
+        return
+    for event in events:
+        current.add_event("adk.event", _attributes({
+            "author": event.author,
+            "final": event.is_final_response(),
+            "partial": bool(event.partial),
+            "function_calls": ",".join(call.name for call in event.get_function_calls()) or None,
+            "function_responses": ",".join(response.name for response in event.get_function_responses()) or None,
+            "prompt_tokens": event.usage_metadata and event.usage_metadata.prompt_token_count,
+            "output_tokens": event.usage_metadata and event.usage_metadata.candidates_token_count,
+        }))
+        yield event
+
+
+def current_link():
+    """Link do bieżącego spanu (do spanów pracy wykonywanej później w innym wątku) lub None."""
+    context = trace.get_current_span().get_span_context()
+    return trace.Link(context) if context.is_valid else None
+
+
+def with_context(func):
+    """Opakowuje funkcję tak, by wykonała się w kontekście (contextvars) wywołującego - np. w innym wątku."""
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Osobna kopia na wywołanie - ten sam kontekst nie może być aktywny w dwóch wątkach naraz
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+def model_call(model: str, operation: str = "generate_content"):
+    """Span bezpośredniego wywołania modelu (poza agentami ADK)."""
+    return span(f"llm.{operation}", **{"gen_ai.request.model": model, "gen_ai.operation.name": operation})
@@ -0,0 +1,245 @@
+"""
+Zapis transkryptów w tle (write-behind) z grupowym zatwierdzaniem.
+
+Tura kandydata nie czeka na zapis do storage: historia trafia do bufora, a kolejne
+zapisy tej samej sesji są scalane (zapisujemy tylko najnowszą wersję). Bufor jest
+opróżniany, gdy sesja nie zmieniała się przez TRANSCRIPT_FLUSH_INTERVAL sekund,
+najpóźniej po TRANSCRIPT_MAX_LAG sekundach od pierwszej niezapisanej zmiany,
+przy zakończeniu rozmowy (flush przed statusem COMPLETED - przy nieudanym zapisie
+status ustawia dopiero udana ponowna próba) oraz przy zamknięciu procesu
+(SIGTERM na Cloud Run / atexit).
+"""
+
+import atexit
+import os
+import signal
+import threading
+import time
+
+import latency
+import tracing
+from storage import save_transcript, get_io_pool
+
+# TRANSCRIPT_WRITE_BEHIND=0 przywraca zapis synchroniczny w każdej turze
+WRITE_BEHIND_ENABLED = os.getenv("TRANSCRIPT_WRITE_BEHIND", "1") != "0"
+# Zapis po tylu sekundach bez nowych zmian w sesji (debounce)
+TRANSCRIPT_FLUSH_INTERVAL = float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL", "2"))
+# Maksymalne opóźnienie trwałości: najstarsza niezapisana zmiana trafia do storage najpóźniej po tym czasie
+TRANSCRIPT_MAX_LAG = float(os.getenv("TRANSCRIPT_MAX_LAG", "10"))
+# Limit sesji oczekujących w buforze; po przekroczeniu wywołujący sam opróżnia bufor
+TRANSCRIPT_MAX_PENDING = int(os.getenv("TRANSCRIPT_MAX_PENDING", "500"))
+# Maksymalna liczba linków do spanów tur zlecających zapis jednej sesji
+MAX_TRACE_LINKS = 8
+
+
+def _timed_save(session_id: str, history: list):
+    """Zapis do storage mierzony jako faza `transcript_save` (raz na faktyczny zapis)."""
+    start = time.perf_counter()
+    try:
+        save_transcript(session_id, history)
+    finally:
+        latency.observe(latency.TRANSCRIPT_SAVE, time.perf_counter() - start)
+
+
+class TranscriptWriteBehind:
+    """Bufor niezapisanych transkryptów (session_id -> najnowsza historia)."""
+
+    def __init__(
+        self,
+        flush_interval: float = TRANSCRIPT_FLUSH_INTERVAL,
+        max_lag: float = TRANSCRIPT_MAX_LAG,
+        max_pending: int = TRANSCRIPT_MAX_PENDING,
+        enabled: bool = WRITE_BEHIND_ENABLED,
+    ):
+        self.flush_interval = flush_interval
+        self.max_lag = max_lag
+        self.max_pending = max_pending
+        self.enabled = enabled
+        # session_id -> {"history", "first_at", "last_at"}
+        self._pending: dict[str, dict] = {}
+        self._cond = threading.Condition()
+        # Wpisy właśnie zapisywane przez _commit (już poza _pending, jeszcze nie w storage)
+        self._committing: dict[str, dict] = {}
+        # session_id -> akcje do wykonania po trwałym zapisie sesji (np. status COMPLETED)
+        self._after_save: dict[str, list] = {}
+        # Zatwierdzenia są szeregowane, żeby starsza wersja sesji nie nadpisała nowszej
+        self._commit_lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+        self.submitted = 0
+        self.coalesced = 0
+        self.commits = 0
+        self.written = 0
+        self.failed = 0
+        self.max_lag_seen = 0.0
+
+    def start(self):
+        """Uruchamia wątek opróżniający bufor i rejestruje zapis przy zamknięciu procesu."""
+        if self._thread or not self.enabled:
+            return
+        self._thread = threading.Thread(target=self._worker, name="transcript-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        self._install_sigterm_handler()
+
+    def _install_sigterm_handler(self):
+        # Cloud Run wysyła SIGTERM przed zatrzymaniem instancji - zapisujemy bufor i oddajemy sterowanie
+        previous = signal.getsignal(signal.SIGTERM)
+
+        def handler(signum, frame):
+            print("SIGTERM: zapis oczekujących transkryptów...")
+            self.close()
+            if callable(previous):
+                previous(signum, frame)
+            else:
+                raise SystemExit(0)
+
+        try:
+            signal.signal(signal.SIGTERM, handler)
+        except ValueError:
+            # Sygnały można obsługiwać tylko w głównym wątku - zostaje atexit
+            pass
+
+    def submit(self, session_id: str, history: list):
+        """Przyjmuje najnowszą historię sesji. Nie czeka na zapis (chyba że bufor jest pełny)."""
+        if self._thread is None or self._stopped:
+            # Bufor nie działa (wyłączony, nieuruchomiony lub zamknięty) - zapis synchroniczny
+            _timed_save(session_id, history)
+            return
+
+        now = time.monotonic()
+        # Zapis wykona się później w innym wątku - span zatwierdzenia dostaje link do spanu tej tury
+        link = tracing.current_link()
+        with self._cond:
+            self.submitted += 1
+            entry = self._pending.get(session_id)
+            if entry:
+                self.coalesced += 1
+                entry["history"] = list(history)
+                entry["last_at"] = now
+            else:
+                entry = self._pending[session_id] = {"history": list(history), "first_at": now, "last_at": now, "links": []}
+            if link and len(entry["links"]) < MAX_TRACE_LINKS:
+                entry["links"].append(link)
+            overflow = len(self._pending) > self.max_pending
+            self._cond.notify()
+        if overflow:
+            # Ograniczenie pamięci: przy przepełnieniu wywołujący płaci za zapis całej grupy
+            self.flush()
+
+    def pending_history(self, session_id: str) -> list:
+        """Niezapisana jeszcze historia sesji z bufora (kopia) lub None."""
+        with self._cond:
+            entry = self._pending.get(session_id) or self._committing.get(session_id)
+            return list(entry["history"]) if entry else None
+
+    def flush(self, session_id: str = None) -> bool:
+        """Zapisuje natychmiast jedną sesję lub (bez argumentu) cały bufor.
+
+        Returns:
+            True, gdy wszystko trafiło do storage; False, gdy zapis się nie udał
+            (historia wraca do bufora i zapis w tle ponowi próbę).
+        """
+        with self._cond:
+            session_ids = [session_id] if session_id else list(self._pending)
+        failed = self._commit(session_ids)
+        with self._cond:
+            # Sesja mogła być w trakcie nieudanego zatwierdzenia w wątku w tle - wtedy wróciła do bufora
+            return not failed and not (session_id and session_id in self._pending)
+
+    def call_after_save(self, session_id: str, callback):
+        """Wywołuje `callback()` po trwałym zapisie sesji (od razu, jeśli nie czeka ona w buforze)."""
+        with self._cond:
+            if session_id in self._pending or session_id in self._committing:
+                self._after_save.setdefault(session_id, []).append(callback)
+                return
+        callback()
+
+    def close(self):
+        """Zatrzymuje zapis w tle i zapisuje wszystko, co zostało w buforze."""
+        self._stopped = True
+        with self._cond:
+            self._cond.notify()
+        self.flush()
+
+    def _due(self, now: float) -> list[str]:
+        with self._cond:
+            return [
+                session_id for session_id, entry in self._pending.items()
+                if now - entry["last_at"] >= self.flush_interval or now - entry["first_at"] >= self.max_lag
+            ]
+
+    def _worker(self):
+        tick = max(0.05, min(self.flush_interval, self.max_lag) / 2)
+        while not self._stopped:
+            with self._cond:
+                self._cond.wait(timeout=tick)
+            due = self._due(time.monotonic())
+            if due:
+                self._commit(due)
+
+    def _commit(self, session_ids: list[str]) -> set:
+        """Grupowe zatwierdzenie: zapisy wielu sesji równolegle w puli I/O. Zwraca sesje, których nie zapisano."""
+        failed, callbacks = set(), []
+        with self._commit_lock:
+            with self._cond:
+                batch = {sid: self._pending.pop(sid) for sid in session_ids if sid in self._pending}
+                self._committing = batch
+            if not batch:
+                return failed
+
+            now = time.monotonic()
+            links = [link for entry in batch.values() for link in entry["links"]]
+            with tracing.span("transcript_writer.commit", links=links, sessions=len(batch)):
+                futures = {
+                    sid: get_io_pool().submit(_timed_save, sid, entry["history"])
+                    for sid, entry in batch.items()
+                }
+                self.commits += 1
+                for sid, future in futures.items():
+                    entry = batch[sid]
+                    try:
+                        future.result()
+                        self.written += 1
+                        self.max_lag_seen = max(self.max_lag_seen, now - entry["first_at"])
+                        with self._cond:
+                            if sid not in self._pending:
+                                callbacks.extend(self._after_save.pop(sid, []))
+                    except Exception as e:
+                        self.failed += 1
+                        failed.add(sid)
+                        print(f"Błąd zapisu transkryptu {sid}: {e}")
+                        with self._cond:
+                            # Wracamy do bufora, chyba że w międzyczasie przyszła nowsza wersja
+                            if sid not in self._pending:
+                                entry["last_at"] = time.monotonic()
+                                self._pending[sid] = entry
+            with self._cond:
+                self._committing = {}
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Błąd akcji po zapisie transkryptu: {e}")
+        return failed
+
+    def stats(self) -> dict:
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "commits": self.commits,
+            "written": self.written,
+            "failed": self.failed,
+            "max_lag_seen": round(self.max_lag_seen, 3),
+        }
+
+
+transcript_writer = TranscriptWriteBehind()
+
+
+def start_transcript_writer() -> TranscriptWriteBehind:
+    transcript_writer.start()
+    return transcript_writer